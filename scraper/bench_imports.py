@@ -0,0 +1,48 @@
+"""
+bench_imports.py
+================
+Import-time benchmark for the scraper entry points.
+Each module is imported in a fresh interpreter so nothing is cached between runs.
+
+Usage:
+  python scraper/bench_imports.py              # default modules, 5 runs each
+  python scraper/bench_imports.py core.daily --runs 10
+"""
+
+import sys
+import argparse
+import statistics
+import subprocess
+from pathlib import Path
+
+SCRAPER_DIR = Path(__file__).resolve().parent
+DEFAULT_MODULES = ["core", "core.floorsheet", "core.daily", "core.daily_prices", "run_github_actions"]
+
+SNIPPET = "import time; t = time.perf_counter(); import {module}; print(time.perf_counter() - t)"
+
+
+def time_import(module, runs):
+    samples = []
+    for _ in range(runs):
+        out = subprocess.run(
+            [sys.executable, "-c", SNIPPET.format(module=module)],
+            cwd=SCRAPER_DIR, capture_output=True, text=True, check=True,
+        )
+        samples.append(float(out.stdout.strip().splitlines()[-1]) * 1000)
+    return samples
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Measure cold import time of scraper modules")
+    parser.add_argument("modules", nargs="*", default=DEFAULT_MODULES)
+    parser.add_argument("--runs", type=int, default=5)
+    args = parser.parse_args()
+
+    print(f"{'module':24s} {'median ms':>10s} {'min ms':>8s}")
+    for module in args.modules:
+        samples = time_import(module, args.runs)
+        print(f"{module:24s} {statistics.median(samples):10.1f} {min(samples):8.1f}")
+
+
+if __name__ == "__main__":
+    main()
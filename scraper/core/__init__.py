@@ -1,13 +1,26 @@
 
-# Expose core scrapers and managers
-from .floorsheet import FloorsheetScraper
-try:
-    from .daily import DailyScraperManager
-except ImportError:
-    pass
-
-try:
-    from .history import ShareSansarHistoryScraper
-except ImportError:
-    pass
+# Expose core scrapers and managers.
+# Submodules are imported on first attribute access (PEP 562) so that
+# `import core` stays cheap and free of side effects.
+import importlib
 
+_EXPORTS = {
+    "FloorsheetScraper": ".floorsheet",
+    "DailyScraperManager": ".daily",
+    "ShareSansarHistoryScraper": ".history",
+    "DailySummaryUpdater": ".daily_prices",
+}
+
+__all__ = list(_EXPORTS)
+
+
+def __getattr__(name):
+    if name not in _EXPORTS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    value = getattr(importlib.import_module(_EXPORTS[name], __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
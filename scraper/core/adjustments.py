@@ -0,0 +1,276 @@
+
+import csv
+import os
+import re
+import json
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from .indicators import load_price_history
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+CACHE_PATH = DATA_DIR / ".cache" / "adjustments.json"
+
+OHLC = ("open", "high", "low", "ltp")
+FACE_VALUE = 100.0  # NEPSE dividends are quoted as % of face value
+
+_DATE_RE = re.compile(r"\d{4}-\d{2}-\d{2}")
+_RATIO_RE = re.compile(r"^\s*(\d+(?:\.\d+)?)\s*:\s*(\d+(?:\.\d+)?)\s*$")
+
+
+def _to_float(value):
+    """'1,842.00' / '10%' / '' -> float (0.0 when blank or unparsable)."""
+    try:
+        return float(str(value).replace(",", "").replace("%", "").strip() or 0)
+    except ValueError:
+        return 0.0
+
+
+def _to_date(value):
+    """Pull YYYY-MM-DD out of strings like '2025-12-31 [Closed]'."""
+    m = _DATE_RE.search(value or "")
+    return m.group(0) if m else None
+
+
+def _file_signature(path):
+    try:
+        st = path.stat()
+        return [st.st_mtime_ns, st.st_size]
+    except FileNotFoundError:
+        return None
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Corporate-action parsing
+# ═══════════════════════════════════════════════════════════════════════════
+
+def parse_dividends(path):
+    """
+    Read dividend.csv into events.
+    Bonus shares become ('bonus', ex_date, pct); cash dividends become
+    ('cash', ex_date, pct). The book closure date is used as the ex-date.
+    """
+    events = []
+    if not path.exists():
+        return events
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            ex_date = _to_date(row.get("book_closure_date"))
+            if not ex_date:
+                continue
+            bonus = _to_float(row.get("bonus_share"))
+            cash = _to_float(row.get("cash_dividend"))
+            if bonus > 0:
+                events.append(("bonus", ex_date, bonus))
+            if cash > 0:
+                events.append(("cash", ex_date, cash))
+    return events
+
+
+def parse_right_shares(path):
+    """
+    Read right-share.csv into ('right', ex_date, (held, rights, issue_price)) events.
+    Ratios are holding:right (e.g. '10:3'). right-share.csv has no book closure
+    column, so the issue opening date stands in for the ex-date.
+    """
+    events = []
+    if not path.exists():
+        return events
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.DictReader(f):
+            ex_date = _to_date(row.get("opening_date"))
+            m = _RATIO_RE.match(row.get("ratio") or "")
+            if not ex_date or not m:
+                continue
+            held, rights = float(m.group(1)), float(m.group(2))
+            if held <= 0 or rights <= 0:
+                continue
+            events.append(("right", ex_date, (held, rights, _to_float(row.get("issue_price")))))
+    return events
+
+
+def event_factor(kind, value, prev_close, face_value=FACE_VALUE):
+    """
+    Price multiplier applied to sessions before the ex-date.
+    Returns 1.0 when the event does not dilute the price (e.g. an
+    out-of-the-money right issue or a cash payout above the price).
+    """
+    if kind == "bonus":
+        return 1.0 / (1.0 + value / 100.0)
+    if kind == "cash":
+        payout = value / 100.0 * face_value
+        if 0 < payout < prev_close:
+            return (prev_close - payout) / prev_close
+        return 1.0
+    if kind == "right":
+        held, rights, issue_price = value
+        terp = (held * prev_close + rights * issue_price) / (held + rights)
+        return min(terp / prev_close, 1.0)
+    raise ValueError(f"Unknown corporate action '{kind}'")
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# Adjustment engine
+# ═══════════════════════════════════════════════════════════════════════════
+
+class AdjustmentEngine:
+    """
+    Turns dividend.csv / right-share.csv into per-symbol adjustment factors and
+    applies them to prices.csv to produce back-adjusted OHLC series.
+
+    Factors are cached in data/.cache/adjustments.json keyed on the signature
+    (mtime, size) of the corporate-action files, so they are only recomputed
+    when those files change. Events whose ex-date lies beyond the stored price
+    history are marked pending and retried once prices.csv moves on.
+    """
+
+    def __init__(self, cache_path=CACHE_PATH, face_value=FACE_VALUE):
+        self.cache_path = Path(cache_path)
+        self.face_value = face_value
+        self._cache = None
+        self._dirty = False
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _load_cache(self):
+        if self._cache is None:
+            try:
+                with open(self.cache_path) as f:
+                    self._cache = json.load(f)
+            except (FileNotFoundError, ValueError):
+                self._cache = {}
+        return self._cache
+
+    def save(self):
+        """Persist the factor cache if anything changed."""
+        if not self._dirty:
+            return
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(self._cache, f, separators=(",", ":"))
+        os.replace(tmp, self.cache_path)
+        self._dirty = False
+
+    def _signature(self, symbol, pending):
+        d = COMPANY_WISE / symbol
+        sig = [_file_signature(d / "dividend.csv"), _file_signature(d / "right-share.csv")]
+        if pending:
+            sig.append(_file_signature(d / "prices.csv"))
+        return sig
+
+    # ------------------------------------------------------------------
+    # Factors
+    # ------------------------------------------------------------------
+
+    def _compute_events(self, symbol, history=None):
+        d = COMPANY_WISE / symbol
+        raw = parse_dividends(d / "dividend.csv") + parse_right_shares(d / "right-share.csv")
+        if not raw:
+            return [], False
+        if history is None:
+            history = load_price_history(symbol)
+        if history is None:
+            return [], True
+        dates, close = history
+
+        by_date = {}
+        pending = False
+        for kind, ex_date, value in raw:
+            i = int(np.searchsorted(dates, ex_date, side="left"))
+            if i == 0:
+                continue  # no sessions before the ex-date to adjust
+            if i == len(dates):
+                pending = True  # ex-date not reached in stored history yet
+                continue
+            # Last valid close strictly before the ex-date
+            prev = close[:i][~np.isnan(close[:i])]
+            if not len(prev):
+                continue
+            f = event_factor(kind, value, prev[-1], self.face_value)
+            if f < 1.0:
+                by_date[ex_date] = by_date.get(ex_date, 1.0) * f
+        return sorted(by_date.items()), pending
+
+    def factors(self, symbol, history=None):
+        """Return [(ex_date, factor), ...] sorted by ex-date (cached)."""
+        cache = self._load_cache()
+        entry = cache.get(symbol)
+        if entry and entry["sig"] == self._signature(symbol, entry["pending"]):
+            return [tuple(e) for e in entry["events"]]
+
+        events, pending = self._compute_events(symbol, history)
+        cache[symbol] = {
+            "sig": self._signature(symbol, pending),
+            "pending": pending,
+            "events": [list(e) for e in events],
+        }
+        self._dirty = True
+        return events
+
+    @staticmethod
+    def cumulative_factors(dates, events):
+        """Cumulative multiplier per date: product of factors with ex-date > date."""
+        if not events:
+            return np.ones(len(dates))
+        ex_dates = np.array([e[0] for e in events], dtype="U10")
+        # suffix[k] = product of factors k..end, suffix[len] = 1
+        suffix = np.append(np.cumprod(np.array([e[1] for e in events])[::-1])[::-1], 1.0)
+        return suffix[np.searchsorted(ex_dates, dates, side="right")]
+
+    # ------------------------------------------------------------------
+    # Adjusted series
+    # ------------------------------------------------------------------
+
+    def adjusted_prices(self, symbol):
+        """
+        Return (dates, ohlc) with ohlc columns open, high, low, ltp back-adjusted
+        for bonus shares, cash dividends and right issues, or None if the symbol
+        has no prices.csv.
+        """
+        history = load_price_history(symbol, columns=OHLC)
+        if history is None:
+            return None
+        dates, ohlc = history
+        events = self.factors(symbol, history=(dates, ohlc[:, 3]))
+        self.save()
+        return dates, ohlc * self.cumulative_factors(dates, events)[:, None]
+
+    def refresh_all(self, symbols=None):
+        """Recompute factors for every symbol whose corporate actions changed."""
+        if symbols is None:
+            symbols = sorted(d.name for d in COMPANY_WISE.iterdir() if d.is_dir())
+        with_events = 0
+        for sym in symbols:
+            try:
+                if self.factors(sym):
+                    with_events += 1
+            except Exception as e:
+                logger.error(f"Adjustment factors failed for {sym}: {e}")
+        self.save()
+        logger.info(f"Adjustments: {with_events}/{len(symbols)} symbols have corporate actions")
+        return with_events
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Build corporate-action adjustment factors")
+    parser.add_argument("symbols", nargs="*", help="Symbols to process (default: all)")
+    parser.add_argument("--show", action="store_true", help="Print each symbol's factors")
+    args = parser.parse_args()
+
+    engine = AdjustmentEngine()
+    engine.refresh_all(symbols=args.symbols or None)
+    if args.show:
+        for sym in args.symbols or sorted(engine._load_cache()):
+            for ex_date, factor in engine.factors(sym):
+                print(f"{sym:10s} {ex_date}  x{factor:.6f}")
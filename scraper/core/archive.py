@@ -0,0 +1,214 @@
+
+import os
+import gzip
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import date as dt_date
+from pathlib import Path
+from urllib.parse import urlsplit, urlunsplit, parse_qsl, urlencode
+
+import requests
+
+try:
+    import zstandard
+except ImportError:  # optional — falls back to gzip
+    zstandard = None
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+ARCHIVE_DIR = DATA_DIR / ".cache" / "raw"
+
+
+def request_key(method, url, params=None):
+    """Stable key for a request: method + URL + sorted query/form parameters."""
+    parts = urlsplit(url)
+    items = parse_qsl(parts.query, keep_blank_values=True) + list((params or {}).items())
+    base = urlunsplit((parts.scheme, parts.netloc, parts.path, "", ""))
+    canon = f"{method.upper()} {base}?{urlencode(sorted((str(k), str(v)) for k, v in items))}"
+    return hashlib.sha256(canon.encode()).hexdigest()
+
+
+def _request_params(prep):
+    """Form parameters of a sent request (POST body), as a dict."""
+    body = prep.body
+    if not body:
+        return {}
+    if isinstance(body, bytes):
+        body = body.decode("utf-8", errors="replace")
+    return dict(parse_qsl(body, keep_blank_values=True))
+
+
+class ResponseArchive:
+    """
+    Content-addressed archive of raw HTTP responses.
+
+    data/.cache/raw/
+        objects/ab/cdef....zst   response bodies, named by sha256 of the body
+                                 (.gz when zstandard is not installed)
+        manifest/YYYY-MM-DD.ndjson
+                                 one line per response: request key
+                                 (method + URL + params), url, params, body sha,
+                                 status, capture time
+
+    Identical bodies are stored once. attach(session) archives every 200
+    response a session receives; the parsers can then be re-run over the
+    archive (see reparse.py) or the responses replayed through ReplaySession.
+    """
+
+    def __init__(self, root=ARCHIVE_DIR):
+        self.root = Path(root)
+        self.objects = self.root / "objects"
+        self.manifests = self.root / "manifest"
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+
+    def _object_path(self, sha, codec):
+        return self.objects / sha[:2] / f"{sha[2:]}.{codec}"
+
+    def _store(self, body):
+        sha = hashlib.sha256(body).hexdigest()
+        codec = "zst" if zstandard else "gz"
+        path = self._object_path(sha, codec)
+        if not path.exists():
+            path.parent.mkdir(parents=True, exist_ok=True)
+            data = zstandard.ZstdCompressor(level=10).compress(body) if zstandard else gzip.compress(body, 6)
+            tmp = path.with_name(f"{path.name}.{threading.get_ident()}.tmp")
+            with open(tmp, "wb") as f:
+                f.write(data)
+            os.replace(tmp, path)
+        return sha, codec
+
+    def put(self, method, url, params, body, status=200, day=None):
+        sha, codec = self._store(body)
+        day = day or str(dt_date.today())
+        entry = {
+            "key": request_key(method, url, params),
+            "day": day,
+            "method": method.upper(),
+            "url": url,
+            # Long values (ASP.NET __VIEWSTATE) are kept as their hash only
+            "params": {
+                k: v if len(str(v)) <= 256 else "sha256:" + hashlib.sha256(str(v).encode()).hexdigest()
+                for k, v in (params or {}).items()
+            },
+            "sha": sha,
+            "codec": codec,
+            "status": status,
+            "ts": round(time.time(), 3),
+        }
+        line = json.dumps(entry, separators=(",", ":")) + "\n"
+        with self._lock:
+            self.manifests.mkdir(parents=True, exist_ok=True)
+            with open(self.manifests / f"{day}.ndjson", "a", encoding="utf-8") as f:
+                f.write(line)
+        return entry
+
+    def _hook(self, resp, *args, **kwargs):
+        if resp.status_code != 200:
+            return
+        try:
+            prep = resp.request
+            self.put(prep.method, prep.url, _request_params(prep), resp.content, resp.status_code)
+        except Exception as e:  # archiving must never break a scrape
+            logger.warning(f"Archive: could not store {resp.url}: {e}")
+
+    def attach(self, session):
+        """Archive every successful response received by session. Returns session."""
+        session.hooks.setdefault("response", []).append(self._hook)
+        return session
+
+    # ------------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------------
+
+    def days(self):
+        return sorted(p.stem for p in self.manifests.glob("*.ndjson"))
+
+    def entries(self, day=None, url_contains=None):
+        """Manifest entries in capture order, optionally for one day / URL substring."""
+        for d in ([day] if day else self.days()):
+            path = self.manifests / f"{d}.ndjson"
+            if not path.exists():
+                continue
+            with open(path, encoding="utf-8") as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue  # torn final line from an interrupted run
+                    if url_contains is None or url_contains in entry["url"]:
+                        yield entry
+
+    def read(self, entry):
+        """Raw response body (bytes) of a manifest entry."""
+        with open(self._object_path(entry["sha"], entry["codec"]), "rb") as f:
+            data = f.read()
+        if entry["codec"] == "zst":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read .zst archive objects")
+            return zstandard.ZstdDecompressor().decompress(data)
+        return gzip.decompress(data)
+
+    def stats(self):
+        files = [p for p in self.objects.rglob("*") if p.is_file()]
+        return {
+            "days": len(self.days()),
+            "responses": sum(1 for _ in self.entries()),
+            "objects": len(files),
+            "bytes": sum(p.stat().st_size for p in files),
+        }
+
+
+class ReplaySession(requests.Session):
+    """
+    Session answering from a ResponseArchive instead of the network: each
+    request returns the latest archived body for the same method, URL and
+    parameters (404 when there is none). For deterministic benchmark runs.
+    """
+
+    def __init__(self, archive=None, day=None):
+        super().__init__()
+        self.archive = archive or ResponseArchive()
+        self._latest = {}
+        for entry in self.archive.entries(day):
+            self._latest[entry["key"]] = entry
+
+    def request(self, method, url, params=None, data=None, **kwargs):
+        form = dict(data) if isinstance(data, dict) else {}
+        if params:
+            url = f"{url}{'&' if '?' in url else '?'}{urlencode(params)}"
+        entry = self._latest.get(request_key(method, url, form))
+        resp = requests.Response()
+        resp.url = url
+        resp.request = requests.Request(method, url, data=form).prepare()
+        if entry is None:
+            resp.status_code = 404
+            resp._content = b""
+        else:
+            resp.status_code = entry["status"]
+            resp._content = self.archive.read(entry)
+            resp.encoding = "utf-8"
+        return resp
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Raw response archive")
+    parser.add_argument("--day", help="List one day's responses")
+    args = parser.parse_args()
+
+    archive = ResponseArchive()
+    if args.day:
+        for e in archive.entries(args.day):
+            print(f"{e['method']:4s} {e['url']}  {e['sha'][:12]}  {e['params'].get('start', '')}")
+    else:
+        print(json.dumps(archive.stats(), indent=2))
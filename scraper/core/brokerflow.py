@@ -0,0 +1,362 @@
+
+import os
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+CACHE_PATH = DATA_DIR / ".cache" / "broker_flow.npz"
+
+FLOORSHEET_FIELDS = ["date", "sn", "contract_no", "stock_symbol", "buyer", "seller", "quantity", "rate", "amount"]
+VALUES = ("quantity", "amount")
+
+
+def _day_num(days):
+    """'YYYY-MM-DD' strings -> days since epoch (int64)."""
+    return np.asarray(days, dtype="datetime64[D]").astype(np.int64)
+
+
+def _contract_day(contracts):
+    """contract_no (YYYYMMDD + 8 digits) -> trade day number."""
+    ymd = contracts // 100_000_000
+    months = (ymd // 10000 - 1970) * 12 + ymd // 100 % 100 - 1
+    return (months.astype("datetime64[M]").astype("datetime64[D]")
+            + (ymd % 100 - 1).astype("timedelta64[D]")).astype(np.int64)
+
+
+def _day_str(num):
+    return str(np.datetime64(int(num), "D"))
+
+
+class _RangeIndex:
+    """
+    Prefix sums of a value per key over days: range_sum(key, d0, d1) is two
+    binary searches. Built from (key, day, value) triplets.
+    """
+
+    def __init__(self, keys, days, values):
+        order = np.lexsort((days, keys))
+        keys, days, values = keys[order], days[order], values[order]
+        # Collapse repeated (key, day) first so each day is one step
+        if len(keys):
+            step = np.ones(len(keys), dtype=bool)
+            step[1:] = (keys[1:] != keys[:-1]) | (days[1:] != days[:-1])
+            starts = np.flatnonzero(step)
+            keys, days = keys[starts], days[starts]
+            values = np.add.reduceat(values, starts, axis=0)
+        self.keys, self.days = keys, days
+        self.cum = np.concatenate([np.zeros((1,) + values.shape[1:]), np.cumsum(values, axis=0)])
+
+    def range_sum(self, key, d0, d1):
+        lo, hi = np.searchsorted(self.keys, key, "left"), np.searchsorted(self.keys, key, "right")
+        i = lo + np.searchsorted(self.days[lo:hi], d0, "left")
+        j = lo + np.searchsorted(self.days[lo:hi], d1, "right")
+        return self.cum[j] - self.cum[i]
+
+
+class BrokerFlow:
+    """
+    Broker-to-broker flow over every stored floorsheet, kept in memory as
+    sparse triplets aggregated per trade day:
+
+        (day, buyer, seller, symbol) -> quantity, amount
+
+    Trades are counted once (by contract_no) under the trade date embedded in
+    the contract number. update() adds only trades not seen before, so it can
+    run after every scrape, live polls included. The aggregate is cached in
+    data/.cache/broker_flow.npz.
+
+    Broker x broker and broker x symbol matrices for any day range are sums
+    over the triplets; per-broker and per-pair range totals use prefix sums.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.day = np.array([], dtype=np.int64)
+        self.buyer = np.array([], dtype=np.int32)
+        self.seller = np.array([], dtype=np.int32)
+        self.sym = np.array([], dtype=np.int32)
+        self.values = np.zeros((0, len(VALUES)))
+        self.symbols = np.array([], dtype=str)
+        self.contracts = np.array([], dtype=np.int64)  # sorted, every trade counted
+        self.sources = {}                              # file name -> [size, mtime_ns]
+        self._index = {}
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                self.day, self.buyer, self.seller, self.sym = z["day"], z["buyer"], z["seller"], z["sym"]
+                self.values, self.symbols, self.contracts = z["values"], z["symbols"], z["contracts"]
+                self.sources = {str(n): [int(s), int(m)] for n, s, m in
+                                zip(z["source_names"], z["source_sizes"], z["source_mtimes"])}
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+        self._index = {}
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        names = sorted(self.sources)
+        np.savez_compressed(
+            tmp, day=self.day, buyer=self.buyer, seller=self.seller, sym=self.sym,
+            values=self.values, symbols=self.symbols, contracts=self.contracts,
+            source_names=np.array(names, dtype=str),
+            source_sizes=np.array([self.sources[n][0] for n in names], dtype=np.int64),
+            source_mtimes=np.array([self.sources[n][1] for n in names], dtype=np.int64),
+        )
+        os.replace(tmp, self.path)
+
+    # ------------------------------------------------------------------
+    # Build
+    # ------------------------------------------------------------------
+
+    def _symbol_ids(self, names):
+        """Symbol names -> stable ids, extending the vocabulary."""
+        new = np.setdiff1d(np.unique(names), self.symbols)
+        if len(new):
+            self.symbols = np.concatenate([self.symbols, new])
+        order = np.argsort(self.symbols)
+        return order[np.searchsorted(self.symbols[order], names)].astype(np.int32)
+
+    def add_table(self, table, compact=True):
+        """
+        Aggregate a 2-D str array of floorsheet rows (FLOORSHEET_FIELDS order)
+        into the flow, skipping contracts already counted. Returns #trades added.
+        """
+        from .quality import to_float
+
+        cn = np.char.strip(table[:, 2]) if len(table) else np.array([], dtype=str)
+        ok = (np.char.str_len(cn) == 16) & np.char.isdigit(cn)
+        ok &= np.char.isdigit(np.char.strip(table[:, 4])) & np.char.isdigit(np.char.strip(table[:, 5]))
+        table, cn = table[ok], cn[ok].astype(np.int64)
+        # First copy of each contract in this batch, and only unseen ones
+        cn, first = np.unique(cn, return_index=True)
+        table = table[first]
+        pos = np.searchsorted(self.contracts, cn)
+        seen = (pos < len(self.contracts)) & (self.contracts[np.minimum(pos, len(self.contracts) - 1)] == cn) \
+            if len(self.contracts) else np.zeros(len(cn), dtype=bool)
+        table, cn = table[~seen], cn[~seen]
+        if not len(cn):
+            return 0
+
+        days = _contract_day(cn)
+        buyer = np.char.strip(table[:, 4]).astype(np.int32)
+        seller = np.char.strip(table[:, 5]).astype(np.int32)
+        sym = self._symbol_ids(np.char.upper(np.char.strip(table[:, 3])))
+        values = np.column_stack([to_float(table[:, 6]), to_float(table[:, 8])])
+        values = np.nan_to_num(values)
+
+        self.day = np.concatenate([self.day, days]).astype(np.int64)
+        self.buyer = np.concatenate([self.buyer, buyer])
+        self.seller = np.concatenate([self.seller, seller])
+        self.sym = np.concatenate([self.sym, sym])
+        self.values = np.concatenate([self.values, values])
+        self.contracts = np.union1d(self.contracts, cn)
+        if compact:
+            self._compact()
+        return len(cn)
+
+    def _compact(self):
+        """Merge triplets with the same (day, buyer, seller, symbol)."""
+        # Pack the key into one int64: day | buyer (12 bits) | seller (12 bits) | symbol (16 bits)
+        key = ((self.day << 12 | self.buyer) << 12 | self.seller) << 16 | self.sym
+        uniq, inverse = np.unique(key, return_inverse=True)
+        values = np.zeros((len(uniq), len(VALUES)))
+        np.add.at(values, inverse.ravel(), self.values)
+        self.day = uniq >> 40
+        self.buyer = (uniq >> 28 & 0xFFF).astype(np.int32)
+        self.seller = (uniq >> 16 & 0xFFF).astype(np.int32)
+        self.sym = (uniq & 0xFFFF).astype(np.int32)
+        self.values = values
+        self._index = {}
+
+    def update(self, full=False):
+        """
+        Add floorsheet files that are new or changed since the last update (any
+        storage layout). full=True rebuilds from scratch. Returns #trades added.
+        """
+        from .storage import floorsheet_files, read_table
+
+        if full:
+            self.__init__(self.path)
+        added = 0
+        for path in floorsheet_files():
+            st = path.stat()
+            sig = [st.st_size, st.st_mtime_ns]
+            if self.sources.get(path.name) == sig:
+                continue
+            n = self.add_table(read_table(path, FLOORSHEET_FIELDS), compact=False)
+            self.sources[path.name] = sig
+            logger.info(f"{path.name}: +{n} trades")
+            added += n
+        if added:
+            self._compact()
+        if added or full:
+            self.save()
+        return added
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def _range(self, start=None, end=None, days=None):
+        """Day-number bounds; `days` counts calendar days back from end (or the last day)."""
+        last = int(self.day.max()) if len(self.day) else 0
+        d1 = int(_day_num([end])[0]) if end else last
+        if days:
+            return d1 - days + 1, d1
+        return (int(_day_num([start])[0]) if start else -(2 ** 62)), d1
+
+    def _symbol_id(self, symbol):
+        hit = np.flatnonzero(self.symbols == symbol.upper())
+        if not len(hit):
+            raise KeyError(f"No floorsheet trades for {symbol}")
+        return int(hit[0])
+
+    def _select(self, start=None, end=None, days=None, symbol=None):
+        d0, d1 = self._range(start, end, days)
+        mask = (self.day >= d0) & (self.day <= d1)
+        if symbol:
+            mask &= self.sym == self._symbol_id(symbol)
+        return mask
+
+    def brokers(self):
+        return np.union1d(self.buyer, self.seller)
+
+    def pair_matrix(self, start=None, end=None, days=None, symbol=None, value="amount"):
+        """
+        Dense (brokers x brokers) matrix M[i, j] = value bought by broker
+        brokers()[i] from broker brokers()[j] over the range. Returns (brokers, M).
+        """
+        brokers = self.brokers()
+        mask = self._select(start, end, days, symbol)
+        m = np.zeros((len(brokers), len(brokers)))
+        np.add.at(m, (np.searchsorted(brokers, self.buyer[mask]), np.searchsorted(brokers, self.seller[mask])),
+                  self.values[mask, VALUES.index(value)])
+        return brokers, m
+
+    def symbol_matrix(self, start=None, end=None, days=None, value="amount"):
+        """
+        Net (brokers x symbols) matrix: value bought minus value sold by each
+        broker in each symbol. Returns (brokers, symbols, M).
+        """
+        brokers = self.brokers()
+        mask = self._select(start, end, days)
+        v = self.values[mask, VALUES.index(value)]
+        m = np.zeros((len(brokers), len(self.symbols)))
+        np.add.at(m, (np.searchsorted(brokers, self.buyer[mask]), self.sym[mask]), v)
+        np.add.at(m, (np.searchsorted(brokers, self.seller[mask]), self.sym[mask]), -v)
+        return brokers, self.symbols, m
+
+    def _net_index(self):
+        """Prefix sums of (bought, sold) per (broker, symbol) and per broker (symbol -1)."""
+        if "net" not in self._index:
+            n_sym = len(self.symbols) + 1
+            sym = self.sym.astype(np.int64) + 1
+            side = np.concatenate([self.values, np.zeros_like(self.values)], axis=1)
+            sold = np.concatenate([np.zeros_like(self.values), self.values], axis=1)
+            keys = np.concatenate([self.buyer * n_sym + sym, self.seller * n_sym + sym,
+                                   self.buyer * n_sym, self.seller * n_sym]).astype(np.int64)
+            days = np.concatenate([self.day] * 4)
+            vals = np.concatenate([side, sold, side, sold])
+            self._index["net"] = (_RangeIndex(keys, days, vals), n_sym)
+        return self._index["net"]
+
+    def net_flow(self, broker, symbol=None, start=None, end=None, days=None):
+        """
+        {bought_quantity, sold_quantity, net_quantity, bought_amount, sold_amount,
+        net_amount} of one broker (in one symbol, or all) over the range.
+        """
+        index, n_sym = self._net_index()
+        key = int(broker) * n_sym + (self._symbol_id(symbol) + 1 if symbol else 0)
+        d0, d1 = self._range(start, end, days)
+        bq, ba, sq, sa = index.range_sum(key, d0, d1)
+        return {
+            "bought_quantity": float(bq), "sold_quantity": float(sq), "net_quantity": float(bq - sq),
+            "bought_amount": round(float(ba), 2), "sold_amount": round(float(sa), 2),
+            "net_amount": round(float(ba - sa), 2),
+        }
+
+    def pair_flow(self, buyer, seller, start=None, end=None, days=None):
+        """(quantity, amount) bought by `buyer` from `seller` over the range (prefix sums)."""
+        if "pair" not in self._index:
+            width = int(max(self.buyer.max(initial=0), self.seller.max(initial=0))) + 1
+            keys = self.buyer.astype(np.int64) * width + self.seller
+            self._index["pair"] = (_RangeIndex(keys, self.day, self.values), width)
+        index, width = self._index["pair"]
+        if max(int(buyer), int(seller)) >= width:
+            return 0.0, 0.0
+        d0, d1 = self._range(start, end, days)
+        q, a = index.range_sum(int(buyer) * width + int(seller), d0, d1)
+        return float(q), round(float(a), 2)
+
+    def top_counterparties(self, broker, n=10, start=None, end=None, days=None, symbol=None, value="amount"):
+        """Brokers `broker` traded most with: [(broker, bought_from, sold_to)], largest total first."""
+        brokers, m = self.pair_matrix(start, end, days, symbol, value)
+        i = np.searchsorted(brokers, int(broker))
+        if i >= len(brokers) or brokers[i] != int(broker):
+            return []
+        bought, sold = m[i], m[:, i]
+        order = np.argsort(-(bought + sold))[:n]
+        return [(int(brokers[k]), round(float(bought[k]), 2), round(float(sold[k]), 2))
+                for k in order if bought[k] + sold[k] > 0]
+
+    def stats(self):
+        return {
+            "triplets": len(self.day),
+            "trades": len(self.contracts),
+            "days": len(np.unique(self.day)),
+            "first_day": _day_str(self.day.min()) if len(self.day) else None,
+            "last_day": _day_str(self.day.max()) if len(self.day) else None,
+            "brokers": len(self.brokers()),
+            "symbols": len(self.symbols),
+            "memory_bytes": sum(a.nbytes for a in (self.day, self.buyer, self.seller, self.sym,
+                                                    self.values, self.contracts)),
+        }
+
+
+def load_flow(update=True):
+    """BrokerFlow from the cache, brought up to date with data/floorsheet/."""
+    flow = BrokerFlow().load()
+    if update:
+        flow.update()
+    return flow
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Broker-to-broker flow over the floorsheets")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_update = sub.add_parser("update", help="Add new floorsheets to the cache")
+    p_update.add_argument("--full", action="store_true", help="Rebuild from scratch")
+    for name, help_text in (("net", "Net flow of a broker"), ("top", "A broker's main counterparties")):
+        p = sub.add_parser(name, help=help_text)
+        p.add_argument("broker", type=int)
+        p.add_argument("symbol", nargs="?")
+        p.add_argument("--days", type=int, default=None, help="Calendar days back from the last day")
+        p.add_argument("--start")
+        p.add_argument("--end")
+    args = parser.parse_args()
+
+    if args.cmd == "update":
+        flow = BrokerFlow().load()
+        print(f"Added {flow.update(full=args.full)} trades")
+        print(flow.stats())
+    elif args.cmd == "net":
+        flow = load_flow()
+        print(flow.net_flow(args.broker, args.symbol, args.start, args.end, args.days))
+    else:
+        flow = load_flow()
+        for broker, bought, sold in flow.top_counterparties(args.broker, 10, args.start, args.end,
+                                                             args.days, args.symbol):
+            print(f"{broker:5d}  bought from {bought:16,.2f}  sold to {sold:16,.2f}")
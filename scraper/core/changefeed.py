@@ -0,0 +1,281 @@
+
+import os
+import re
+import csv
+import json
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+from .storage import open_text
+
+try:
+    import fcntl  # serializes writers across processes (POSIX only)
+except ImportError:
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+FEED_DIR = DATA_DIR / "changes"
+
+# dataset -> (globs under data/, column holding the row date)
+DATASETS = {
+    "prices": (["company-wise/*/prices.csv"], "date"),
+    "dividends": (["company-wise/*/dividend.csv"], "book_closure_date"),
+    "right_shares": (["company-wise/*/right-share.csv"], "opening_date"),
+    "floorsheet": (["floorsheet/floorsheet_*.csv", "floorsheet/floorsheet_*.csv.gz"], "date"),
+    "sector_index": (["sector_index.csv"], "date"),
+}
+
+_DATE_RE = re.compile(r"^\d{4}-\d{2}-\d{2}")
+
+
+def _sha256(path):
+    h = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 20), b""):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+def _dates(lines, column):
+    """Row dates (YYYY-MM-DD) of CSV lines whose header is lines[0]."""
+    reader = csv.reader(lines)
+    header = next(reader, [])
+    if column not in header:
+        return 0, []
+    i = header.index(column)
+    rows, dates = 0, []
+    for row in reader:
+        if not row:
+            continue
+        rows += 1
+        if i < len(row) and _DATE_RE.match(row[i]):
+            dates.append(row[i][:10])
+    return rows, dates
+
+
+def describe(path, column, old_size=None):
+    """
+    What a changed file now holds: total rows, and the rows / date range of
+    the change. When the file only grew (old_size given, cut on a line end),
+    the change is the appended tail; otherwise the whole file.
+    """
+    with open_text(path) as f:
+        text = f.read()
+    lines = text.splitlines()
+    rows, dates = _dates(lines, column)
+    info = {"rows": rows, "change": "rewritten" if old_size is not None else "added"}
+    changed = dates
+    if old_size and not str(path).endswith(".gz") and os.path.getsize(path) > old_size:
+        with open(path, "rb") as f:
+            f.seek(old_size - 1)
+            tail = f.read()
+        if tail[:1] == b"\n":
+            tail_rows, changed = _dates([lines[0]] + tail[1:].decode("utf-8", "replace").splitlines(), column)
+            info.update(change="appended", new_rows=tail_rows)
+    info.setdefault("new_rows", rows)
+    info["start"], info["end"] = (min(changed), max(changed)) if changed else (None, None)
+    return info
+
+
+class ChangeFeed:
+    """
+    Append-only log of what each scrape stage changed under data/:
+
+        data/changes/YYYY-MM.ndjson     one event per changed file
+
+        {"seq": 1041, "ts": "...", "run": "...", "stage": "prices",
+         "dataset": "prices", "symbol": "NABIL", "path": "company-wise/NABIL/prices.csv",
+         "change": "appended", "rows": 2731, "new_rows": 1,
+         "start": "2026-04-02", "end": "2026-04-02", "sha256": "...", "bytes": 141733}
+
+    begin() records the (size, mtime) of every tracked file; scan() after a
+    stage compares against it and logs one event per file added, changed or
+    deleted since. Consumers keep the last seq they processed and read on
+    from there (read_since), or follow serve.py's /changes/stream.
+    """
+
+    def __init__(self, root=DATA_DIR, feed_dir=None):
+        self.root = Path(root)
+        self.feed_dir = Path(feed_dir) if feed_dir else self.root / "changes"
+        self.run = datetime.now(timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+        self._baseline = {}
+        self._subscribers = []
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Tracking
+    # ------------------------------------------------------------------
+
+    def _files(self, dataset):
+        for pattern in DATASETS[dataset][0]:
+            for path in self.root.glob(pattern):
+                st = path.stat()
+                yield path.relative_to(self.root).as_posix(), (st.st_size, st.st_mtime_ns)
+
+    def begin(self, datasets=None):
+        """Remember the current state of the tracked files (start of a run)."""
+        with self._lock:
+            for dataset in datasets or DATASETS:
+                self._baseline[dataset] = dict(self._files(dataset))
+        return self
+
+    def scan(self, stage, datasets=None):
+        """Log every tracked file changed since begin() / the last scan. Returns the events."""
+        events = []
+        with self._lock:
+            for dataset in datasets or DATASETS:
+                before = self._baseline.get(dataset, {})
+                now = dict(self._files(dataset))
+                for rel in sorted(set(before) | set(now)):
+                    if before.get(rel) == now.get(rel):
+                        continue
+                    event = {"stage": stage, "dataset": dataset, "symbol": None, "path": rel}
+                    if rel.startswith("company-wise/"):
+                        event["symbol"] = rel.split("/")[1]
+                    if rel not in now:
+                        event.update(change="deleted", rows=0, new_rows=0, start=None, end=None)
+                    else:
+                        path = self.root / rel
+                        old_size = before[rel][0] if rel in before else None
+                        try:
+                            event.update(describe(path, DATASETS[dataset][1], old_size))
+                            event.update(sha256=_sha256(path), bytes=now[rel][0])
+                        except OSError as e:  # written to while we read: picked up by the next scan
+                            logger.warning(f"Change feed: could not read {rel}: {e}")
+                            now[rel] = before.get(rel)
+                            continue
+                    events.append(event)
+                self._baseline[dataset] = {k: v for k, v in now.items() if v is not None}
+            if events:
+                self._append(events)
+        for callback in list(self._subscribers):
+            try:
+                callback(events)
+            except Exception as e:  # a subscriber must never break a scrape
+                logger.warning(f"Change feed subscriber failed: {e}")
+        if events:
+            logger.info(f"Change feed: {len(events)} change(s) from stage '{stage}'")
+        return events
+
+    def subscribe(self, callback):
+        """Call callback(events) after every scan in this process."""
+        self._subscribers.append(callback)
+
+    # ------------------------------------------------------------------
+    # Log
+    # ------------------------------------------------------------------
+
+    def _feed_files(self):
+        return sorted(self.feed_dir.glob("*.ndjson"))
+
+    def last_seq(self):
+        """Highest seq logged so far (0 for an empty feed); reads only the end of the newest file."""
+        for path in reversed(self._feed_files()):
+            with open(path, "rb") as f:
+                f.seek(0, os.SEEK_END)
+                end = f.tell()
+                block = 1 << 16
+                while True:
+                    start = max(0, end - block)
+                    f.seek(start)
+                    lines = f.read(end - start).splitlines()
+                    if start > 0:
+                        lines = lines[1:]  # may start mid-line
+                    for line in reversed(lines):
+                        try:
+                            return json.loads(line)["seq"]
+                        except (ValueError, KeyError):
+                            continue
+                    if start == 0:
+                        break
+                    block *= 4
+        return 0
+
+    def _append(self, events):
+        self.feed_dir.mkdir(parents=True, exist_ok=True)
+        lock_path = self.root / ".cache" / "changefeed.lock"  # not in changes/, which is committed
+        lock_path.parent.mkdir(parents=True, exist_ok=True)
+        with open(lock_path, "a") as lock:
+            # Another process (a --live poller next to the pipeline) may be
+            # logging too: the next seq is read from disk under the lock
+            if fcntl:
+                fcntl.flock(lock, fcntl.LOCK_EX)
+            seq = self.last_seq()
+            ts = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            lines = []
+            for event in events:
+                seq += 1
+                event.update(seq=seq, ts=ts, run=self.run)
+                ordered = {k: event.get(k) for k in ("seq", "ts", "run", "stage", "dataset", "symbol", "path",
+                                                     "change", "rows", "new_rows", "start", "end",
+                                                     "sha256", "bytes")}
+                event.clear()
+                event.update(ordered)
+                lines.append(json.dumps(event, separators=(",", ":")) + "\n")
+            # One write per scan, O_APPEND: concurrent readers never see half a batch
+            with open(self.feed_dir / f"{ts[:7]}.ndjson", "a", encoding="utf-8") as f:
+                f.write("".join(lines))
+
+    def read_from(self, position=None, seq=0):
+        """
+        Events with seq > seq logged after position, a (file name, byte
+        offset) returned by an earlier call (None: from the start). Returns
+        (events, position), so a follower only reads what was appended since.
+        """
+        name, offset = position or ("", 0)
+        out = []
+        for path in self._feed_files():
+            if path.name < name:
+                continue
+            start = offset if path.name == name else 0
+            with open(path, "rb") as f:
+                f.seek(start)
+                chunk = f.read()
+            complete = chunk.rfind(b"\n") + 1  # a line still being written is read next time
+            for line in chunk[:complete].splitlines():
+                try:
+                    event = json.loads(line)
+                except ValueError:
+                    continue
+                if event.get("seq", 0) > seq:
+                    out.append(event)
+            name, offset = path.name, start + complete
+        return out, (name, offset) if name else position
+
+    def read_since(self, seq=0):
+        """Events with seq > seq, oldest first."""
+        return self.read_from(None, seq)[0]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Change feed of data/ (data/changes/*.ndjson)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_read = sub.add_parser("read", help="Print events after a sequence number")
+    p_read.add_argument("--since", type=int, default=0)
+    p_follow = sub.add_parser("follow", help="Print new events as they are logged")
+    p_follow.add_argument("--since", type=int, default=None, help="Default: the current end of the feed")
+    p_follow.add_argument("--interval", type=float, default=1.0)
+    args = parser.parse_args()
+
+    feed = ChangeFeed()
+    if args.cmd == "read":
+        for event in feed.read_since(args.since):
+            print(json.dumps(event))
+    else:
+        seq = feed.last_seq() if args.since is None else args.since
+        position = None
+        while True:
+            events, position = feed.read_from(position, seq)
+            for event in events:
+                print(json.dumps(event), flush=True)
+                seq = event["seq"]
+            time.sleep(args.interval)
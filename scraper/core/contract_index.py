@@ -0,0 +1,250 @@
+
+import os
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+# Derived from the day files, so it lives with the other rebuildable caches (not committed)
+INDEX_PATH = DATA_DIR / ".cache" / "contract_index.npz"
+
+# contract_no = YYYYMMDD + 8-digit sequence, e.g. 2026030305015611
+DAY_SPLIT = 10 ** 8
+# Largest per-day bitmap (bools); days with higher sequence numbers use a sorted lookup
+MAX_BITMAP = 1 << 24
+
+
+def _contracts(records):
+    """contract_no column of a record list as int64 (-1 where unparsable)."""
+    out = np.empty(len(records), dtype=np.int64)
+    for i, r in enumerate(records):
+        try:
+            out[i] = int(str(r.get("contract_no", "")).strip())
+        except ValueError:
+            out[i] = -1
+    return out
+
+
+class ContractIndex:
+    """
+    Persistent index of every floorsheet contract_no, per day file.
+
+    Stored in data/.cache/contract_index.npz as one sorted, delta-encoded
+    array per file date (consecutive contract numbers compress to almost
+    nothing) and rebuilt from the day files when missing. Membership checks
+    use a bitmap per trade day built from the 8-digit sequence part, so each
+    row is an O(1) lookup; a day whose sequence numbers exceed MAX_BITMAP is
+    looked up in its sorted sequence numbers instead.
+
+    The trade date embedded in contract_no is used to spot stale pages: a
+    file dated 2026-03-05 holding 20260303* contracts is reported as a
+    cross-day collision instead of being written again.
+    """
+
+    def __init__(self, path=INDEX_PATH):
+        self.path = Path(path)
+        self.files = None       # file date -> sorted unique int64 contracts
+        self._bitmaps = {}      # (trade day, excluded file) -> bool array
+
+    # ------------------------------------------------------------------
+    # Persistence
+    # ------------------------------------------------------------------
+
+    def load(self):
+        if self.files is not None:
+            return self
+        self.files = {}
+        if self.path.exists():
+            with np.load(self.path) as npz:
+                for date in npz.files:
+                    self.files[date] = np.cumsum(npz[date])
+        else:
+            self.rebuild()
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.stem + ".tmp.npz")
+        arrays = {date: np.diff(c, prepend=0) for date, c in sorted(self.files.items())}
+        np.savez_compressed(tmp, **arrays)
+        os.replace(tmp, self.path)
+
+    def rebuild(self):
+        """Re-index every floorsheet day on disk (plain, compressed or rolled up)."""
+        from .storage import iter_floorsheet_days
+
+        self.files = {}
+        self._bitmaps.clear()
+        for day, rows, _ in iter_floorsheet_days():
+            contracts = _contracts(rows)
+            self.files[day] = np.unique(contracts[contracts >= 0])
+        logger.info(f"Contract index rebuilt from {len(self.files)} floorsheet files")
+        self.save()
+        return self
+
+    # ------------------------------------------------------------------
+    # Lookups
+    # ------------------------------------------------------------------
+
+    def _bitmap(self, day, exclude):
+        """Bool bitmap over the day's sequence numbers, or their sorted array if too large."""
+        key = (day, exclude)
+        if key not in self._bitmaps:
+            lo, hi = day * DAY_SPLIT, (day + 1) * DAY_SPLIT
+            parts = []
+            for date, c in self.files.items():
+                if date == exclude:
+                    continue
+                i, j = np.searchsorted(c, [lo, hi])
+                parts.append(c[i:j] - lo)
+            seq = np.concatenate(parts) if parts else np.empty(0, dtype=np.int64)
+            if len(seq) and seq.max() >= MAX_BITMAP:
+                self._bitmaps[key] = np.unique(seq)
+            else:
+                bitmap = np.zeros(int(seq.max()) + 1 if len(seq) else 0, dtype=bool)
+                bitmap[seq] = True
+                self._bitmaps[key] = bitmap
+        return self._bitmaps[key]
+
+    def known(self, contracts, exclude=None):
+        """Boolean mask: which contracts are already indexed (ignoring file `exclude`)."""
+        self.load()
+        mask = np.zeros(len(contracts), dtype=bool)
+        days = contracts // DAY_SPLIT
+        for day in np.unique(days[contracts >= 0]):
+            rows = np.flatnonzero(days == day)
+            seq = contracts[rows] - day * DAY_SPLIT
+            bitmap = self._bitmap(int(day), exclude)
+            if bitmap.dtype != bool:
+                mask[rows] = np.isin(seq, bitmap)
+                continue
+            inside = seq < len(bitmap)
+            mask[rows[inside]] = bitmap[seq[inside]]
+        return mask
+
+    def owners(self, contract):
+        """File dates whose floorsheet contains the given contract_no."""
+        self.load()
+        contract = int(contract)
+        return [
+            date for date, c in sorted(self.files.items())
+            if (i := np.searchsorted(c, contract)) < len(c) and c[i] == contract
+        ]
+
+    # ------------------------------------------------------------------
+    # Writer integration
+    # ------------------------------------------------------------------
+
+    def filter_new(self, records, file_date, replace=True):
+        """
+        Drop rows that would duplicate a trade, before writing floorsheet_{file_date}.csv.
+
+        replace=True  -> the day file is about to be overwritten, so its own
+                         indexed contracts do not count as duplicates.
+        replace=False -> rows are appended, so contracts already in the file are dropped.
+
+        Rows whose contract_no does not parse cannot be checked; they are kept
+        (the quality gate quarantines them) and counted as unparsable.
+
+        Returns (kept_records, report) where report counts batch duplicates,
+        rows already stored in other day files, unparsable contract numbers
+        and rows whose contract trade date differs from file_date.
+        """
+        self.load()
+        contracts = _contracts(records)
+        parsed = contracts >= 0
+        keep = np.ones(len(contracts), dtype=bool)
+
+        # Repeated rows within the batch: keep the first occurrence
+        _, first = np.unique(contracts, return_index=True)
+        unique_mask = ~parsed
+        unique_mask[first] = True
+        batch_dupes = int(np.count_nonzero(~unique_mask))
+        keep &= unique_mask
+
+        known = self.known(contracts, exclude=file_date if replace else None) & keep
+        keep &= ~known
+
+        trade_day = int(file_date.replace("-", "")) if file_date else None
+        foreign = (contracts // DAY_SPLIT != trade_day) & (contracts >= 0)
+
+        collisions = {}
+        if known.any():
+            for date, c in sorted(self.files.items()):
+                if replace and date == file_date:
+                    continue
+                n = int(np.count_nonzero(np.isin(contracts[known], c, assume_unique=True)))
+                if n:
+                    collisions[date] = n
+
+        report = {
+            "rows": len(records),
+            "kept": int(np.count_nonzero(keep)),
+            "batch_duplicates": batch_dupes,
+            "already_indexed": int(np.count_nonzero(known)),
+            "unparsable": int(np.count_nonzero(~parsed)),
+            "foreign_trade_date": int(np.count_nonzero(foreign)),
+            "collides_with": collisions,
+        }
+        return [r for r, k in zip(records, keep) if k], report
+
+    def record(self, file_date, records, replace=True):
+        """Register the contracts just written to floorsheet_{file_date}.csv and persist."""
+        self.load()
+        contracts = _contracts(records)
+        contracts = contracts[contracts >= 0]
+        if not replace and file_date in self.files:
+            contracts = np.concatenate([self.files[file_date], contracts])
+        self.files[file_date] = np.unique(contracts)
+        self._bitmaps.clear()
+        self.save()
+
+    def check(self):
+        """
+        Integrity report over the whole index: contracts present in more than
+        one day file, and files whose contracts belong to another trade date.
+        """
+        self.load()
+        dates = sorted(self.files)
+        if not dates:
+            return {"files": 0, "contracts": 0, "duplicated": 0, "stale_files": {}}
+        allc = np.concatenate([self.files[d] for d in dates])
+        uniq, counts = np.unique(allc, return_counts=True)
+
+        stale = {}
+        for d in dates:
+            c = self.files[d]
+            day = int(d.replace("-", ""))
+            off = np.count_nonzero(c // DAY_SPLIT != day)
+            if off:
+                days = np.unique(c // DAY_SPLIT)
+                stale[d] = {"rows": int(off), "trade_dates": [str(x) for x in days]}
+
+        return {
+            "files": len(dates),
+            "contracts": int(len(allc)),
+            "unique": int(len(uniq)),
+            "duplicated": int(np.count_nonzero(counts > 1)),
+            "stale_files": stale,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Floorsheet contract_no index")
+    parser.add_argument("--rebuild", action="store_true", help="Re-index all floorsheet CSVs")
+    args = parser.parse_args()
+
+    index = ContractIndex()
+    if args.rebuild:
+        index.rebuild()
+    report = index.check()
+    print(f"Files: {report['files']}  contracts: {report['contracts']}  "
+          f"unique: {report.get('unique', 0)}  duplicated: {report['duplicated']}")
+    for date, info in report["stale_files"].items():
+        print(f"  floorsheet_{date}.csv: {info['rows']} rows from trade date(s) {', '.join(info['trade_dates'])}")
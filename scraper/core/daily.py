@@ -1,31 +1,38 @@
 
 import logging
 import argparse
-import time
 import json
 from pathlib import Path
 
 from .history import ShareSansarHistoryScraper
 
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("daily_scraper.log")
-    ]
-)
 logger = logging.getLogger(__name__)
 
 
+def setup_logging():
+    """Console + daily_scraper.log logging for the price-update entry points."""
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.StreamHandler(),
+            logging.FileHandler("daily_scraper.log")
+        ]
+    )
+
+
 class DailyScraperManager:
     """
     Manages daily scraping tasks for priority companies (company_list.json):
       - Price history updates via ShareSansar (history.py)
     """
 
-    def __init__(self, base_dir="data"):
-        self.price_scraper = ShareSansarHistoryScraper()
+    def __init__(self, base_dir="data", session=None, bootstrap=None, calendar=None, shard=None):
+        self.shard = shard
+        self.price_scraper = ShareSansarHistoryScraper(
+            session=session, bootstrap=bootstrap, company_dir=shard.company_dir if shard else None
+        )
+        self._calendar = calendar
 
         self.data_dir = Path(__file__).resolve().parent.parent.parent / "data"
         self.company_wise_dir = self.data_dir / "company-wise"
@@ -39,12 +46,23 @@ class DailyScraperManager:
         list_path = self.data_dir / "company_list.json"
         if not list_path.exists():
             logger.warning("company_list.json not found — falling back to all mapped companies.")
-            mapping = self.price_scraper._load_company_id_map(force_update=True)
+            from .discovery import CompanyDiscovery
+            discovery = CompanyDiscovery(
+                session=self.price_scraper.session, bootstrap=self.price_scraper.bootstrap
+            )
+            mapping = discovery.load_mapping(force_update=True)
             return set(mapping.keys())
 
         with open(list_path) as f:
             return set(json.load(f))
 
+    @property
+    def calendar(self):
+        if self._calendar is None:
+            from .trading_calendar import load_calendar
+            self._calendar = load_calendar()
+        return self._calendar
+
     def get_existing_companies(self):
         """Return symbols that already have a prices.csv."""
         if not self.company_wise_dir.exists():
@@ -58,49 +76,67 @@ class DailyScraperManager:
     # Price scraping
     # ------------------------------------------------------------------
 
-    def _update_prices(self, symbols, force_full=False):
-        """Scrape / update prices.csv for the given symbols."""
+    def _update_prices(self, symbols, force_full=False, deadline=None):
+        """
+        Scrape / update prices.csv for the given symbols, most valuable first
+        (new companies, then most missing sessions, then most liquid) until
+        the deadline passes. Unreached symbols are queued for the next run.
+        """
+        from .workqueue import WorkQueue
+
         existing = self.get_existing_companies()
         new_companies = symbols - existing
         existing_priority = symbols & existing
 
         logger.info(f"Prices — new: {len(new_companies)}, existing: {len(existing_priority)}")
 
-        # New companies: full history
-        for i, sym in enumerate(sorted(new_companies), 1):
-            try:
-                logger.info(f"  [NEW {i}/{len(new_companies)}] Full price scrape: {sym}")
+        # Existing companies already holding the latest expected session need no request
+        if not force_full:
+            expected = self.calendar.latest_expected_session()
+            complete = {s for s in existing_priority if self.calendar.is_complete(s)}
+            if complete:
+                logger.info(f"Prices — {len(complete)} companies already up to {expected}, skipping")
+            existing_priority -= complete
+
+        staleness = {s: float("inf") for s in new_companies}
+        for sym in existing_priority:
+            pending = self.calendar.pending_sessions(sym)
+            staleness[sym] = float("inf") if pending is None else len(pending)
+
+        def update(sym):
+            if sym in new_companies:
+                # New companies: full history
+                logger.info(f"  Full price scrape: {sym}")
                 records = self.price_scraper.scrape_company_history(sym)
-                if records:
-                    self.price_scraper.update_company_csv(sym, records)
-                    logger.info(f"    Saved {len(records)} records")
-                else:
+                if not records:
                     logger.warning(f"    No data found for {sym}")
-            except Exception as e:
-                logger.error(f"    Failed {sym}: {e}")
-            time.sleep(1)
-
-        # Existing companies: incremental (stop early once we hit known dates)
-        for i, sym in enumerate(sorted(existing_priority), 1):
-            try:
-                stop_date = self.price_scraper.get_latest_date(sym)
-                logger.info(f"  [UPD {i}/{len(existing_priority)}] Prices: {sym} (newest: {stop_date})")
-                records = self.price_scraper.scrape_company_history(sym, stop_date=stop_date)
-                if records:
-                    self.price_scraper.update_company_csv(sym, records)
-                    logger.info(f"    +{len(records)} records")
-                else:
-                    logger.info(f"    No new data")
-            except Exception as e:
-                logger.error(f"    Failed {sym}: {e}")
-            time.sleep(1)
+                    return False
+                self.price_scraper.update_company_csv(sym, records)
+                logger.info(f"    Saved {len(records)} records")
+                return True
+            # Existing companies: incremental (stop early once we hit known dates)
+            stop_date = self.price_scraper.get_latest_date(sym)
+            logger.info(f"  Prices: {sym} (newest: {stop_date}, missing: {staleness[sym]})")
+            records = self.price_scraper.scrape_company_history(sym, stop_date=stop_date)
+            if records:
+                self.price_scraper.update_company_csv(sym, records)
+                logger.info(f"    +{len(records)} records")
+            else:
+                logger.info(f"    No new data")
+            return True
+
+        queue = self.shard.queue("prices", deadline) if self.shard else WorkQueue("prices", deadline)
+        queue.run(
+            new_companies | existing_priority, update, staleness=staleness, delay=lambda: 1,
+        )
 
 
     # ------------------------------------------------------------------
     # Main entry point
     # ------------------------------------------------------------------
 
-    def run_daily_update(self, check_new_only=False, force_full=False, priority_only=True):
+    def run_daily_update(self, check_new_only=False, force_full=False, priority_only=True,
+                         deadline=None):
         """
         Run the daily update:
           - Refresh company ID mapping (catches new IPOs)
@@ -109,20 +145,26 @@ class DailyScraperManager:
         :param check_new_only: Only scrape NEW companies (prices), skip existing.
         :param force_full:     Force full re-scrape of prices.
         :param priority_only:  Use company_list.json filter (always True in practice).
+        :param deadline:       core.workqueue.Deadline bounding the run (None = unlimited).
+
+        With a shard (core/shard.py) only the symbols hashing to it are updated,
+        and their new rows go to the shard directory for a later merge.
         """
         logger.info("=== Daily Update Started ===")
 
         target = self.get_priority_companies()
         logger.info(f"Priority companies: {len(target)}")
+        if self.shard:
+            target = set(self.shard.prepare(target))
 
         if not check_new_only:
             logger.info("--- Updating prices ---")
-            self._update_prices(target, force_full=force_full)
+            self._update_prices(target, force_full=force_full, deadline=deadline)
         else:
             logger.info("--- New companies only (prices) ---")
             existing = self.get_existing_companies()
             new_only = target - existing
-            self._update_prices(new_only, force_full=False)
+            self._update_prices(new_only, force_full=False, deadline=deadline)
 
         logger.info("=== Daily Update Completed ===")
 
@@ -133,6 +175,7 @@ if __name__ == "__main__":
     parser.add_argument("--full-scrape", action="store_true", help="Force full price re-scrape")
     args = parser.parse_args()
 
+    setup_logging()
     manager = DailyScraperManager()
     manager.run_daily_update(
         check_new_only=args.new_only,
@@ -1,11 +1,24 @@
 
+import io
+import csv
+import sys
 import requests
-import pandas as pd
 from pathlib import Path
 from bs4 import BeautifulSoup
 import logging
 
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+if not __package__:  # run as a script: python scraper/core/daily_prices.py
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    __package__ = "core"
+
+from .httpcache import HttpCache
+from .quality import gate_prices
+
+try:
+    from .indicators import IndicatorEngine
+except ImportError:
+    IndicatorEngine = None
+
 logger = logging.getLogger(__name__)
 
 class DailySummaryUpdater:
@@ -14,12 +27,17 @@ class DailySummaryUpdater:
     This is the simplest and most reliable method for daily updates.
     """
     
-    def __init__(self):
+    def __init__(self, session=None):
         self.url = "https://www.sharesansar.com/today-share-price"
+        self.session = session or requests.Session()
         self.data_dir = Path(__file__).parent.parent.parent / "data" / "company-wise"
         
     def update_all_companies(self, priority_only=True):
         """Fetch today's data and update all company CSVs"""
+        import pandas as pd  # heavy (and pulls lxml via read_html) — only needed here
+
+        indicators = IndicatorEngine() if IndicatorEngine else None
+
         logger.info(f"Fetching data from {self.url}...")
         
         # Load priority list if requested
@@ -37,7 +55,7 @@ class DailySummaryUpdater:
         
         try:
             # Fetch the page
-            response = requests.get(self.url, timeout=30)
+            response = self.session.get(self.url, timeout=30)
             html = response.text
             soup = BeautifulSoup(html, "lxml")
             
@@ -51,7 +69,7 @@ class DailySummaryUpdater:
             logger.info(f"Market date: {today}")
             
             # Parse the price table using pandas
-            tables = pd.read_html(html)
+            tables = pd.read_html(io.StringIO(html))  # newer pandas reads a bare string as a path
             if not tables:
                 logger.error("No tables found on page")
                 return 0
@@ -81,6 +99,7 @@ class DailySummaryUpdater:
                      continue
                 
                 # Check if data already exists for today
+                prev_close = None
                 try:
                     existing_df = pd.read_csv(csv_file)
                     if len(existing_df) > 0:
@@ -89,6 +108,11 @@ class DailySummaryUpdater:
                         if last_date == today:
                             skipped_count += 1
                             continue  # Already have today's data
+                        # Newest stored session (the file is not sorted) for the price-move check
+                        dates = existing_df['date'].astype(str)
+                        newest = existing_df.loc[dates.idxmax()]
+                        if dates.max() < today and float(newest.get('ltp') or 0) > 0:
+                            prev_close = float(newest['ltp'])
                 except (KeyError, FileNotFoundError) as e:
                     logger.warning(f"Error reading {symbol}/prices.csv: {e}")
                     continue
@@ -100,7 +124,7 @@ class DailySummaryUpdater:
                     row = symbol_data.iloc[0]
                     
                     # Create new row matching our CSV format
-                    new_row = pd.DataFrame([{
+                    new_row = {
                         'date': today,
                         'open': float(row['Open']),
                         'high': float(row['High']),
@@ -109,11 +133,23 @@ class DailySummaryUpdater:
                         'percent_change': float(row['Diff %']),
                         'qty': int(float(row['Vol'])),
                         'turnover': float(row['Turnover'])
-                    }])
+                    }
+
+                    # Quality gate: a row breaking an invariant goes to data/quarantine/prices.csv
+                    kept, _ = gate_prices(symbol, [new_row], prev_close=prev_close)
+                    if not kept:
+                        continue
                     
                     # Append to CSV
-                    new_row.to_csv(csv_file, mode='a', header=False, index=False)
+                    with open(csv_file, 'a', newline='') as f:
+                        csv.DictWriter(f, fieldnames=list(new_row)).writerow(new_row)
                     updated_count += 1
+
+                    if indicators:
+                        try:
+                            indicators.update_symbol(symbol)
+                        except Exception as e:
+                            logger.warning(f"Could not update indicators for {symbol}: {e}")
                     
                 elif len(symbol_data) == 0:
                     logger.debug(f"No data found for {symbol} (not traded today)")
@@ -132,5 +168,6 @@ class DailySummaryUpdater:
             return 0
 
 if __name__ == "__main__":
-    updater = DailySummaryUpdater()
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    updater = DailySummaryUpdater(HttpCache().attach(requests.Session()))
     updater.update_all_companies()
@@ -0,0 +1,339 @@
+
+import csv
+import json
+import sqlite3
+import logging
+import argparse
+from pathlib import Path
+
+from .storage import file_key, floorsheet_files, read_csv
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+FLOORSHEET_DIR = DATA_DIR / "floorsheet"
+DB_PATH = DATA_DIR / ".cache" / "nepse.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS companies (
+    symbol      TEXT PRIMARY KEY,
+    company_id  INTEGER,
+    priority    INTEGER NOT NULL DEFAULT 0
+);
+CREATE TABLE IF NOT EXISTS prices (
+    symbol          TEXT NOT NULL,
+    date            TEXT NOT NULL,
+    open            REAL,
+    high            REAL,
+    low             REAL,
+    ltp             REAL,
+    percent_change  REAL,
+    qty             INTEGER,
+    turnover        REAL,
+    PRIMARY KEY (symbol, date)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_prices_date ON prices (date);
+CREATE TABLE IF NOT EXISTS dividends (
+    symbol             TEXT NOT NULL,
+    fiscal_year        TEXT,
+    bonus_share        REAL,
+    cash_dividend      REAL,
+    total_dividend     REAL,
+    book_closure_date  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_dividends_symbol ON dividends (symbol, book_closure_date);
+CREATE TABLE IF NOT EXISTS right_shares (
+    symbol         TEXT NOT NULL,
+    ratio          TEXT,
+    total_units    REAL,
+    issue_price    REAL,
+    opening_date   TEXT,
+    closing_date   TEXT,
+    status         TEXT,
+    issue_manager  TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_right_shares_symbol ON right_shares (symbol, opening_date);
+CREATE TABLE IF NOT EXISTS floorsheet (
+    date         TEXT NOT NULL,
+    contract_no  INTEGER NOT NULL,
+    sn           INTEGER,
+    symbol       TEXT NOT NULL,
+    buyer        INTEGER,
+    seller       INTEGER,
+    quantity     REAL,
+    rate         REAL,
+    amount       REAL,
+    PRIMARY KEY (date, contract_no)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_floorsheet_symbol ON floorsheet (symbol, date);
+CREATE INDEX IF NOT EXISTS idx_floorsheet_buyer ON floorsheet (date, buyer);
+CREATE INDEX IF NOT EXISTS idx_floorsheet_seller ON floorsheet (date, seller);
+CREATE TABLE IF NOT EXISTS ingested_files (
+    path      TEXT PRIMARY KEY,
+    mtime_ns  INTEGER NOT NULL,
+    size      INTEGER NOT NULL
+);
+"""
+
+
+def _num(value, cast=float):
+    """'35,343.00' -> 35343.0; blanks and junk -> None."""
+    if value is None:
+        return None
+    value = str(value).replace(",", "").replace("%", "").strip()
+    if not value:
+        return None
+    try:
+        number = float(value)
+    except ValueError:
+        return None
+    return int(number) if cast is int else number
+
+
+def _clean_date(value):
+    """'2025-12-31 [Closed]' -> '2025-12-31'."""
+    return (value or "").split(" ")[0].strip() or None
+
+
+class NepseDatabase:
+    """
+    Optional SQLite mirror of the data/ directory for fast ad-hoc queries.
+    The CSV files stay the source of truth: build() re-ingests only the files
+    whose mtime/size changed since the last run, replacing that file's rows.
+    """
+
+    def __init__(self, db_path=DB_PATH):
+        self.db_path = Path(db_path)
+        self.db_path.parent.mkdir(parents=True, exist_ok=True)
+        self.conn = sqlite3.connect(self.db_path)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(SCHEMA)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def close(self):
+        self.conn.close()
+
+    # ------------------------------------------------------------------
+    # Ingest
+    # ------------------------------------------------------------------
+
+    def _changed(self, path):
+        st = path.stat()
+        row = self.conn.execute(
+            "SELECT mtime_ns, size FROM ingested_files WHERE path = ?", (str(path),)
+        ).fetchone()
+        return row is None or (row["mtime_ns"], row["size"]) != (st.st_mtime_ns, st.st_size)
+
+    def _mark(self, path):
+        st = path.stat()
+        self.conn.execute(
+            "INSERT OR REPLACE INTO ingested_files (path, mtime_ns, size) VALUES (?, ?, ?)",
+            (str(path), st.st_mtime_ns, st.st_size),
+        )
+
+    @staticmethod
+    def _read_csv(path):
+        with open(path, newline="", encoding="utf-8") as f:
+            return list(csv.DictReader(f))
+
+    def _ingest_prices(self, symbol, path):
+        rows = [
+            (symbol, r["date"], _num(r.get("open")), _num(r.get("high")), _num(r.get("low")),
+             _num(r.get("ltp")), _num(r.get("percent_change")), _num(r.get("qty"), int),
+             _num(r.get("turnover")))
+            for r in self._read_csv(path) if r.get("date")
+        ]
+        self.conn.execute("DELETE FROM prices WHERE symbol = ?", (symbol,))
+        # Duplicate dates from mixed-order appends: the row written last wins
+        self.conn.executemany("INSERT OR REPLACE INTO prices VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _ingest_dividends(self, symbol, path):
+        rows = [
+            (symbol, r.get("fiscal_year"), _num(r.get("bonus_share")), _num(r.get("cash_dividend")),
+             _num(r.get("total_dividend")), _clean_date(r.get("book_closure_date")))
+            for r in self._read_csv(path)
+        ]
+        self.conn.execute("DELETE FROM dividends WHERE symbol = ?", (symbol,))
+        self.conn.executemany("INSERT INTO dividends VALUES (?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _ingest_right_shares(self, symbol, path):
+        rows = [
+            (symbol, (r.get("ratio") or "").replace(" ", ""), _num(r.get("total_units")),
+             _num(r.get("issue_price")), _clean_date(r.get("opening_date")),
+             _clean_date(r.get("closing_date")), r.get("status"), r.get("issue_manager"))
+            for r in self._read_csv(path)
+        ]
+        self.conn.execute("DELETE FROM right_shares WHERE symbol = ?", (symbol,))
+        self.conn.executemany("INSERT INTO right_shares VALUES (?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _ingest_floorsheet(self, path, day_files=()):
+        # The file name is the partition key; a stale re-run can leave another
+        # day's date inside the rows, so rows are stored under the file's date.
+        # Monthly roll-ups (core/storage.py) keep each row's original file date.
+        key = file_key(path)
+        rows = [
+            (key if len(key) == 10 else r.get("date"),
+             _num(r.get("contract_no"), int), _num(r.get("sn"), int),
+             r.get("stock_symbol"), _num(r.get("buyer"), int), _num(r.get("seller"), int),
+             _num(r.get("quantity")), _num(r.get("rate")), _num(r.get("amount")))
+            for r in read_csv(path)
+            if r.get("contract_no") and (len(key) == 10 or r.get("date") not in day_files)
+        ]
+        for date in {row[0] for row in rows}:
+            self.conn.execute("DELETE FROM floorsheet WHERE date = ?", (date,))
+        self.conn.executemany("INSERT OR REPLACE INTO floorsheet VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)", rows)
+        return len(rows)
+
+    def _forget_missing(self, files, day_files):
+        """
+        Drop the rows of ingested files that no longer exist (deleted, or
+        renamed, e.g. day files rolled into a monthly floorsheet_YYYY-MM.csv.gz).
+        Floorsheet files still covering a forgotten date are unmarked so that
+        build() re-reads them. Returns True when a company list file went away.
+        """
+        company_tables = {"prices.csv": "prices", "dividend.csv": "dividends", "right-share.csv": "right_shares"}
+        missing = [Path(r["path"]) for r in self.conn.execute("SELECT path FROM ingested_files")
+                   if not Path(r["path"]).exists()]
+        meta_gone = False
+        for path in missing:
+            if path.parent == FLOORSHEET_DIR:
+                key = file_key(path)
+                if len(key) == 10:
+                    self.conn.execute("DELETE FROM floorsheet WHERE date = ?", (key,))
+                else:
+                    dates = {r["date"] for r in self.conn.execute(
+                        "SELECT DISTINCT date FROM floorsheet WHERE date LIKE ?", (key + "-%",))}
+                    for date in dates - day_files:
+                        self.conn.execute("DELETE FROM floorsheet WHERE date = ?", (date,))
+                for other in files:
+                    if file_key(other) in (key, key[:7]) or file_key(other)[:7] == key:
+                        self.conn.execute("DELETE FROM ingested_files WHERE path = ?", (str(other),))
+            elif path.name in company_tables and path.parent.parent == COMPANY_WISE:
+                self.conn.execute(f"DELETE FROM {company_tables[path.name]} WHERE symbol = ?",
+                                  (path.parent.name,))
+            else:
+                meta_gone = True
+            self.conn.execute("DELETE FROM ingested_files WHERE path = ?", (str(path),))
+            logger.info(f"DB: dropped rows of removed file {path.name}")
+        return meta_gone
+
+    def _ingest_companies(self):
+        mapping_path = DATA_DIR / "company_id_mapping.json"
+        list_path = DATA_DIR / "company_list.json"
+        mapping = json.loads(mapping_path.read_text()) if mapping_path.exists() else {}
+        priority = set(json.loads(list_path.read_text())) if list_path.exists() else set()
+        symbols = set(mapping) | priority
+        self.conn.execute("DELETE FROM companies")
+        self.conn.executemany(
+            "INSERT INTO companies VALUES (?, ?, ?)",
+            [(s, mapping.get(s), int(s in priority)) for s in sorted(symbols)],
+        )
+        return len(symbols)
+
+    def build(self, full=False):
+        """
+        Ingest new or changed CSV files and drop the rows of files removed
+        since the last run. With full=True every file is re-read.
+        Returns {table: rows ingested}.
+        """
+        if full:
+            for table in ("ingested_files", "prices", "dividends", "right_shares", "floorsheet"):
+                self.conn.execute(f"DELETE FROM {table}")
+
+        counts = {"companies": 0, "prices": 0, "dividends": 0, "right_shares": 0, "floorsheet": 0}
+        company_files = {
+            "prices.csv": ("prices", self._ingest_prices),
+            "dividend.csv": ("dividends", self._ingest_dividends),
+            "right-share.csv": ("right_shares", self._ingest_right_shares),
+        }
+
+        files = floorsheet_files()
+        day_files = {file_key(p) for p in files if len(file_key(p)) == 10}
+
+        with self.conn:
+            meta_gone = self._forget_missing(files, day_files)
+
+            meta = [p for p in (DATA_DIR / "company_id_mapping.json", DATA_DIR / "company_list.json") if p.exists()]
+            if meta_gone or any(self._changed(p) for p in meta):
+                counts["companies"] = self._ingest_companies()
+                for path in meta:
+                    self._mark(path)
+
+            if COMPANY_WISE.exists():
+                for sym_dir in sorted(COMPANY_WISE.iterdir()):
+                    if not sym_dir.is_dir():
+                        continue
+                    for name, (table, ingest) in company_files.items():
+                        path = sym_dir / name
+                        if path.exists() and self._changed(path):
+                            counts[table] += ingest(sym_dir.name, path)
+                            self._mark(path)
+
+            for path in files:
+                if self._changed(path):
+                    counts["floorsheet"] += self._ingest_floorsheet(path, day_files)
+                    self._mark(path)
+
+        logger.info("DB ingest: " + ", ".join(f"{k}={v}" for k, v in counts.items()))
+        return counts
+
+    # ------------------------------------------------------------------
+    # Query API
+    # ------------------------------------------------------------------
+
+    def query(self, sql, params=()):
+        """Run arbitrary SQL and return a list of dicts."""
+        return [dict(r) for r in self.conn.execute(sql, params)]
+
+    def prices(self, symbol, start=None, end=None):
+        """Price rows for a symbol, oldest first, optionally within [start, end]."""
+        return self.query(
+            "SELECT * FROM prices WHERE symbol = ? AND date >= ? AND date <= ? ORDER BY date",
+            (symbol.upper(), start or "0000-00-00", end or "9999-99-99"),
+        )
+
+    def floorsheet(self, date, symbol=None, broker=None):
+        """A day's trades, optionally filtered by symbol and/or broker (either side)."""
+        sql = "SELECT * FROM floorsheet WHERE date = ?"
+        params = [date]
+        if symbol:
+            sql += " AND symbol = ?"
+            params.append(symbol.upper())
+        if broker is not None:
+            sql += " AND (buyer = ? OR seller = ?)"
+            params += [int(broker), int(broker)]
+        return self.query(sql + " ORDER BY contract_no", params)
+
+    def latest_date(self):
+        row = self.conn.execute("SELECT MAX(date) AS d FROM prices").fetchone()
+        return row["d"]
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Local SQLite query layer over data/")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Ingest new / changed CSV files")
+    build.add_argument("--full", action="store_true", help="Re-ingest every file")
+    q = sub.add_parser("query", help="Run a SQL query and print the rows")
+    q.add_argument("sql")
+    args = parser.parse_args()
+
+    with NepseDatabase() as db:
+        if args.command == "build":
+            db.build(full=args.full)
+        else:
+            for row in db.query(args.sql):
+                print(row)
@@ -0,0 +1,203 @@
+
+import os
+import json
+import time
+import logging
+import argparse
+from datetime import date as dt_date, timedelta
+from pathlib import Path
+from concurrent.futures import ThreadPoolExecutor
+
+import requests
+from bs4 import BeautifulSoup
+
+from .session import BootstrapCache
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+MAPPING_PATH = DATA_DIR / "company_id_mapping.json"
+MAPPING_ALL_PATH = DATA_DIR / "company_id_mapping_all.json"
+COMPANY_LIST_PATH = DATA_DIR / "company_list.json"
+STATE_PATH = DATA_DIR / "company_discovery.json"
+
+LISTING_URL = "https://www.sharesansar.com/today-share-price"
+BASE_URL = "https://www.sharesansar.com"
+
+
+def _write_json(path, obj, **kwargs):
+    tmp = path.with_suffix(path.suffix + ".tmp")
+    with open(tmp, "w") as f:
+        json.dump(obj, f, **kwargs)
+    os.replace(tmp, path)
+
+
+class CompanyDiscovery:
+    """
+    Keeps data/company_id_mapping.json (symbol -> ShareSansar company ID) fresh.
+
+    One request to the today-share-price listing yields every traded symbol in
+    bulk. IDs are taken from the existing mappings where known; only symbols
+    with no known ID get a company-page lookup, run concurrently.
+
+    data/company_discovery.json records when the listing was last refreshed
+    (for the TTL) and the last date each symbol was seen listed, which is
+    what new-IPO / delisting detection against company_list.json is based on.
+    """
+
+    def __init__(self, session=None, bootstrap=None, ttl_hours=24, workers=4, delist_after_days=30):
+        self.session = session or requests.Session()
+        if session is None:
+            self.session.headers.update({
+                "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
+                "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
+            })
+        self.bootstrap = bootstrap or BootstrapCache()
+        self.ttl = ttl_hours * 3600
+        self.workers = workers
+        self.delist_after = timedelta(days=delist_after_days)
+        self.last_report = None  # diff report of the last refresh() made by load_mapping
+
+    # ------------------------------------------------------------------
+    # Local state
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _read_json(path, default):
+        try:
+            with open(path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return default
+
+    def _state(self):
+        return self._read_json(STATE_PATH, {"refreshed_at": 0, "last_seen": {}})
+
+    def is_stale(self):
+        return time.time() - self._state().get("refreshed_at", 0) > self.ttl
+
+    def load_mapping(self, force_update=False):
+        """
+        Return the symbol -> company ID mapping, refreshing it first if stale.
+        The refresh report, if one ran, is kept in self.last_report.
+        """
+        self.last_report = None
+        if force_update or self.is_stale():
+            try:
+                self.last_report = self.refresh()
+            except requests.RequestException as e:
+                logger.warning(f"Company discovery failed, using stored mapping: {e}")
+        return self._read_json(MAPPING_PATH, {})
+
+    # ------------------------------------------------------------------
+    # Remote
+    # ------------------------------------------------------------------
+
+    def fetch_listed_symbols(self):
+        """All symbols on the today-share-price listing (one request)."""
+        resp = self.session.get(LISTING_URL, timeout=30)
+        resp.raise_for_status()
+        soup = BeautifulSoup(resp.text, "html.parser")
+        symbols = set()
+        for a in soup.select("table a[href*='/company/']"):
+            sym = a.get_text(strip=True).upper()
+            if sym:
+                symbols.add(sym)
+        return symbols
+
+    def _lookup_id(self, symbol):
+        _, company_id = self.bootstrap.get(self.session, symbol, base_url=BASE_URL)
+        try:
+            return symbol, int(company_id) if company_id else None
+        except ValueError:
+            return symbol, None
+
+    def resolve_ids(self, symbols):
+        """Company-page lookups for symbols with no known ID, run concurrently."""
+        if not symbols:
+            return {}
+        logger.info(f"Discovery: looking up {len(symbols)} unknown company IDs")
+        with ThreadPoolExecutor(max_workers=self.workers) as pool:
+            return {sym: cid for sym, cid in pool.map(self._lookup_id, sorted(symbols)) if cid}
+
+    def refresh(self):
+        """
+        Re-read the listing, fill in IDs for unknown symbols and persist.
+        Returns the diff report (see diff()).
+        """
+        listed = self.fetch_listed_symbols()
+        if not listed:
+            raise requests.RequestException("listing page returned no symbols")
+
+        mapping = self._read_json(MAPPING_PATH, {})
+        known_all = self._read_json(MAPPING_ALL_PATH, {})
+        priority = set(self._read_json(COMPANY_LIST_PATH, []))
+
+        wanted = listed | priority
+        missing = {s for s in wanted if s not in mapping}
+        from_all = {s: known_all[s] for s in missing if s in known_all}
+        resolved = self.resolve_ids(missing - set(from_all))
+
+        added = {**from_all, **resolved}
+        if added:
+            mapping.update(added)
+            _write_json(MAPPING_PATH, dict(sorted(mapping.items())), indent=2)
+            logger.info(f"Discovery: added {len(added)} company IDs to {MAPPING_PATH.name}")
+
+        state = self._state()
+        today = str(dt_date.today())
+        for sym in listed:
+            state["last_seen"][sym] = today
+        state["refreshed_at"] = time.time()
+        state["last_seen"] = dict(sorted(state["last_seen"].items()))
+        _write_json(STATE_PATH, state, indent=1)
+
+        report = self.diff(listed=listed)
+        report["ids_added"] = sorted(added)
+        report["ids_unresolved"] = sorted(missing - set(added))
+        return report
+
+    # ------------------------------------------------------------------
+    # Diff against company_list.json
+    # ------------------------------------------------------------------
+
+    def diff(self, listed=None):
+        """
+        Compare the listing with company_list.json:
+          new_listings      — listed today, not in company_list.json (new IPOs)
+          delisting_suspects — in company_list.json, not seen listed for delist_after_days
+        A symbol merely not trading today is not treated as delisted.
+        """
+        state = self._state()
+        priority = set(self._read_json(COMPANY_LIST_PATH, []))
+        if listed is None:
+            latest = max(state["last_seen"].values(), default=None)
+            listed = {s for s, d in state["last_seen"].items() if d == latest}
+
+        cutoff = str(dt_date.today() - self.delist_after)
+        suspects = sorted(
+            s for s in priority
+            if state["last_seen"].get(s) and state["last_seen"][s] < cutoff
+        )
+        return {
+            "listed": len(listed),
+            "new_listings": sorted(listed - priority),
+            "delisting_suspects": suspects,
+        }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Refresh symbol -> company ID mapping and detect listing changes")
+    parser.add_argument("--force", action="store_true", help="Refresh even if the cached listing is fresh")
+    parser.add_argument("--ttl-hours", type=float, default=24)
+    args = parser.parse_args()
+
+    discovery = CompanyDiscovery(ttl_hours=args.ttl_hours)
+    if args.force or discovery.is_stale():
+        report = discovery.refresh()
+    else:
+        logger.info("Listing is fresh (use --force to refresh)")
+        report = discovery.diff()
+    print(json.dumps(report, indent=2))
@@ -5,21 +5,19 @@ import csv
 import time
 import logging
 import os
+import sys
 import re
 import random
 from datetime import date as dt_date
+from pathlib import Path
+
+if not __package__:  # run as a script: python scraper/core/floorsheet.py
+    sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+    __package__ = "core"
+
+from .quality import gate_floorsheet
+from .partitions import FloorsheetPartitions
 
-# Setup logging
-debug_dir = os.path.join(os.path.dirname(__file__), 'debug_output')
-os.makedirs(debug_dir, exist_ok=True)
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(os.path.join(debug_dir, "headless_scraper.log")),
-        logging.StreamHandler()
-    ]
-)
 logger = logging.getLogger(__name__)
 
 class FloorsheetScraper:
@@ -182,6 +180,19 @@ class FloorsheetScraper:
 
 if __name__ == "__main__":
     import argparse
+
+    # Setup logging
+    debug_dir = os.path.join(os.path.dirname(__file__), 'debug_output')
+    os.makedirs(debug_dir, exist_ok=True)
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(os.path.join(debug_dir, "headless_scraper.log")),
+            logging.StreamHandler()
+        ]
+    )
+
     parser = argparse.ArgumentParser()
     parser.add_argument('--max-pages', type=int, default=None)
     args = parser.parse_args()
@@ -200,17 +211,34 @@ if __name__ == "__main__":
         csv_path = os.path.join(data_dir, f'floorsheet_{today}.csv')
         fieldnames = ['date', 'sn', 'contract_no', 'stock_symbol', 'buyer', 'seller', 'quantity', 'rate', 'amount']
         file_exists = os.path.isfile(csv_path)
+
+        # Re-runs append to the same file: skip contracts already written
+        seen = set()
+        if file_exists:
+            with open(csv_path, newline='', encoding='utf-8') as f:
+                seen = {row['contract_no'] for row in csv.DictReader(f)}
+        rows = []
+        for record in data:
+            if record['contract_no'] not in seen:
+                seen.add(record['contract_no'])
+                rows.append(record)
+        logger.info(f"Dedupe: kept {len(rows)} of {len(data)} rows")
+        rows, _ = gate_floorsheet(rows, today)
+
         with open(csv_path, 'a', newline='', encoding='utf-8') as f:
             writer = csv.DictWriter(f, fieldnames=fieldnames)
             if not file_exists:
                 writer.writeheader()
-            writer.writerows(data)
+            writer.writerows(rows)
+
+        # ------- Per-symbol partitions (company-wise/{SYMBOL}/floorsheet/) -------
+        FloorsheetPartitions().append(rows, today)
 
         # ------- JSON (full dump for the day, overwrites) -------
         json_path = os.path.join(data_dir, f'floorsheet_{today}.json')
         with open(json_path, 'w', encoding='utf-8') as f:
             json.dump(data, f, indent=2)
 
-        print(f"Saved {len(data)} records to:")
+        print(f"Saved {len(rows)} records to:")
         print(f"  CSV:  {csv_path}")
         print(f"  JSON: {json_path}")
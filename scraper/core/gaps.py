@@ -0,0 +1,217 @@
+
+import os
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from .indicators import IndicatorEngine, load_price_history
+from .storage import sort_prices
+from .trading_calendar import load_calendar
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+# Sessions already re-requested that ShareSansar has no row for (the symbol
+# really did not trade) — never requested again
+CHECKED_PATH = DATA_DIR / "price_gaps_checked.json"
+
+
+def presence_matrix(symbols, sessions):
+    """
+    Boolean (len(symbols), len(sessions)) matrix: True where the symbol's
+    prices.csv has a row for that session. Dates that are not market sessions
+    are ignored. A symbol without a prices.csv gets an all-False row.
+    """
+    present = np.zeros((len(symbols), len(sessions)), dtype=bool)
+    for i, sym in enumerate(symbols):
+        history = load_price_history(sym)
+        if history is None or len(history[0]) == 0:
+            continue
+        dates, _ = history
+        common = np.intersect1d(dates, sessions, assume_unique=True)
+        present[i, np.searchsorted(sessions, common)] = True
+    return present
+
+
+def find_gaps(present, window=10, min_coverage=0.9):
+    """
+    Flag holes in the presence matrix.
+
+    A session is a gap for a symbol when it lies between the symbol's first and
+    last row, the row is missing, and the symbol traded on at least
+    min_coverage of the sessions within +/- window around it. The coverage
+    test keeps thinly traded symbols and long suspensions (where the local
+    coverage collapses) from being reported as damage.
+    """
+    n_sym, n = present.shape
+    cols = np.arange(n)
+    has_any = present.any(axis=1)
+    first = np.where(has_any, present.argmax(axis=1), n)
+    last = np.where(has_any, n - 1 - present[:, ::-1].argmax(axis=1), -1)
+    span = (cols >= first[:, None]) & (cols <= last[:, None])
+
+    csum = np.zeros((n_sym, n + 1), dtype=np.int32)
+    np.cumsum(present, axis=1, out=csum[:, 1:])
+    lo = np.clip(cols - window, 0, n)
+    hi = np.clip(cols + window + 1, 0, n)
+    coverage = (csum[:, hi] - csum[:, lo]) / (hi - lo)
+
+    return span & ~present & (coverage >= min_coverage)
+
+
+class GapScanner:
+    """
+    Aligns every symbol's prices.csv against the market's trading sessions
+    (core.trading_calendar) and repairs interior holes.
+
+    Repairs page the ShareSansar history endpoint newest-first only as far as
+    the oldest gap of the symbol (stop_date = the row just before it), and
+    update_company_csv() appends only the dates not already present.
+    """
+
+    def __init__(self, window=10, min_coverage=0.9, since=None):
+        self.window = window
+        self.min_coverage = min_coverage
+        self.since = since
+
+    # ------------------------------------------------------------------
+    # Checked (confirmed absent) sessions
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _load_checked():
+        try:
+            with open(CHECKED_PATH) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    @staticmethod
+    def _save_checked(checked):
+        tmp = CHECKED_PATH.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({k: sorted(v) for k, v in sorted(checked.items())}, f, indent=1)
+        os.replace(tmp, CHECKED_PATH)
+
+    # ------------------------------------------------------------------
+    # Scan
+    # ------------------------------------------------------------------
+
+    def scan(self, symbols=None):
+        """Return {symbol: [missing session, ...]} for every symbol with gaps."""
+        cal = load_calendar()
+        sessions = np.array(cal.sessions, dtype="U10")
+        if symbols is None:
+            symbols = sorted(d.name for d in COMPANY_WISE.iterdir() if (d / "prices.csv").exists())
+        symbols = list(symbols)
+        unknown = [s for s in symbols if not (COMPANY_WISE / s / "prices.csv").exists()]
+        if unknown:
+            logger.warning(f"No prices.csv for {', '.join(unknown)} — skipped")
+            symbols = [s for s in symbols if s not in unknown]
+
+        t0 = time.perf_counter()
+        present = presence_matrix(symbols, sessions)
+        flags = find_gaps(present, self.window, self.min_coverage)
+        if self.since:
+            flags[:, sessions < self.since] = False
+
+        checked = self._load_checked()
+        gaps = {}
+        for i in np.flatnonzero(flags.any(axis=1)):
+            sym = symbols[i]
+            done = set(checked.get(sym, ()))
+            missing = [str(d) for d in sessions[flags[i]] if str(d) not in done]
+            if missing:
+                gaps[sym] = missing
+        logger.info(
+            f"Gap scan: {len(symbols)} symbols x {len(sessions)} sessions in "
+            f"{time.perf_counter() - t0:.1f}s — {sum(map(len, gaps.values()))} missing sessions "
+            f"across {len(gaps)} symbols"
+        )
+        return gaps
+
+    # ------------------------------------------------------------------
+    # Repair
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _stop_date(symbol, oldest_gap):
+        """Newest existing row before the oldest gap — paging can stop there."""
+        history = load_price_history(symbol)
+        if history is None:
+            return None
+        dates, _ = history
+        i = np.searchsorted(dates, oldest_gap)
+        return str(dates[i - 1]) if i > 0 else None
+
+    def backfill(self, gaps, scraper=None, limit=None):
+        """
+        Re-fetch the history of each damaged symbol back to its oldest gap and
+        add the missing rows; the file is then rewritten in date order and its
+        indicators rebuilt. Sessions the server has no row for are recorded in
+        price_gaps_checked.json. Returns {symbol: rows added}.
+        """
+        if scraper is None:
+            from .history import ShareSansarHistoryScraper
+            scraper = ShareSansarHistoryScraper()
+
+        checked = self._load_checked()
+        indicators = IndicatorEngine()
+        added = {}
+        items = sorted(gaps.items())[:limit] if limit else sorted(gaps.items())
+        for i, (sym, missing) in enumerate(items, 1):
+            stop_date = self._stop_date(sym, missing[0])
+            logger.info(f"[{i}/{len(items)}] {sym}: {len(missing)} missing sessions, paging back to {stop_date}")
+            try:
+                records = scraper.scrape_company_history(sym, stop_date=stop_date)
+            except Exception as e:
+                logger.error(f"  [{sym}] backfill failed: {e}")
+                continue
+            if not records:
+                continue  # request failed — try again next run
+
+            fetched = {r["date"] for r in records}
+            wanted = set(missing)
+            fills = [r for r in records if r["date"] in wanted]
+            if fills:
+                scraper.update_company_csv(sym, fills)
+                # The fills were appended after newer sessions: restore date order
+                sort_prices([sym])
+                indicators.rebuild_symbol(sym)
+            added[sym] = len(fills)
+            # Only a run that paged all the way back proves a session has no row
+            reached = stop_date is None or min(fetched) <= stop_date
+            absent = [d for d in missing if d not in fetched] if reached else []
+            if absent:
+                checked[sym] = sorted(set(checked.get(sym, ())) | set(absent))
+            logger.info(f"  [{sym}] +{len(fills)} rows, {len(absent)} sessions confirmed not traded")
+            time.sleep(1)
+
+        self._save_checked(checked)
+        return added
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Find and repair missing sessions in prices.csv histories")
+    parser.add_argument("symbols", nargs="*", help="Symbols to scan (default: all)")
+    parser.add_argument("--since", help="Ignore gaps before this date (YYYY-MM-DD)")
+    parser.add_argument("--window", type=int, default=10, help="Sessions either side used for the coverage test")
+    parser.add_argument("--min-coverage", type=float, default=0.9)
+    parser.add_argument("--backfill", action="store_true", help="Fetch the missing rows")
+    parser.add_argument("--limit", type=int, default=None, help="Backfill at most this many symbols")
+    args = parser.parse_args()
+
+    scanner = GapScanner(window=args.window, min_coverage=args.min_coverage, since=args.since)
+    gaps = scanner.scan([s.upper() for s in args.symbols] or None)
+    for sym, missing in sorted(gaps.items(), key=lambda kv: -len(kv[1]))[:30]:
+        print(f"{sym:12s} {len(missing):5d}  oldest {missing[0]}  newest {missing[-1]}")
+    if args.backfill:
+        added = scanner.backfill(gaps, limit=args.limit)
+        print(f"Backfilled {sum(added.values())} rows across {len(added)} symbols")
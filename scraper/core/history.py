@@ -9,17 +9,75 @@ import logging
 from datetime import datetime
 import random
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s'
-)
+from .session import BootstrapCache, LatencyTracker, hedged_request
+
 logger = logging.getLogger(__name__)
 
+
+def _price(value):
+    """'1,234.5' -> 1234.5; a blank price stays None (not a real-looking 0.0)."""
+    value = value.replace(',', '')
+    return float(value) if value else None
+
+
+def parse_history_record(record):
+    """
+    Map one ShareSansar company-price-history JSON record to a prices.csv row
+    (None when it has no date). Shared by the live scraper and reparse.py.
+    Blank prices are kept as None so the quality gate (core/quality.py) can
+    reject the row.
+    """
+    date_val = record.get('published_date', '').strip()
+    if not date_val:
+        return None
+    open_val = record.get('open', '0').strip()
+    high_val = record.get('high', '0').strip()
+    low_val = record.get('low', '0').strip()
+    close_val = record.get('close', '0').strip()  # Note: 'close' not 'ltp'
+    pct_val = record.get('per_change', '0').strip()
+    qty_val = record.get('traded_quantity', '0').strip()
+    turnover_val = record.get('traded_amount', '0').strip()
+    return {
+        'date': date_val,
+        'open': _price(open_val),
+        'high': _price(high_val),
+        'low': _price(low_val),
+        'ltp': _price(close_val),  # Map 'close' to 'ltp' for consistency
+        'percent_change': float(pct_val.replace('%', '').replace(',', '') or 0),
+        'qty': int(float(qty_val.replace(',', '') or 0)),
+        'turnover': float(turnover_val.replace(',', '') or 0)
+    }
+
+
 class ShareSansarHistoryScraper:
-    def __init__(self):
-        self.session = requests.Session()
-        self.session.headers.update({
+    # Consecutive symbols ShareSansar must fail before it is bypassed, and for how long
+    FAILOVER_AFTER = 3
+    FAILOVER_COOLDOWN = 300
+    PAGE_ATTEMPTS = 3
+
+    def __init__(self, session=None, bootstrap=None, company_dir=None, secondary=None):
+        """
+        :param session:     Optional shared requests.Session (e.g. a BudgetedSession
+                            used by several scrapers at once). Headers are sent per
+                            request so a shared session is never mutated.
+        :param bootstrap:   Optional shared BootstrapCache for CSRF/companyid lookups.
+        :param company_dir: Write prices.csv under this directory instead of
+                            data/company-wise (a shard; see core/shard.py).
+        :param secondary:   Fallback source with fetch(symbol, stop_date) returning
+                            records in the same schema (default: merolagani;
+                            False disables failover).
+        """
+        self.session = session or requests.Session()
+        self.bootstrap = bootstrap or BootstrapCache()
+        self.company_dir = company_dir
+        if secondary is None:
+            from .sources import MerolaganiHistorySource
+            secondary = MerolaganiHistorySource(self.session)
+        self.secondary = secondary
+        self.latency = LatencyTracker()
+        self._primary_failures = 0
+        self._bypass_until = 0.0
+        self.headers = {
             'Connection': 'keep-alive',
             'sec-ch-ua': '" Not A;Brand";v="99", "Chromium";v="120", "Google Chrome";v="120"',
             'Accept': 'application/json, text/javascript, */*; q=0.01',
@@ -30,8 +88,9 @@ class ShareSansarHistoryScraper:
             'Sec-Fetch-Mode': 'cors',
             'Sec-Fetch-Dest': 'empty',
             'Accept-Language': 'en-US,en;q=0.9',
-        })
+        }
         self.base_url = "https://www.sharesansar.com"
+        self._indicators = None
         
     def get_latest_date(self, symbol):
         """
@@ -56,45 +115,71 @@ class ShareSansarHistoryScraper:
         Scrape price history for a single company.
         If stop_date (YYYY-MM-DD) is given, stops fetching once it reaches
         records on or before that date — making incremental runs very fast.
+        Falls back to the secondary source when ShareSansar fails for the
+        symbol, and skips ShareSansar for a while after it has failed for
+        FAILOVER_AFTER symbols in a row.
         Returns list of dicts: date, open, high, low, ltp, percent_change, qty, turnover
         """
-        url = f"{self.base_url}/company/{symbol.lower()}"
+        if time.monotonic() < self._bypass_until:
+            logger.info(f"ShareSansar bypassed — {symbol} from the secondary source")
+            return self._scrape_secondary(symbol, stop_date, [])
+
+        records, complete = self._scrape_primary(symbol, stop_date)
+        if complete:
+            self._primary_failures = 0
+            return records
+
+        self._primary_failures += 1
+        if self._primary_failures >= self.FAILOVER_AFTER:
+            logger.warning(f"ShareSansar failed for {self._primary_failures} symbols in a row — "
+                           f"using the secondary source for {self.FAILOVER_COOLDOWN}s")
+            self._bypass_until = time.monotonic() + self.FAILOVER_COOLDOWN
+            self._primary_failures = 0
+        return self._scrape_secondary(symbol, stop_date, records)
+
+    def _scrape_primary(self, symbol, stop_date=None):
+        """ShareSansar history. Returns (records, complete); complete is False on failure."""
         ajax_url = f"{self.base_url}/company-price-history"
         
         logger.info(f"Scraping history for {symbol}...")
         
         try:
-            # Initial page load to get session cookies and CSRF token
-            response = self.session.get(url, timeout=30)
-            if response.status_code != 200:
-                logger.error(f"Failed to load {symbol}: {response.status_code}")
-                return []
-            
-            soup = BeautifulSoup(response.text, 'html.parser')
-            
-            # Get CSRF token
-            csrf_token = soup.find('meta', {'name': '_token'})
-            if csrf_token:
-                csrf_token = csrf_token.get('content')
-            else:
+            # Initial page load to get session cookies, CSRF token and company ID
+            csrf_token, company_id = self.bootstrap.get(
+                self.session, symbol, headers=self.headers, base_url=self.base_url
+            )
+            if csrf_token is None:
+                logger.error(f"Failed to load {symbol}")
+                return [], False
+            if not csrf_token:
                 logger.warning("CSRF token not found")
-                csrf_token = ""
-            
-            # Get company ID from the page
-            company_id_elem = soup.find('div', {'id': 'companyid'})
-            company_id = company_id_elem.text.strip() if company_id_elem else ""
             
             # Scrape via AJAX with proper POST format
-            all_records = self._scrape_via_ajax_post(ajax_url, symbol, csrf_token, company_id, stop_date=stop_date)
+            all_records, complete = self._scrape_via_ajax_post(
+                ajax_url, symbol, csrf_token, company_id, stop_date=stop_date
+            )
             
             logger.info(f"[OK] Scraped {len(all_records)} records for {symbol}")
-            return all_records
+            return all_records, complete
             
         except Exception as e:
             logger.error(f"Error scraping {symbol}: {e}")
             import traceback
             logger.error(traceback.format_exc())
-            return []
+            return [], False
+
+    def _scrape_secondary(self, symbol, stop_date, partial):
+        """Fill in from the secondary source; rows ShareSansar did return win."""
+        if not self.secondary:
+            return partial
+        try:
+            extra = self.secondary.fetch(symbol, stop_date=stop_date)
+        except (requests.RequestException, ValueError) as e:
+            logger.error(f"[{symbol}] {self.secondary.name} failed too: {e}")
+            return partial
+        by_date = {r['date']: r for r in extra}
+        by_date.update((r['date'], r) for r in partial)
+        return sorted(by_date.values(), key=lambda r: r['date'], reverse=True)
     
     def _parse_row(self, cols):
         """Parse a table row into a dict"""
@@ -117,17 +202,19 @@ class ShareSansarHistoryScraper:
     def _scrape_via_ajax_post(self, ajax_url, symbol, csrf_token, company_id, stop_date=None):
         """Scrape data via POST to AJAX endpoint with DataTables pagination.
         Stops early if stop_date is set and a fetched record date <= stop_date.
+        Returns (records, complete); complete is False when a page failed.
         """
         all_records = []
         start = 0
         length = 50  # Records per page
         draw = 1
         
-        # Update headers for AJAX request
-        self.session.headers.update({
+        # Headers for AJAX request
+        ajax_headers = {
+            **self.headers,
             'X-CSRF-Token': csrf_token,
             'Content-Type': 'application/x-www-form-urlencoded; charset=UTF-8',
-        })
+        }
         
         while True:
             # DataTables POST format - use company ID not symbol
@@ -140,11 +227,11 @@ class ShareSansarHistoryScraper:
             
             try:
                 logger.info(f"Fetching records {start} to {start + length}...")
-                response = self.session.post(ajax_url, data=post_data, timeout=30)
+                response = self._post_page(ajax_url, post_data, ajax_headers)
                 
                 if response.status_code != 200:
                     logger.error(f"AJAX request failed: {response.status_code}")
-                    break
+                    return all_records, False
                 
                 data = response.json()
                 
@@ -165,36 +252,17 @@ class ShareSansarHistoryScraper:
                         if not isinstance(record, dict):
                             continue
                         
-                        # Extract values - ShareSansar uses different key names
-                        date_val = record.get('published_date', '').strip()
-                        open_val = record.get('open', '0').strip()
-                        high_val = record.get('high', '0').strip()
-                        low_val = record.get('low', '0').strip()
-                        close_val = record.get('close', '0').strip()  # Note: 'close' not 'ltp'
-                        pct_val = record.get('per_change', '0').strip()
-                        qty_val = record.get('traded_quantity', '0').strip()
-                        turnover_val = record.get('traded_amount', '0').strip()
-                        
-                        if not date_val:
+                        parsed = parse_history_record(record)
+                        if parsed is None:
                             continue
-                        
-                        parsed = {
-                            'date': date_val,
-                            'open': float(open_val.replace(',', '') or 0),
-                            'high': float(high_val.replace(',', '') or 0),
-                            'low': float(low_val.replace(',', '') or 0),
-                            'ltp': float(close_val.replace(',', '') or 0),  # Map 'close' to 'ltp' for consistency
-                            'percent_change': float(pct_val.replace('%', '').replace(',', '') or 0),
-                            'qty': int(float(qty_val.replace(',', '') or 0)),
-                            'turnover': float(turnover_val.replace(',', '') or 0)
-                        }
-                        
+                        date_val = parsed['date']
+
                         all_records.append(parsed)
 
                         # Stop early if we've hit dates we already have
                         if stop_date and date_val <= stop_date:
                             logger.info(f"Reached stop date {stop_date} — stopping early")
-                            return all_records
+                            return all_records, True
                             
                     except (ValueError, AttributeError) as e:
                         logger.warning(f"Error parsing record: {e}")
@@ -213,32 +281,61 @@ class ShareSansarHistoryScraper:
                 logger.error(f"AJAX pagination error: {e}")
                 import traceback
                 logger.error(traceback.format_exc())
-                break
+                return all_records, False
         
-        return all_records
+        return all_records, True
+
+    def _post_page(self, ajax_url, post_data, headers):
+        """
+        One history page: hedged once past the p95 latency seen so far, and
+        retried with jittered exponential backoff on non-200s (the 202 loop).
+        """
+        for attempt in range(self.PAGE_ATTEMPTS):
+            response = hedged_request(
+                self.session, "POST", ajax_url, self.latency, data=post_data, headers=headers, timeout=30
+            )
+            if response.status_code == 200 or attempt == self.PAGE_ATTEMPTS - 1:
+                return response
+            logger.warning(f"AJAX returned {response.status_code} (attempt {attempt + 1})")
+            time.sleep(2 ** attempt + random.uniform(0, 1))
+        return response
     
     def update_company_csv(self, symbol, records):
         """
         Append new records to company CSV file, avoiding duplicates.
-        Saves to data/company-wise/{symbol}/prices.csv
+        Saves to data/company-wise/{symbol}/prices.csv (or company_dir/{symbol}/)
         """
-        base_dir = os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'company-wise', symbol)
+        base_dir = os.path.join(
+            self.company_dir or os.path.join(os.path.dirname(__file__), '..', '..', 'data', 'company-wise'), symbol
+        )
         os.makedirs(base_dir, exist_ok=True)
         
         filepath = os.path.join(base_dir, "prices.csv")
         
         # Read existing dates to prevent duplicates
         existing_dates = set()
+        last_row = None
         if os.path.exists(filepath):
             try:
                 with open(filepath, 'r') as f:
                     reader = csv.DictReader(f)
-                    existing_dates = {row['date'] for row in reader}
+                    for row in reader:
+                        existing_dates.add(row['date'])
+                        if last_row is None or row['date'] >= last_row['date']:
+                            last_row = row
             except Exception as e:
                 logger.warning(f"Could not read existing prices.csv for {symbol}: {e}")
         
         # Filter out duplicates
         new_records = [r for r in records if r['date'] not in existing_dates]
+
+        # Quality gate: rows breaking an invariant go to data/quarantine/prices.csv
+        if new_records:
+            from .quality import gate_prices
+            prev_close = None
+            if last_row and min(r['date'] for r in new_records) > last_row['date']:
+                prev_close = float(last_row.get('ltp') or 0) or None
+            new_records, _ = gate_prices(symbol, new_records, prev_close=prev_close)
         
         if not new_records:
             logger.info(f"No new records for {symbol}")
@@ -260,6 +357,30 @@ class ShareSansarHistoryScraper:
             logger.info(f"[OK] Added {len(new_records)} new records to {symbol}/prices.csv")
         except Exception as e:
             logger.error(f"Failed to write to {symbol}/prices.csv: {e}")
+            return
+
+        self._update_indicators(symbol)
+
+    @property
+    def indicators(self):
+        """IndicatorEngine, created on first use (numpy is only imported then)."""
+        if self._indicators is None:
+            try:
+                from .indicators import IndicatorEngine
+            except ImportError:  # numpy not installed — indicator cache is optional
+                self._indicators = False
+            else:
+                self._indicators = IndicatorEngine()
+        return self._indicators
+
+    def _update_indicators(self, symbol):
+        """Extend the symbol's indicators.csv with the newly appended sessions."""
+        if self.company_dir or not self.indicators:  # a shard's rows reach data/ at merge time
+            return
+        try:
+            self.indicators.update_symbol(symbol)
+        except Exception as e:
+            logger.warning(f"Could not update indicators for {symbol}: {e}")
 
     def scrape_all_companies(self, company_list_file='company_list.json'):
         """
@@ -290,6 +411,10 @@ class ShareSansarHistoryScraper:
         logger.info("[DONE] Bulk scrape complete!")
 
 if __name__ == "__main__":
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s'
+    )
     scraper = ShareSansarHistoryScraper()
     
     # Test with a single company first (UNCOMMENT TO TEST)
@@ -0,0 +1,284 @@
+
+import io
+import os
+import re
+import gzip
+import json
+import time
+import logging
+import argparse
+import threading
+from datetime import datetime, timezone
+from http.client import HTTPMessage
+from pathlib import Path
+
+from requests.adapters import BaseAdapter
+from urllib3 import HTTPResponse
+
+from .archive import request_key
+from .trading_calendar import NPT, MARKET_CLOSE_HOUR
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+CACHE_DIR = DATA_DIR / ".cache" / "http"
+
+# Headers that describe the wire encoding, not the (decoded) body we store
+_WIRE_HEADERS = {"content-encoding", "content-length", "transfer-encoding", "connection"}
+
+
+def market_day(now=None):
+    """Nepal calendar date, the day a NEPSE page belongs to."""
+    return str((now or datetime.now(timezone.utc)).astimezone(NPT).date())
+
+
+def market_ttl(open_ttl=120, closed_ttl=6 * 3600):
+    """TTL for pages that change while the market trades and are frozen after the close."""
+    def ttl(now=None):
+        hour = (now or datetime.now(timezone.utc)).astimezone(NPT).hour
+        return open_ttl if hour < MARKET_CLOSE_HOUR else closed_ttl
+    return ttl
+
+
+# Only GETs matching a policy are cached; everything else goes straight out.
+#   ttl           seconds (or a callable returning seconds) a stored copy is
+#                 served without asking; afterwards it is revalidated with
+#                 If-None-Match / If-Modified-Since
+#   per_day       key includes the Nepal date, so a new market day never
+#                 sees yesterday's copy
+#   vary_cookies  key includes the session cookie, and a hit replays the
+#                 stored Set-Cookie headers: a page carrying a CSRF token is
+#                 only reused together with the session it belongs to
+POLICIES = [
+    {"pattern": re.compile(r"^https://www\.sharesansar\.com/today-share-price/?$"),
+     "ttl": market_ttl(), "per_day": True, "vary_cookies": False},
+    {"pattern": re.compile(r"^https://www\.sharesansar\.com/company/[^/?#]+/?$"),
+     "ttl": 3600, "per_day": False, "vary_cookies": True},
+]
+
+
+def _policy(policies, request):
+    if request.method != "GET":
+        return None
+    for policy in policies:
+        if policy["pattern"].match(request.url):
+            return policy
+    return None
+
+
+def _session_cookie(request):
+    """Session-identifying cookies sent with a request ('..._session=...')."""
+    cookie = request.headers.get("Cookie", "")
+    return "; ".join(sorted(c.strip() for c in cookie.split(";") if "session" in c.split("=", 1)[0].lower()))
+
+
+class HttpCache:
+    """
+    On-disk HTTP cache for the pages every run re-reads: the today-share-price
+    listing and the ShareSansar company pages (see POLICIES).
+
+    data/.cache/http/ab/cdef....json   status, headers, url, stored time
+    data/.cache/http/ab/cdef....gz     decoded body
+
+    attach(session) wraps the session's adapters, so any scraper holding the
+    session is served from the cache without changes. Fresh copies are
+    returned without a request; stale ones are revalidated and reused on 304.
+    """
+
+    def __init__(self, root=CACHE_DIR, policies=None):
+        self.root = Path(root)
+        self.policies = POLICIES if policies is None else policies
+        self.hits = self.revalidated = self.misses = 0
+        self._lock = threading.Lock()
+
+    # ------------------------------------------------------------------
+    # Storage
+    # ------------------------------------------------------------------
+
+    def key(self, request, policy, now=None):
+        extra = {}
+        if policy.get("per_day"):
+            extra["_day"] = market_day(now)
+        if policy.get("vary_cookies"):
+            extra["_cookie"] = _session_cookie(request)
+        return request_key(request.method, request.url, extra)
+
+    def _paths(self, key):
+        base = self.root / key[:2] / key[2:]
+        return base.with_suffix(".json"), base.with_suffix(".gz")
+
+    def load(self, key):
+        meta_path, body_path = self._paths(key)
+        try:
+            with open(meta_path, encoding="utf-8") as f:
+                meta = json.load(f)
+            with open(body_path, "rb") as f:
+                return meta, gzip.decompress(f.read())
+        except (FileNotFoundError, ValueError, OSError):
+            return None, None
+
+    def store(self, key, url, status, headers, body):
+        meta_path, body_path = self._paths(key)
+        meta_path.parent.mkdir(parents=True, exist_ok=True)
+        suffix = f".{threading.get_ident()}.tmp"
+        with open(str(body_path) + suffix, "wb") as f:
+            f.write(gzip.compress(body, 6, mtime=0))
+        os.replace(str(body_path) + suffix, body_path)
+        meta = {"url": url, "status": status, "headers": headers, "stored": round(time.time(), 3)}
+        with open(str(meta_path) + suffix, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(str(meta_path) + suffix, meta_path)
+
+    def _touch(self, key, meta, extra_headers):
+        """Mark a revalidated copy fresh again, keeping the newer validators."""
+        meta_path, _ = self._paths(key)
+        names = {k.lower() for k, _ in extra_headers}
+        meta["headers"] = [(k, v) for k, v in meta["headers"] if k.lower() not in names] + extra_headers
+        meta["stored"] = round(time.time(), 3)
+        tmp = str(meta_path) + f".{threading.get_ident()}.tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp, meta_path)
+
+    def evict(self, url):
+        """Forget every stored copy of url (all days / sessions). Returns #removed."""
+        removed = 0
+        for meta_path in self.root.glob("*/*.json"):
+            try:
+                with open(meta_path, encoding="utf-8") as f:
+                    if json.load(f).get("url") != url:
+                        continue
+            except (OSError, ValueError):
+                continue
+            for path in (meta_path, meta_path.with_suffix(".gz")):
+                path.unlink(missing_ok=True)
+            removed += 1
+        return removed
+
+    def clear(self):
+        removed = 0
+        for path in self.root.glob("*/*"):
+            path.unlink(missing_ok=True)
+            removed += path.suffix == ".json"
+        return removed
+
+    def stats(self):
+        entries = list(self.root.glob("*/*.json"))
+        size = sum(p.stat().st_size for p in self.root.glob("*/*"))
+        return {"entries": len(entries), "bytes": size,
+                "hits": self.hits, "revalidated": self.revalidated, "misses": self.misses}
+
+    # ------------------------------------------------------------------
+    # Session integration
+    # ------------------------------------------------------------------
+
+    def attach(self, session):
+        """Serve session's GETs through the cache. Returns session."""
+        for prefix, adapter in list(session.adapters.items()):
+            if not isinstance(adapter, CachingAdapter):
+                session.mount(prefix, CachingAdapter(adapter, self))
+        session.http_cache = self
+        return session
+
+    def count(self, field):
+        with self._lock:
+            setattr(self, field, getattr(self, field) + 1)
+
+
+def _header_list(resp):
+    """All response headers as [name, value] pairs, repeated Set-Cookie kept apart."""
+    raw = getattr(resp, "raw", None)
+    if raw is not None and hasattr(raw, "headers") and hasattr(raw.headers, "iteritems"):
+        items = raw.headers.iteritems()
+    else:
+        items = resp.headers.items()
+    return [[k, v] for k, v in items if k.lower() not in _WIRE_HEADERS]
+
+
+class _Original:
+    """Stand-in for http.client.HTTPResponse: what requests' cookie extraction reads."""
+
+    def __init__(self, headers):
+        self.msg = HTTPMessage()
+        for k, v in headers:
+            self.msg[k] = v
+
+    def isclosed(self):
+        return True
+
+
+class CachingAdapter(BaseAdapter):
+    """Transport adapter that answers from an HttpCache and delegates the rest."""
+
+    def __init__(self, inner, cache):
+        super().__init__()
+        self.inner = inner
+        self.cache = cache
+
+    def close(self):
+        self.inner.close()
+
+    def _replay(self, request, meta, body, extra_headers=()):
+        headers = [(k, v) for k, v in meta["headers"]] + list(extra_headers)
+        raw = HTTPResponse(
+            body=io.BytesIO(body), headers=headers, status=meta["status"],
+            preload_content=False, decode_content=False, original_response=_Original(headers),
+            request_url=request.url,
+        )
+        resp = self.inner.build_response(request, raw)
+        resp.from_cache = True
+        return resp
+
+    def send(self, request, **kwargs):
+        policy = _policy(self.cache.policies, request)
+        if policy is None:
+            return self.inner.send(request, **kwargs)
+
+        key = self.cache.key(request, policy)
+        meta, body = self.cache.load(key)
+        if meta is not None:
+            ttl = policy["ttl"]() if callable(policy["ttl"]) else policy["ttl"]
+            if time.time() - meta["stored"] < ttl:
+                self.cache.count("hits")
+                return self._replay(request, meta, body)
+            stored = {k.lower(): v for k, v in meta["headers"]}
+            if stored.get("etag"):
+                request.headers["If-None-Match"] = stored["etag"]
+            if stored.get("last-modified"):
+                request.headers["If-Modified-Since"] = stored["last-modified"]
+
+        resp = self.inner.send(request, **kwargs)
+        if resp.status_code == 304 and meta is not None:
+            self.cache.count("revalidated")
+            fresh = [(k, v) for k, v in _header_list(resp)]
+            self.cache._touch(key, meta, [[k, v] for k, v in fresh if k.lower() in ("etag", "last-modified", "date")])
+            return self._replay(request, meta, body, [(k, v) for k, v in fresh if k.lower() == "set-cookie"])
+
+        self.cache.count("misses")
+        if resp.status_code == 200:
+            content = resp.content  # reads (and decodes) the body; resp stays usable
+            try:
+                self.cache.store(key, request.url, 200, _header_list(resp), content)
+            except OSError as e:  # caching must never break a scrape
+                logger.warning(f"HTTP cache: could not store {request.url}: {e}")
+        return resp
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="On-disk HTTP cache (data/.cache/http/)")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("stats", help="Entries and size")
+    sub.add_parser("clear", help="Delete every entry")
+    p_evict = sub.add_parser("evict", help="Delete the stored copies of a URL")
+    p_evict.add_argument("url")
+    args = parser.parse_args()
+
+    cache = HttpCache()
+    if args.cmd == "stats":
+        print(cache.stats())
+    elif args.cmd == "clear":
+        print(f"Removed {cache.clear()} entries")
+    else:
+        print(f"Removed {cache.evict(args.url)} entries")
@@ -0,0 +1,349 @@
+
+import io
+import csv
+import os
+import json
+import hashlib
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+
+# Indicator names are "<kind>_<window>", e.g. sma_20 or rsi_14.
+DEFAULT_INDICATORS = ("sma_5", "sma_20", "sma_50", "ret_1", "ret_5", "vol_20", "rsi_14")
+
+# Bytes before the covered end of prices.csv that must be unchanged for an append
+FINGERPRINT_BYTES = 256
+
+
+def _windows(values, n):
+    """Sliding windows of length n over values (no copy)."""
+    return np.lib.stride_tricks.sliding_window_view(values, n)
+
+
+def _sma(close, n):
+    out = np.full(len(close), np.nan)
+    if len(close) >= n:
+        out[n - 1:] = _windows(close, n).mean(axis=1)
+    return out
+
+
+def _ret(close, n):
+    out = np.full(len(close), np.nan)
+    if len(close) > n:
+        with np.errstate(divide="ignore", invalid="ignore"):
+            out[n:] = close[n:] / close[:-n] - 1.0
+    return out
+
+
+def _log_returns(close):
+    with np.errstate(divide="ignore", invalid="ignore"):
+        return np.diff(np.log(close))
+
+
+def _vol(close, n):
+    """Sample standard deviation of daily log returns over n sessions."""
+    out = np.full(len(close), np.nan)
+    r = _log_returns(close)
+    if len(r) >= n:
+        out[n:] = _windows(r, n).std(axis=1, ddof=1)
+    return out
+
+
+def _rsi(close, n):
+    """RSI over n sessions using simple averages of gains and losses (Cutler's RSI),
+    so every value depends only on its trailing window."""
+    out = np.full(len(close), np.nan)
+    d = np.diff(close)
+    if len(d) < n:
+        return out
+    avg_gain = _windows(np.clip(d, 0, None), n).mean(axis=1)
+    avg_loss = _windows(np.clip(-d, 0, None), n).mean(axis=1)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rsi = 100.0 - 100.0 / (1.0 + avg_gain / avg_loss)
+    rsi[(avg_loss == 0) & (avg_gain > 0)] = 100.0
+    rsi[(avg_loss == 0) & (avg_gain == 0)] = 50.0
+    out[n:] = rsi
+    return out
+
+
+# kind -> (function, lookback rows needed before the first output row)
+INDICATOR_KINDS = {
+    "sma": (_sma, lambda n: n - 1),
+    "ret": (_ret, lambda n: n),
+    "vol": (_vol, lambda n: n),
+    "rsi": (_rsi, lambda n: n),
+}
+
+
+def parse_indicator(name):
+    """Split 'sma_20' into ('sma', 20), validating the kind and window."""
+    kind, _, window = name.partition("_")
+    if kind not in INDICATOR_KINDS or not window.isdigit() or int(window) < 1:
+        raise ValueError(f"Unknown indicator '{name}' (expected e.g. sma_20, ret_1, vol_20, rsi_14)")
+    return kind, int(window)
+
+
+def load_price_history(symbol, columns=("ltp",)):
+    """
+    Read data/company-wise/{symbol}/prices.csv into date-sorted arrays.
+    prices.csv mixes a newest-first scrape with oldest-first appends, and can
+    hold the same date twice; the row written last wins.
+    Returns (dates, values) where values has one column per requested field
+    (a 1-D array when a single column is asked for), or None if the file is missing.
+    """
+    path = COMPANY_WISE / symbol / "prices.csv"
+    if not path.exists():
+        return None
+    by_date = {}
+    with open(path, newline="") as f:
+        for row in csv.DictReader(f):
+            date = row.get("date")
+            if not date:
+                continue
+            values = []
+            for col in columns:
+                try:
+                    values.append(float(row.get(col) or "nan"))
+                except ValueError:
+                    values.append(np.nan)
+            by_date[date] = values
+    dates = np.array(sorted(by_date), dtype="U10")
+    values = np.array([by_date[d] for d in dates], dtype=float).reshape(len(dates), len(columns))
+    # A zero price is a blank scraped as 0, not a real price
+    prices = [i for i, col in enumerate(columns) if col in ("open", "high", "low", "ltp")]
+    block = values[:, prices]
+    block[block <= 0] = np.nan
+    values[:, prices] = block
+    return dates, values[:, 0] if len(columns) == 1 else values
+
+
+class IndicatorEngine:
+    """
+    Computes technical indicators over each company's price history and stores
+    them in data/company-wise/{SYMBOL}/indicators.csv, next to prices.csv.
+
+    All indicators are windowed, so after a daily append only the new rows are
+    computed from the trailing window instead of the full history.
+    indicators.json records how much of prices.csv the cache covers (byte
+    size plus a fingerprint of the header and the bytes before that point) and
+    the trailing closes, so an update reads only the bytes appended since.
+    """
+
+    def __init__(self, indicators=DEFAULT_INDICATORS):
+        self.indicators = list(indicators)
+        self.specs = [parse_indicator(name) for name in self.indicators]
+        self.lookback = max(INDICATOR_KINDS[kind][1](n) for kind, n in self.specs)
+        self.fieldnames = ["date"] + self.indicators
+
+    def indicators_path(self, symbol):
+        return COMPANY_WISE / symbol / "indicators.csv"
+
+    def state_path(self, symbol):
+        return COMPANY_WISE / symbol / "indicators.json"
+
+    # ------------------------------------------------------------------
+    # Computation
+    # ------------------------------------------------------------------
+
+    def compute(self, close):
+        """Return {indicator name: array} for the full close series."""
+        return {
+            name: INDICATOR_KINDS[kind][0](close, n)
+            for name, (kind, n) in zip(self.indicators, self.specs)
+        }
+
+    def _rows(self, dates, values, start):
+        rows = []
+        for i in range(start, len(dates)):
+            row = {"date": dates[i]}
+            for name in self.indicators:
+                v = values[name][i]
+                row[name] = "" if np.isnan(v) else round(float(v), 4)
+            rows.append(row)
+        return rows
+
+    # ------------------------------------------------------------------
+    # Cache maintenance
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _fingerprint(f, size):
+        """Hash of the header line and the FINGERPRINT_BYTES before offset size."""
+        f.seek(0)
+        header = f.readline()
+        f.seek(max(0, size - FINGERPRINT_BYTES))
+        tail = f.read(size - max(0, size - FINGERPRINT_BYTES))
+        return hashlib.sha1(header + b"\0" + tail).hexdigest()
+
+    def _read_state(self, symbol):
+        """indicators.json, or None if it is missing, stale or for another indicator set."""
+        try:
+            with open(self.state_path(symbol)) as f:
+                state = json.load(f)
+            size = self.indicators_path(symbol).stat().st_size
+        except (FileNotFoundError, ValueError):
+            return None
+        if state.get("indicators") != self.indicators or state.get("indicators_bytes") != size:
+            return None  # indicators.csv was written without updating the state
+        return state
+
+    def _save_state(self, symbol, prices_bytes, fingerprint, last_date, close):
+        state = {
+            "indicators": self.indicators,
+            "prices_bytes": prices_bytes,
+            "prices_fingerprint": fingerprint,
+            "indicators_bytes": self.indicators_path(symbol).stat().st_size,
+            "last_date": last_date,
+            # NaN is not valid JSON
+            "closes": [None if np.isnan(c) else float(c) for c in close[-self.lookback:]] if self.lookback else [],
+        }
+        path = self.state_path(symbol)
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(state, f, indent=1)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _parse_appended(header, data):
+        """{date: close} for the prices.csv rows in data (bytes appended after the header)."""
+        reader = csv.DictReader(io.StringIO(data.decode("utf-8")),
+                                fieldnames=next(csv.reader([header.decode("utf-8")])))
+        by_date = {}
+        for row in reader:
+            date = row.get("date")
+            if not date:
+                continue
+            try:
+                close = float(row.get("ltp") or "nan")
+            except ValueError:
+                close = np.nan
+            by_date[date] = close if close > 0 else np.nan
+        return by_date
+
+    def rebuild_symbol(self, symbol):
+        """Recompute every indicator for a symbol and rewrite indicators.csv."""
+        prices = COMPANY_WISE / symbol / "prices.csv"
+        try:
+            with open(prices, "rb") as f:
+                size = os.fstat(f.fileno()).st_size
+                fingerprint = self._fingerprint(f, size)
+        except FileNotFoundError:
+            return 0
+        history = load_price_history(symbol)
+        if history is None:
+            return 0
+        dates, close = history
+        rows = self._rows(dates, self.compute(close), 0)
+
+        path = self.indicators_path(symbol)
+        tmp = path.with_suffix(".csv.tmp")
+        with open(tmp, "w", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=self.fieldnames)
+            writer.writeheader()
+            writer.writerows(rows)
+        os.replace(tmp, path)
+        # Rows appended while the history was read are re-read next time and,
+        # being no newer than the cache, cause another rebuild
+        self._save_state(symbol, size, fingerprint, str(dates[-1]) if len(dates) else None, close)
+        return len(rows)
+
+    def update_symbol(self, symbol):
+        """
+        Bring indicators.csv up to date with prices.csv.
+        Sessions appended after the cached ones are computed from the trailing
+        window, reading only the appended bytes of prices.csv. A missing cache,
+        a changed indicator set, a rewritten prices.csv or an appended row that
+        is not newer than the cache (a backfilled older date) triggers a full
+        rebuild.
+        Returns the number of indicator rows written.
+        """
+        state = self._read_state(symbol)
+        if state is None:
+            return self.rebuild_symbol(symbol)
+
+        prices = COMPANY_WISE / symbol / "prices.csv"
+        try:
+            f = open(prices, "rb")
+        except FileNotFoundError:
+            return 0
+        with f:
+            size = os.fstat(f.fileno()).st_size
+            covered = state["prices_bytes"]
+            if size < covered or self._fingerprint(f, covered) != state["prices_fingerprint"]:
+                # History changed underneath the cache (sorted / rewritten file)
+                return self.rebuild_symbol(symbol)
+            if size == covered:
+                return 0
+            f.seek(0)
+            header = f.readline()
+            f.seek(covered)
+            appended = f.read(size - covered)
+            fingerprint = self._fingerprint(f, size)
+
+        new = self._parse_appended(header, appended)
+        last_date = state["last_date"]
+        if new and (last_date is None or min(new) <= last_date):
+            return self.rebuild_symbol(symbol)
+
+        dates = np.array(sorted(new), dtype="U10")
+        tail = np.array([np.nan if c is None else c for c in state["closes"]], dtype=float)
+        close = np.concatenate([tail, [new[d] for d in dates]])
+        # Only the rows after the carried-over closes are written, so their dates are never read
+        rows = self._rows(np.concatenate([np.full(len(tail), "", dtype="U10"), dates]),
+                          self.compute(close), len(tail))
+
+        path = self.indicators_path(symbol)
+        with open(path, "a", newline="") as f:
+            csv.DictWriter(f, fieldnames=self.fieldnames).writerows(rows)
+        self._save_state(symbol, size, fingerprint, str(dates[-1]) if len(dates) else last_date, close)
+        logger.debug(f"{symbol}: +{len(rows)} indicator rows")
+        return len(rows)
+
+    def update_all(self, symbols=None, rebuild=False):
+        """Update (or rebuild) indicators for the given symbols, default all."""
+        if symbols is None:
+            symbols = sorted(
+                d.name for d in COMPANY_WISE.iterdir()
+                if d.is_dir() and (d / "prices.csv").exists()
+            )
+        written = 0
+        for sym in symbols:
+            try:
+                written += self.rebuild_symbol(sym) if rebuild else self.update_symbol(sym)
+            except Exception as e:
+                logger.error(f"Indicators failed for {sym}: {e}")
+        logger.info(f"Indicators: {written} rows written for {len(symbols)} symbols")
+        return written
+
+    def load(self, symbol):
+        """Read a symbol's cached indicators as (dates, {name: array})."""
+        self.update_symbol(symbol)
+        with open(self.indicators_path(symbol), newline="") as f:
+            rows = list(csv.DictReader(f))
+        dates = np.array([r["date"] for r in rows], dtype="U10")
+        values = {
+            name: np.array([float(r[name]) if r[name] else np.nan for r in rows])
+            for name in self.indicators
+        }
+        return dates, values
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Build / update the technical indicator cache")
+    parser.add_argument("symbols", nargs="*", help="Symbols to process (default: all)")
+    parser.add_argument("--rebuild", action="store_true", help="Recompute full history instead of appending")
+    parser.add_argument("--indicators", default=",".join(DEFAULT_INDICATORS),
+                        help="Comma-separated indicator list, e.g. sma_20,rsi_14")
+    args = parser.parse_args()
+
+    engine = IndicatorEngine(indicators=[s for s in args.indicators.split(",") if s])
+    engine.update_all(symbols=args.symbols or None, rebuild=args.rebuild)
@@ -0,0 +1,245 @@
+
+import os
+import time
+import logging
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+
+from .storage import FLOORSHEET_FIELDS, floorsheet_files, file_key, open_text, read_table
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+CACHE_DIR = DATA_DIR / ".cache" / "floorsheet"
+
+# Typed columns of the in-memory table (the scraper's `sn` is dropped)
+COLUMNS = {
+    "date": "datetime64[D]",
+    "contract_no": np.int64,
+    "stock_symbol": str,
+    "buyer": np.int32,
+    "seller": np.int32,
+    "quantity": np.float64,
+    "rate": np.float64,
+    "amount": np.float64,
+}
+
+
+# ---------------------------------------------------------------------------
+# Decoding
+# ---------------------------------------------------------------------------
+
+def decode_numbers(values, dtype=np.float64):
+    """
+    Numeric strings (commas already stripped or not) -> array of dtype.
+    Blanks and garbage become NaN, or -1 for integer dtypes.
+    """
+    try:
+        return np.array(values, dtype=dtype)
+    except ValueError:
+        from .quality import to_float
+        out = to_float(np.asarray(values, dtype=str))
+        if np.dtype(dtype).kind in "iu":
+            return np.where(np.isnan(out), -1, out).astype(dtype)
+        return out.astype(dtype)
+
+
+def trade_dates(contract_no):
+    """contract_no (YYYYMMDD + 8 digits) -> datetime64[D] trade dates, NaT where malformed."""
+    contract_no = np.asarray(contract_no, dtype=np.int64)
+    ymd = contract_no // 100_000_000
+    y, m, d = ymd // 10000, ymd // 100 % 100, ymd % 100
+    ok = (contract_no >= 0) & (y >= 1970) & (m >= 1) & (m <= 12) & (d >= 1) & (d <= 31)
+    months = np.where(ok, (y - 1970) * 12 + m - 1, 0).astype("datetime64[M]")
+    out = months.astype("datetime64[D]") + np.where(ok, d - 1, 0).astype("timedelta64[D]")
+    out[~ok] = np.datetime64("NaT")
+    return out
+
+
+def split_columns(text, fields=FLOORSHEET_FIELDS):
+    """
+    CSV text -> {field: list of str}, with the commas inside quoted fields
+    removed ("35,343.00" -> 35343.00). Only valid for files whose quoted
+    fields are all numbers, like the floorsheets. Returns None when the file
+    does not have that shape (other header, ragged rows) so the caller can
+    fall back to the csv module.
+    """
+    header, _, body = text.partition("\n")
+    if header.strip().split(",") != fields or "\r" in body:
+        return None
+    if '"' in body:
+        parts = body.split('"')
+        parts[1::2] = [p.replace(",", "") for p in parts[1::2]]
+        body = "".join(parts)
+    rows = body.count("\n") + (not body.endswith("\n") and body != "")
+    width = len(fields)
+    flat = body.replace("\n", ",").split(",")
+    if len(flat) < width * rows or (len(flat) > width * rows and any(flat[width * rows:])):
+        return None
+    return {field: flat[i:width * rows:width] for i, field in enumerate(fields)}
+
+
+def parse_file(path):
+    """One floorsheet file (day, .gz day or monthly roll-up) -> {column: typed array}."""
+    with open_text(path) as f:
+        raw = split_columns(f.read())
+    if raw is None:
+        table = read_table(path, FLOORSHEET_FIELDS)
+        raw = {field: table[:, i] for i, field in enumerate(FLOORSHEET_FIELDS)}
+    cols = {}
+    for name, dtype in COLUMNS.items():
+        values = raw[name]
+        if name == "date":
+            try:
+                cols[name] = np.array(values, dtype=dtype)
+            except ValueError:
+                cols[name] = np.array([v if len(v) == 10 else "NaT" for v in values], dtype=dtype)
+        elif name == "stock_symbol":
+            cols[name] = np.char.upper(np.char.strip(np.asarray(values, dtype=str)))
+        else:
+            cols[name] = decode_numbers(values, dtype)
+    return cols
+
+
+# ---------------------------------------------------------------------------
+# Columnar cache
+# ---------------------------------------------------------------------------
+
+def _signature(path):
+    st = os.stat(path)
+    return np.array([st.st_size, st.st_mtime_ns], dtype=np.int64)
+
+
+def load_file(path, cache=True, cache_dir=CACHE_DIR):
+    """
+    parse_file() through data/.cache/floorsheet/{name}.npz: reused while the
+    source file's size and mtime match, rewritten otherwise.
+    """
+    path = Path(path)
+    cached = Path(cache_dir) / f"{path.name}.npz"
+    signature = _signature(path)
+    if cache:
+        try:
+            with np.load(cached, allow_pickle=False) as z:
+                if np.array_equal(z["_signature"], signature):
+                    return {name: z[name] for name in COLUMNS}
+        except (FileNotFoundError, KeyError, ValueError, OSError):
+            pass
+    cols = parse_file(path)
+    if cache:
+        cached.parent.mkdir(parents=True, exist_ok=True)
+        tmp = cached.with_name(cached.name + ".tmp.npz")
+        np.savez(tmp, _signature=signature, **cols)
+        os.replace(tmp, cached)
+    return cols
+
+
+def _load(args):
+    """Process-pool worker."""
+    path, cache = args
+    return path, load_file(path, cache)
+
+
+# ---------------------------------------------------------------------------
+# Table
+# ---------------------------------------------------------------------------
+
+class FloorsheetTable:
+    """
+    Every stored trade in typed column arrays (see COLUMNS) plus trade_date,
+    sorted by date then contract_no. `date` is the floorsheet (scrape) date
+    as stored; trade_date comes from the contract number. A contract stored
+    in more than one file (a stale page saved again the next day) is kept
+    once, from the earliest file.
+    """
+
+    def __init__(self, columns):
+        order = np.lexsort((columns["contract_no"], columns["date"]))
+        contracts = columns["contract_no"][order]
+        # First copy of each contract in (date, contract_no) order; malformed (-1) rows all stay
+        _, first = np.unique(contracts, return_index=True)
+        keep = np.zeros(len(order), dtype=bool)
+        keep[first] = True
+        keep |= contracts < 0
+        order = order[keep]
+        self.columns = {name: columns[name][order] for name in COLUMNS}
+        self.columns["trade_date"] = trade_dates(self.columns["contract_no"])
+        self.days, self._starts = np.unique(self.columns["date"], return_index=True)
+
+    def __len__(self):
+        return len(self.columns["date"])
+
+    def __getitem__(self, name):
+        return self.columns[name]
+
+    def _slice(self, i, j):
+        return {name: col[i:j] for name, col in self.columns.items()}
+
+    def day(self, day):
+        """Columns of one day ('YYYY-MM-DD')."""
+        return self.range(day, day)
+
+    def range(self, start=None, end=None):
+        """Columns for start <= date <= end (views, not copies)."""
+        dates = self.columns["date"]
+        i = np.searchsorted(dates, np.datetime64(start, "D"), "left") if start else 0
+        j = np.searchsorted(dates, np.datetime64(end, "D"), "right") if end else len(dates)
+        return self._slice(i, j)
+
+    def to_frame(self, start=None, end=None):
+        import pandas as pd
+        return pd.DataFrame(self.range(start, end))
+
+    def nbytes(self):
+        return sum(col.nbytes for col in self.columns.values())
+
+
+def ingest(workers=None, cache=True):
+    """
+    Load the whole floorsheet archive (any storage layout) into one
+    FloorsheetTable. Files are decoded in `workers` processes (all cores by
+    default). A day stored twice is taken once, from its plain day file if
+    there is one, and each trade is counted once (see FloorsheetTable).
+    """
+    files = floorsheet_files()
+    day_files = {}
+    for path in files:
+        if len(file_key(path)) == 10:
+            day_files[file_key(path)] = path  # plain sorts last and wins
+    rollups = [p for p in files if len(file_key(p)) == 7]
+    todo = [(str(p), cache) for p in list(day_files.values()) + rollups]
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(todo) > 1:
+        with ProcessPoolExecutor(max_workers=min(workers, len(todo))) as pool:
+            loaded = dict(pool.map(_load, todo))
+    else:
+        loaded = dict(map(_load, todo))
+
+    parts = [loaded[str(p)] for p in day_files.values()]
+    have = np.array(sorted(day_files), dtype="datetime64[D]")
+    for path in rollups:
+        cols = loaded[str(path)]
+        keep = ~np.isin(cols["date"], have)
+        parts.append({name: col[keep] for name, col in cols.items()})
+    if not parts:
+        return FloorsheetTable({name: np.array([], dtype=dtype) for name, dtype in COLUMNS.items()})
+    return FloorsheetTable({name: np.concatenate([p[name] for p in parts]) for name in COLUMNS})
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Load every floorsheet into one typed table")
+    parser.add_argument("--workers", type=int, default=None, help="Decoding processes (default: all cores)")
+    parser.add_argument("--no-cache", action="store_true", help="Ignore and do not write data/.cache/floorsheet/")
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    table = ingest(args.workers, cache=not args.no_cache)
+    elapsed = time.perf_counter() - t0
+    print(f"{len(table)} trades over {len(table.days)} days "
+          f"({table.nbytes() / 2 ** 20:.1f} MB) in {elapsed:.2f}s")
@@ -0,0 +1,221 @@
+
+import os
+import sys
+import csv
+import json
+import logging
+import argparse
+from collections import defaultdict
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+
+PARTITION_FIELDS = ["date", "contract_no", "buyer", "seller", "quantity", "rate", "amount"]
+
+
+def _num(value):
+    """'14,277.20' -> 14277.2 (0.0 when blank / unparsable)."""
+    try:
+        return float(str(value).replace(",", "").strip() or 0)
+    except ValueError:
+        return 0.0
+
+
+def _fmt(x):
+    return f"{x:.2f}".rstrip("0").rstrip(".") if x % 1 else str(int(x))
+
+
+def trade_date(record, fallback):
+    """Trade date from the contract_no prefix (YYYYMMDD...), else the given date."""
+    cn = str(record.get("contract_no", "")).strip()
+    if len(cn) >= 8 and cn[:8].isdigit():
+        return f"{cn[:4]}-{cn[4:6]}-{cn[6:8]}"
+    return fallback
+
+
+class FloorsheetPartitions:
+    """
+    Per-symbol, per-month floorsheet partitions:
+
+        data/company-wise/{SYMBOL}/floorsheet/YYYY-MM.csv
+        data/company-wise/{SYMBOL}/floorsheet/index.json
+
+    Partitions are append-only and keyed by the trade date embedded in
+    contract_no, not the scrape date of the day file. Numbers are stored
+    without thousands separators. index.json holds, per month, the row count
+    and min/max of date, contract_no and rate, so a reader can skip whole
+    partitions and an append can skip the duplicate check when every new
+    contract is above the partition's max_contract.
+    """
+
+    def __init__(self, company_dir=COMPANY_WISE):
+        self.company_dir = Path(company_dir)
+
+    def partition_dir(self, symbol):
+        # Debenture symbols such as "GBILD84/85" must stay one directory
+        return self.company_dir / symbol.upper().replace("/", "_") / "floorsheet"
+
+    # ------------------------------------------------------------------
+    # Index
+    # ------------------------------------------------------------------
+
+    def load_index(self, symbol):
+        try:
+            with open(self.partition_dir(symbol) / "index.json") as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def _save_index(self, symbol, index):
+        path = self.partition_dir(symbol) / "index.json"
+        tmp = path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump(dict(sorted(index.items())), f, indent=1)
+        os.replace(tmp, path)
+
+    @staticmethod
+    def _merge_stats(stats, rows):
+        contracts = [int(r[1]) for r in rows]
+        rates = [float(r[5]) for r in rows]
+        dates = [r[0] for r in rows]
+        new = {
+            "rows": len(rows),
+            "min_date": min(dates), "max_date": max(dates),
+            "min_contract": min(contracts), "max_contract": max(contracts),
+            "min_rate": min(rates), "max_rate": max(rates),
+        }
+        if not stats:
+            return new
+        return {
+            "rows": stats["rows"] + new["rows"],
+            "min_date": min(stats["min_date"], new["min_date"]),
+            "max_date": max(stats["max_date"], new["max_date"]),
+            "min_contract": min(stats["min_contract"], new["min_contract"]),
+            "max_contract": max(stats["max_contract"], new["max_contract"]),
+            "min_rate": min(stats["min_rate"], new["min_rate"]),
+            "max_rate": max(stats["max_rate"], new["max_rate"]),
+        }
+
+    # ------------------------------------------------------------------
+    # Write
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _row(record, fallback_date):
+        return [
+            trade_date(record, fallback_date),
+            str(record.get("contract_no", "")).strip(),
+            str(record.get("buyer", "")).strip(),
+            str(record.get("seller", "")).strip(),
+            _fmt(_num(record.get("quantity"))),
+            _fmt(_num(record.get("rate"))),
+            _fmt(_num(record.get("amount"))),
+        ]
+
+    def append(self, records, file_date):
+        """
+        Route floorsheet records (dicts as in the day files) into their
+        partitions in one pass. Rows whose contract_no is already in the
+        partition are skipped. Returns the number of rows written.
+        """
+        groups = defaultdict(list)
+        for r in records:
+            sym = str(r.get("stock_symbol", "")).strip().upper()
+            row = self._row(r, file_date)
+            if sym and row[1].isdigit():
+                groups[(sym, row[0][:7])].append(row)
+
+        by_symbol = defaultdict(dict)
+        for (sym, month), rows in groups.items():
+            by_symbol[sym][month] = rows
+
+        written = 0
+        for sym, months in by_symbol.items():
+            index = self.load_index(sym)
+            pdir = self.partition_dir(sym)
+            pdir.mkdir(parents=True, exist_ok=True)
+            for month, rows in months.items():
+                path = pdir / f"{month}.csv"
+                stats = index.get(month)
+                if stats and min(int(r[1]) for r in rows) <= stats["max_contract"]:
+                    with open(path, newline="") as f:
+                        have = {row[1] for row in csv.reader(f)}
+                    rows = [r for r in rows if r[1] not in have]
+                if not rows:
+                    continue
+                rows.sort(key=lambda r: int(r[1]))
+                new_file = not path.exists()
+                with open(path, "a", newline="", encoding="utf-8") as f:
+                    writer = csv.writer(f)
+                    if new_file:
+                        writer.writerow(PARTITION_FIELDS)
+                    writer.writerows(rows)
+                index[month] = self._merge_stats(stats, rows)
+                written += len(rows)
+            self._save_index(sym, index)
+        return written
+
+    def rebuild(self):
+        """Recreate every partition from the floorsheet day files (any storage layout)."""
+        from .storage import iter_floorsheet_days
+
+        for pdir in self.company_dir.glob("*/floorsheet"):
+            for f in pdir.iterdir():
+                f.unlink()
+            pdir.rmdir()
+
+        total = 0
+        for day, rows, _ in iter_floorsheet_days():
+            n = self.append(rows, day)
+            logger.info(f"{day}: {n} rows partitioned")
+            total += n
+        return total
+
+    # ------------------------------------------------------------------
+    # Read
+    # ------------------------------------------------------------------
+
+    def months(self, symbol, start=None, end=None):
+        """Partition months overlapping [start, end] according to the index."""
+        return [
+            m for m, s in sorted(self.load_index(symbol).items())
+            if (start is None or s["max_date"] >= start) and (end is None or s["min_date"] <= end)
+        ]
+
+    def read(self, symbol, start=None, end=None):
+        """Trades of one symbol as a list of dicts (numbers parsed), optionally by date range."""
+        out = []
+        for month in self.months(symbol, start, end):
+            with open(self.partition_dir(symbol) / f"{month}.csv", newline="") as f:
+                for row in csv.DictReader(f):
+                    if (start and row["date"] < start) or (end and row["date"] > end):
+                        continue
+                    for k in ("quantity", "rate", "amount"):
+                        row[k] = float(row[k])
+                    out.append(row)
+        return out
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Per-symbol floorsheet partitions")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("rebuild", help="Rebuild all partitions from data/floorsheet/")
+    p_read = sub.add_parser("read", help="Print a symbol's trades")
+    p_read.add_argument("symbol")
+    p_read.add_argument("--start")
+    p_read.add_argument("--end")
+    args = parser.parse_args()
+
+    parts = FloorsheetPartitions()
+    if args.cmd == "rebuild":
+        print(f"Partitioned {parts.rebuild()} rows")
+    else:
+        rows = parts.read(args.symbol, args.start, args.end)
+        writer = csv.DictWriter(sys.stdout, fieldnames=PARTITION_FIELDS)
+        writer.writeheader()
+        writer.writerows(rows)
@@ -0,0 +1,160 @@
+
+import time
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+logger = logging.getLogger(__name__)
+
+
+class Stage:
+    """
+    One unit of pipeline work.
+
+    :param name:  Unique stage name.
+    :param func:  Callable run with no arguments.
+    :param deps:  Names of stages that must finish successfully first.
+    :param after: Names of stages that must finish first, successfully or not
+                  (ordering only — their failure does not skip this stage).
+    :param host:  Remote host the stage mostly talks to (for the report only —
+                  request concurrency is capped by the shared BudgetedSession).
+    """
+
+    def __init__(self, name, func, deps=(), host=None, after=()):
+        self.name = name
+        self.func = func
+        self.deps = tuple(deps)
+        self.after = tuple(after)
+        self.host = host
+        self.status = "pending"
+        self.started = None
+        self.finished = None
+        self.error = None
+
+    @property
+    def duration(self):
+        if self.started is None or self.finished is None:
+            return 0.0
+        return self.finished - self.started
+
+
+class Pipeline:
+    """
+    Runs stages as a dependency graph: every stage whose dependencies have
+    succeeded is started immediately on its own thread, so independent stages
+    overlap and wall time approaches the longest chain instead of the sum.
+    A failed stage marks all of its dependents as skipped; stages that only
+    run after it still start.
+    on_stage_done(stage), if given, is called in the calling thread after
+    each stage finishes (successfully or not).
+    """
+
+    def __init__(self, stages, on_stage_done=None):
+        self.stages = {s.name: s for s in stages}
+        self.on_stage_done = on_stage_done
+        for s in stages:
+            missing = [d for d in s.deps + s.after if d not in self.stages]
+            if missing:
+                raise ValueError(f"Stage '{s.name}' depends on unknown stage(s): {', '.join(missing)}")
+        self._check_acyclic()
+        self.started = None
+        self.finished = None
+
+    def _check_acyclic(self):
+        state = {}
+
+        def visit(name, path):
+            if state.get(name) == "done":
+                return
+            if state.get(name) == "visiting":
+                raise ValueError(f"Dependency cycle: {' -> '.join(path + [name])}")
+            state[name] = "visiting"
+            for dep in self.stages[name].deps + self.stages[name].after:
+                visit(dep, path + [name])
+            state[name] = "done"
+
+        for name in self.stages:
+            visit(name, [])
+
+    def _run_stage(self, stage):
+        threading.current_thread().name = stage.name
+        stage.started = time.perf_counter()
+        try:
+            stage.func()
+            stage.status = "ok"
+        except Exception as e:
+            stage.status = "failed"
+            stage.error = e
+            logger.exception(f"Stage '{stage.name}' failed: {e}")
+        finally:
+            stage.finished = time.perf_counter()
+        return stage
+
+    def run(self):
+        """Run every stage; returns True if all succeeded."""
+        self.started = time.perf_counter()
+        pending = dict(self.stages)
+        running = {}
+
+        with ThreadPoolExecutor(max_workers=max(len(self.stages), 1)) as pool:
+            while pending or running:
+                for name, stage in list(pending.items()):
+                    dep_status = [self.stages[d].status for d in stage.deps]
+                    after_status = [self.stages[d].status for d in stage.after]
+                    if any(s in ("failed", "skipped") for s in dep_status):
+                        stage.status = "skipped"
+                        logger.warning(f"Stage '{name}' skipped (dependency did not succeed)")
+                        del pending[name]
+                    elif all(s == "ok" for s in dep_status) and \
+                            all(s in ("ok", "failed", "skipped") for s in after_status):
+                        logger.info(f"Stage '{name}' started")
+                        stage.status = "running"
+                        running[pool.submit(self._run_stage, stage)] = stage
+                        del pending[name]
+
+                if not running:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in done:
+                    stage = running.pop(future)
+                    logger.info(f"Stage '{stage.name}' {stage.status} in {stage.duration:.1f}s")
+                    if self.on_stage_done:
+                        try:
+                            self.on_stage_done(stage)
+                        except Exception as e:
+                            logger.warning(f"Stage '{stage.name}' completion hook failed: {e}")
+
+        self.finished = time.perf_counter()
+        return all(s.status == "ok" for s in self.stages.values())
+
+    def failures(self):
+        """Names of the stages that failed or were skipped."""
+        return [s.name for s in self.stages.values() if s.status in ("failed", "skipped")]
+
+    def report(self):
+        """Per-stage timing table as a string."""
+        lines = [f"{'stage':14s} {'host':22s} {'status':8s} {'start':>8s} {'duration':>9s}"]
+        for s in sorted(self.stages.values(), key=lambda s: (s.started is None, s.started or 0)):
+            offset = (s.started - self.started) if s.started else 0.0
+            lines.append(
+                f"{s.name:14s} {(s.host or '-'):22s} {s.status:8s} {offset:7.1f}s {s.duration:8.1f}s"
+            )
+        wall = (self.finished or time.perf_counter()) - self.started
+        total = sum(s.duration for s in self.stages.values())
+        lines.append(f"wall time {wall:.1f}s  (sum of stages {total:.1f}s)")
+        return "\n".join(lines)
+
+    def as_dict(self):
+        return {
+            "wall_seconds": round((self.finished or time.perf_counter()) - self.started, 3),
+            "stages": {
+                s.name: {
+                    "host": s.host,
+                    "status": s.status,
+                    "start_offset": round(s.started - self.started, 3) if s.started else None,
+                    "seconds": round(s.duration, 3),
+                    "error": str(s.error) if s.error else None,
+                }
+                for s in self.stages.values()
+            },
+        }
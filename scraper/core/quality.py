@@ -0,0 +1,341 @@
+
+import os
+import csv
+import json
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+QUARANTINE_DIR = DATA_DIR / "quarantine"
+
+PRICE_FIELDS = ["date", "open", "high", "low", "ltp", "percent_change", "qty", "turnover"]
+FLOORSHEET_FIELDS = ["date", "sn", "contract_no", "stock_symbol", "buyer", "seller", "quantity", "rate", "amount"]
+
+# Rows failing an "error" rule are quarantined; "warn" rules are only reported
+# (corporate actions legitimately break percent_change and volume/turnover).
+PRICE_RULES = {
+    "bad_date": "error",
+    "missing_price": "error",      # blank or 0 open/high/low/ltp
+    "ohlc_order": "error",         # low <= ltp <= high violated
+    "open_range": "warn",          # open outside [low, high] (often the previous close)
+    "negative_volume": "error",
+    "duplicate_date": "error",     # an earlier copy of a date written again later
+    "volume_turnover": "warn",     # turnover / qty outside [low, high]
+    "percent_change": "warn",      # does not match the previous close
+}
+FLOORSHEET_RULES = {
+    "bad_contract": "error",       # contract_no is not YYYYMMDD + 8 digits
+    "missing_symbol": "error",
+    "bad_broker": "error",
+    "non_positive": "error",       # quantity / rate <= 0 or blank
+    "amount_mismatch": "error",    # amount != quantity * rate
+    "duplicate_contract": "error",
+    "contract_date": "warn",       # contract_no date differs from the file date
+}
+
+PRICE_TOLERANCE = 0.01     # prices are quoted to 0.1; allow rounding
+PERCENT_TOLERANCE = 0.5    # percentage points
+AMOUNT_TOLERANCE = 0.005   # relative
+
+
+# ---------------------------------------------------------------------------
+# Columns
+# ---------------------------------------------------------------------------
+
+def to_float(values):
+    """Strings / numbers -> float array; blanks, None and garbage become NaN."""
+    if not (isinstance(values, np.ndarray) and values.dtype.kind == "U"):
+        values = np.asarray(["" if v is None else str(v) for v in values], dtype=str)
+    arr = values
+    if np.char.find(arr, ",").max(initial=-1) >= 0:
+        arr = np.char.replace(arr, ",", "")
+    arr = np.where(np.char.str_len(np.char.strip(arr)) == 0, "nan", arr)
+    try:
+        return np.array(arr.tolist(), dtype=float)
+    except ValueError:  # a non-numeric cell somewhere: fall back to per-value parsing
+        out = np.full(len(arr), np.nan)
+        for i, v in enumerate(arr):
+            try:
+                out[i] = float(v)
+            except ValueError:
+                pass
+        return out
+
+
+def columns(rows, fields):
+    """List of dicts, lists in `fields` order or a 2-D str array -> {field: str array}."""
+    if isinstance(rows, np.ndarray):
+        return {f: rows[:, i] for i, f in enumerate(fields)}
+    if not rows:
+        return {f: np.array([], dtype=str) for f in fields}
+    if isinstance(rows[0], dict):
+        rows = [["" if r.get(f) is None else str(r[f]) for f in fields] for r in rows]
+    table = np.array(rows, dtype=str).reshape(len(rows), len(fields))
+    return {f: table[:, i] for i, f in enumerate(fields)}
+
+
+def _valid_dates(dates):
+    digits = np.char.replace(dates, "-", "")
+    return (np.char.str_len(dates) == 10) & (np.char.count(dates, "-") == 2) & np.char.isdigit(digits)
+
+
+# ---------------------------------------------------------------------------
+# Checks (one boolean mask per rule, True = row fails)
+# ---------------------------------------------------------------------------
+
+def check_prices(cols, symbols=None, prev_close=None):
+    """
+    Run PRICE_RULES over columns in file order. symbols (names or integer
+    ids, optional) groups rows of several files so duplicate dates and
+    previous closes are found per symbol. prev_close is the close before the first row (a single
+    symbol's batch appended to an existing file).
+    """
+    n = len(cols["date"])
+    dates = cols["date"]
+    o, h, l, c = (to_float(cols[k]) for k in ("open", "high", "low", "ltp"))
+    pct, qty, turnover = to_float(cols["percent_change"]), to_float(cols["qty"]), to_float(cols["turnover"])
+    if symbols is None:
+        sym = np.zeros(n, dtype=np.int64)
+    elif np.asarray(symbols).dtype.kind in "iu":
+        sym = np.asarray(symbols)
+    else:
+        sym = np.unique(symbols, return_inverse=True)[1]
+
+    valid = _valid_dates(dates)
+    masks = {"bad_date": ~valid}
+    day = np.where(valid, dates, "1970-01-01").astype("datetime64[D]").astype(np.int64)
+    prices = np.vstack([o, h, l, c])
+    masks["missing_price"] = np.any(np.isnan(prices) | (prices <= 0), axis=0)
+    with np.errstate(invalid="ignore"):
+        masks["ohlc_order"] = ~masks["missing_price"] & (
+            (l > c + PRICE_TOLERANCE) | (h < c - PRICE_TOLERANCE) | (l > h)
+        )
+        masks["open_range"] = ~masks["missing_price"] & ~masks["ohlc_order"] & (
+            (l > o + PRICE_TOLERANCE) | (h < o - PRICE_TOLERANCE)
+        )
+        masks["negative_volume"] = (qty < 0) | (turnover < 0)
+
+        avg = np.where(qty > 0, turnover / np.where(qty > 0, qty, 1), np.nan)
+        traded = (qty > 0) & (turnover > 0) & ~masks["missing_price"]
+        masks["volume_turnover"] = (traded & ((avg < l * 0.95) | (avg > h * 1.05))) | \
+                                   ((qty > 0) & (turnover == 0)) | ((qty == 0) & (turnover > 0))
+
+    # Sort by symbol, date, file position: the last copy of a date is the one kept
+    order = np.lexsort((np.arange(n), day, sym))
+    s_sym, s_date = sym[order], day[order]
+    same_next = np.zeros(n, dtype=bool)
+    same_next[:-1] = (s_sym[:-1] == s_sym[1:]) & (s_date[:-1] == s_date[1:])
+    dup = np.zeros(n, dtype=bool)
+    dup[order] = same_next
+    masks["duplicate_date"] = dup
+
+    # Previous close among the kept rows of the same symbol
+    kept = order[~same_next]
+    k_close, k_sym = c[kept], sym[kept]
+    prev = np.full(len(kept), np.nan)
+    prev[1:] = np.where(k_sym[1:] == k_sym[:-1], k_close[:-1], np.nan)
+    if prev_close and len(kept):
+        prev[0] = prev_close
+    with np.errstate(invalid="ignore", divide="ignore"):
+        expected = (k_close / prev - 1) * 100
+        bad = np.abs(expected - pct[kept]) > PERCENT_TOLERANCE
+    pct_mask = np.zeros(n, dtype=bool)
+    pct_mask[kept] = bad & ~np.isnan(expected) & ~np.isnan(pct[kept])
+    masks["percent_change"] = pct_mask
+    return masks
+
+
+def check_floorsheet(cols, file_dates):
+    """Run FLOORSHEET_RULES over columns; file_dates is the day file's date per row."""
+    n = len(cols["contract_no"])
+    cn = np.char.strip(cols["contract_no"])
+    qty, rate, amount = to_float(cols["quantity"]), to_float(cols["rate"]), to_float(cols["amount"])
+
+    masks = {"bad_contract": (np.char.str_len(cn) != 16) | ~np.char.isdigit(cn)}
+    masks["missing_symbol"] = np.char.strip(cols["stock_symbol"]) == ""
+    masks["bad_broker"] = ~np.char.isdigit(np.char.strip(cols["buyer"])) | \
+                          ~np.char.isdigit(np.char.strip(cols["seller"]))
+    with np.errstate(invalid="ignore"):
+        masks["non_positive"] = ~(qty > 0) | ~(rate > 0)
+        masks["amount_mismatch"] = ~masks["non_positive"] & (
+            np.isnan(amount) | (np.abs(amount - qty * rate) > np.maximum(1.0, AMOUNT_TOLERANCE * amount))
+        )
+
+    # Keep the first copy of a contract (day files are written newest-first)
+    _, first = np.unique(cn, return_index=True)
+    dup = np.ones(n, dtype=bool)
+    dup[first] = False
+    masks["duplicate_contract"] = dup
+
+    file_days = np.char.replace(np.asarray(file_dates, dtype=str), "-", "")
+    masks["contract_date"] = ~masks["bad_contract"] & (cn.astype("U8") != file_days)
+    return masks
+
+
+def failures(masks, rules):
+    """(error mask, reason per row) from rule masks; reasons join every failed rule."""
+    n = len(next(iter(masks.values()))) if masks else 0
+    error = np.zeros(n, dtype=bool)
+    reasons = np.full(n, "", dtype=object)
+    for rule, mask in masks.items():
+        if rules[rule] == "error":
+            error |= mask
+        reasons[mask] = np.where(reasons[mask] == "", rule, reasons[mask] + "|" + rule)
+    return error, reasons
+
+
+def summarize(masks):
+    return {rule: int(mask.sum()) for rule, mask in masks.items() if mask.any()}
+
+
+# ---------------------------------------------------------------------------
+# Quarantine
+# ---------------------------------------------------------------------------
+
+def quarantine(kind, fields, rows, reasons, symbol=None, root=QUARANTINE_DIR):
+    """Append rejected rows to data/quarantine/{kind}.csv with the failed rules."""
+    if not rows:
+        return
+    root = Path(root)
+    root.mkdir(parents=True, exist_ok=True)
+    path = root / f"{kind}.csv"
+    header = (["symbol"] if symbol is not None else []) + ["reason"] + fields
+    new_file = not path.exists() or path.stat().st_size == 0
+    with open(path, "a", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f, lineterminator="\n")
+        if new_file:
+            writer.writerow(header)
+        for row, reason in zip(rows, reasons):
+            values = [row.get(k, "") for k in fields] if isinstance(row, dict) else list(row)
+            writer.writerow(([symbol] if symbol is not None else []) + [reason] + values)
+
+
+# ---------------------------------------------------------------------------
+# Write-time gates
+# ---------------------------------------------------------------------------
+
+def gate_prices(symbol, records, prev_close=None):
+    """
+    Validate a batch of price records before it is appended. Returns
+    (records to write, {rule: count}); rejected rows go to quarantine.
+    """
+    if not records:
+        return records, {}
+    masks = check_prices(columns(records, PRICE_FIELDS), prev_close=prev_close)
+    error, reasons = failures(masks, PRICE_RULES)
+    report = summarize(masks)
+    if error.any():
+        bad = np.flatnonzero(error)
+        quarantine("prices", PRICE_FIELDS, [records[i] for i in bad], reasons[bad], symbol=symbol)
+        logger.warning(f"[{symbol}] quarantined {len(bad)} of {len(records)} price rows: {report}")
+    elif report:
+        logger.info(f"[{symbol}] price warnings: {report}")
+    return [r for r, e in zip(records, error) if not e], report
+
+
+def gate_floorsheet(records, day):
+    """Validate a batch of floorsheet records for file date `day` (see gate_prices)."""
+    if not records:
+        return records, {}
+    masks = check_floorsheet(columns(records, FLOORSHEET_FIELDS), [day] * len(records))
+    error, reasons = failures(masks, FLOORSHEET_RULES)
+    report = summarize(masks)
+    if error.any():
+        bad = np.flatnonzero(error)
+        quarantine("floorsheet", FLOORSHEET_FIELDS, [records[i] for i in bad], reasons[bad])
+        logger.warning(f"Floorsheet {day}: quarantined {len(bad)} of {len(records)} rows: {report}")
+    elif report:
+        logger.info(f"Floorsheet {day}: warnings: {report}")
+    return [r for r, e in zip(records, error) if not e], report
+
+
+# ---------------------------------------------------------------------------
+# Full audit
+# ---------------------------------------------------------------------------
+
+def audit_prices(symbols=None, fix=False):
+    """
+    Check every prices.csv in one vectorized pass. With fix, rows failing an
+    error rule are moved to quarantine and their files rewritten without
+    them. Returns {rule: count} plus totals.
+    """
+    from .storage import read_table
+
+    dirs = [COMPANY_WISE / s for s in symbols] if symbols else sorted(p for p in COMPANY_WISE.iterdir() if p.is_dir())
+    names, tables = [], []
+    for d in dirs:
+        path = d / "prices.csv"
+        if path.exists():
+            tables.append(read_table(path, PRICE_FIELDS))
+            names.append(d.name)
+    rows = np.concatenate(tables) if tables else np.empty((0, len(PRICE_FIELDS)), dtype=str)
+    file_id = np.repeat(np.arange(len(names)), [len(t) for t in tables])
+    masks = check_prices(columns(rows, PRICE_FIELDS), symbols=file_id)
+    error, reasons = failures(masks, PRICE_RULES)
+    report = {"rows": len(rows), "symbols": len(names), "quarantined": 0, **summarize(masks)}
+
+    if fix and error.any():
+        for k in np.unique(file_id[error]):
+            sel = np.flatnonzero(file_id == k)
+            bad = sel[error[sel]]
+            quarantine("prices", PRICE_FIELDS, rows[bad].tolist(), reasons[bad], symbol=names[k])
+            path = COMPANY_WISE / names[k] / "prices.csv"
+            tmp = path.with_suffix(".csv.tmp")
+            with open(tmp, "w", newline="", encoding="utf-8") as f:
+                writer = csv.writer(f, lineterminator="\n")
+                writer.writerow(PRICE_FIELDS)
+                writer.writerows(rows[sel[~error[sel]]].tolist())
+            os.replace(tmp, path)
+            report["quarantined"] += len(bad)
+    return report
+
+
+def audit_floorsheets():
+    """Check every stored floorsheet day (any storage layout). Report only."""
+    from .storage import floorsheet_files, file_key, read_table
+
+    tables, file_dates = [], []
+    for path in floorsheet_files():
+        table = read_table(path, FLOORSHEET_FIELDS)
+        tables.append(table)
+        key = file_key(path)
+        # Monthly roll-ups hold several days: each row's date column is its file date
+        file_dates.append(np.full(len(table), key) if len(key) == 10 else table[:, 0])
+    if not tables:
+        return {"rows": 0, "days": 0}
+    rows, file_dates = np.concatenate(tables), np.concatenate(file_dates)
+    # A contract stored under two days is a duplicate as well
+    masks = check_floorsheet(columns(rows, FLOORSHEET_FIELDS), file_dates)
+    return {"rows": len(rows), "days": len(np.unique(file_dates)), **summarize(masks)}
+
+
+def audit(fix=False, floorsheets=True, report_path=QUARANTINE_DIR / "report.json"):
+    report = {"prices": audit_prices(fix=fix)}
+    if floorsheets:
+        report["floorsheet"] = audit_floorsheets()
+    if report_path:
+        Path(report_path).parent.mkdir(parents=True, exist_ok=True)
+        with open(report_path, "w") as f:
+            json.dump(report, f, indent=1)
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Data-quality checks over prices.csv and floorsheets")
+    parser.add_argument("symbols", nargs="*", help="Only check these symbols' prices")
+    parser.add_argument("--fix", action="store_true", help="Quarantine price rows failing an error rule")
+    parser.add_argument("--no-floorsheet", action="store_true", help="Skip the floorsheet checks")
+    args = parser.parse_args()
+
+    if args.symbols:
+        print(json.dumps(audit_prices([s.upper() for s in args.symbols], fix=args.fix), indent=1))
+    else:
+        print(json.dumps(audit(fix=args.fix, floorsheets=not args.no_floorsheet), indent=1))
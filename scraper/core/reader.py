@@ -0,0 +1,304 @@
+
+import os
+import time
+import logging
+import argparse
+import threading
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+from .storage import floorsheet_files, file_key, read_table
+from .quality import to_float
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+
+PRICE_FIELDS = ["date", "open", "high", "low", "ltp", "percent_change", "qty", "turnover"]
+CACHE_MB = 512
+
+
+# ---------------------------------------------------------------------------
+# Cache
+# ---------------------------------------------------------------------------
+
+def _signature(path):
+    try:
+        st = os.stat(path)
+        return st.st_size, st.st_mtime_ns
+    except FileNotFoundError:
+        return None
+
+
+class _LRUCache:
+    """
+    Parsed tables keyed by source file. An entry is valid while the file's
+    size and mtime are unchanged; the least recently used entries are dropped
+    once the total exceeds max_bytes.
+    """
+
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self.bytes = 0
+        self.hits = self.misses = 0
+        self._entries = OrderedDict()  # key -> (signature, value, nbytes)
+        self._lock = threading.Lock()
+
+    def get(self, key, signature):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry and entry[0] == signature:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            return None
+
+    def put(self, key, signature, value):
+        nbytes = int(value.memory_usage(index=True, deep=True).sum())
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old:
+                self.bytes -= old[2]
+            if nbytes > self.max_bytes:
+                return value
+            self._entries[key] = (signature, value, nbytes)
+            self.bytes += nbytes
+            while self.bytes > self.max_bytes:
+                _, (_, _, n) = self._entries.popitem(last=False)
+                self.bytes -= n
+        return value
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.bytes = 0
+
+    def info(self):
+        return {"entries": len(self._entries), "bytes": self.bytes, "max_bytes": self.max_bytes,
+                "hits": self.hits, "misses": self.misses}
+
+
+_CACHE = _LRUCache(CACHE_MB * 2 ** 20)
+
+
+def set_cache_size(mb):
+    """Change the cache bound (MB); entries over it are evicted on the next insert."""
+    _CACHE.max_bytes = int(mb * 2 ** 20)
+
+
+def clear_cache():
+    _CACHE.clear()
+
+
+def cache_info():
+    return _CACHE.info()
+
+
+def _cached(key, path, parse):
+    signature = _signature(path)
+    if signature is None:
+        return None
+    value = _CACHE.get(key, signature)
+    if value is None:
+        value = _CACHE.put(key, signature, parse(path))
+    return value
+
+
+# ---------------------------------------------------------------------------
+# Parsing
+# ---------------------------------------------------------------------------
+
+def _parse_prices(path):
+    """
+    prices.csv -> DataFrame indexed by date, oldest first, one row per date.
+    The file mixes a newest-first scrape with oldest-first appends; for a
+    repeated date the row written last wins. Zero prices are blanks -> NaN.
+    """
+    table = read_table(path, PRICE_FIELDS)
+    dates = pd.to_datetime(pd.Series(table[:, 0]), format="%Y-%m-%d", errors="coerce")
+    values = np.column_stack([to_float(table[:, i]) for i in range(1, len(PRICE_FIELDS))])
+    block = values[:, :4]  # open, high, low, ltp
+    block[block <= 0] = np.nan
+    df = pd.DataFrame(values, columns=PRICE_FIELDS[1:], index=pd.DatetimeIndex(dates, name="date"))
+    df = df[df.index.notna()]
+    return df[~df.index.duplicated(keep="last")].sort_index(kind="stable")
+
+
+def _parse_floorsheet(path):
+    """A floorsheet file (day or roll-up) -> typed DataFrame, one row per stored trade."""
+    from .ingest import parse_file
+    df = pd.DataFrame(parse_file(path))
+    df["stock_symbol"] = pd.Categorical(df["stock_symbol"])
+    return df
+
+
+def _empty_floorsheet():
+    return pd.DataFrame({
+        "date": pd.Series([], dtype="datetime64[ns]"), "contract_no": pd.Series([], dtype=np.int64),
+        "stock_symbol": pd.Series([], dtype=str), "buyer": pd.Series([], dtype=np.int32),
+        "seller": pd.Series([], dtype=np.int32), "quantity": pd.Series([], dtype=float),
+        "rate": pd.Series([], dtype=float), "amount": pd.Series([], dtype=float),
+        "trade_date": pd.Series([], dtype="datetime64[ns]"),
+    })
+
+
+# ---------------------------------------------------------------------------
+# Public readers
+# ---------------------------------------------------------------------------
+
+def symbols():
+    """Symbols with a prices.csv, sorted."""
+    return sorted(p.parent.name for p in COMPANY_WISE.glob("*/prices.csv"))
+
+
+def load_prices(symbol, start=None, end=None):
+    """
+    One symbol's price history: DataFrame indexed by date (oldest first) with
+    float columns open, high, low, ltp, percent_change, qty, turnover.
+    Empty if the symbol has no prices.csv. Do not modify the result in place;
+    it is shared with the cache (take a .copy()).
+    """
+    symbol = symbol.strip().upper()
+    df = _cached(("prices", symbol), COMPANY_WISE / symbol / "prices.csv", _parse_prices)
+    if df is None:
+        return pd.DataFrame(columns=PRICE_FIELDS[1:], index=pd.DatetimeIndex([], name="date"), dtype=float)
+    if start or end:
+        df = df.loc[start:end]
+    return df
+
+
+def _floorsheet_file_days():
+    """{day: path} for every stored day; plain day files override compressed copies and roll-ups."""
+    days = {}
+    for path in floorsheet_files():
+        key = file_key(path)
+        if len(key) == 10:
+            days[key] = path
+    rollups = [p for p in floorsheet_files() if len(file_key(p)) == 7]
+    return days, rollups
+
+
+def load_floorsheet(date=None, symbols=None, start=None, end=None):
+    """
+    Floorsheet trades as a typed DataFrame (date, contract_no, stock_symbol,
+    buyer, seller, quantity, rate, amount, trade_date), sorted by date then
+    contract_no. `date` is one day ('YYYY-MM-DD'); without it, start/end
+    bound the days (all stored days when both are None). `symbols` filters
+    stock_symbol. `date` is the scrape date of the file, as stored, and
+    trade_date comes from the contract number. A trade stored in several
+    files (a stale page saved again) is returned once, from the earliest.
+    """
+    from .ingest import trade_dates
+
+    lo, hi = (date, date) if date else (start or "0000", end or "9999")
+    day_files, rollups = _floorsheet_file_days()
+    frames = []
+    for day in sorted(day_files):
+        if lo <= day <= hi:
+            frames.append(_cached(("floorsheet", str(day_files[day])), day_files[day], _parse_floorsheet))
+    for path in rollups:
+        month = file_key(path)
+        if lo[:7] <= month <= hi[:7]:
+            df = _cached(("floorsheet", str(path)), path, _parse_floorsheet)
+            days = df["date"].dt.strftime("%Y-%m-%d")
+            frames.append(df[(days >= lo) & (days <= hi) & ~days.isin(list(day_files))])
+    frames = [f for f in frames if f is not None and len(f)]
+    if not frames:
+        return _empty_floorsheet()
+    df = pd.concat(frames, ignore_index=True)
+    df["stock_symbol"] = df["stock_symbol"].astype(str)
+    if symbols:
+        wanted = {symbols.upper()} if isinstance(symbols, str) else {s.upper() for s in symbols}
+        df = df[df["stock_symbol"].isin(wanted)]
+    df = df.sort_values(["date", "contract_no"], kind="stable")
+    df = df[~df["contract_no"].duplicated() | (df["contract_no"] < 0)]
+    df["trade_date"] = trade_dates(df["contract_no"].to_numpy())
+    return df.reset_index(drop=True)
+
+
+def _parse_many(paths):
+    """Worker: parse several prices.csv files (one process, one chunk)."""
+    return [(path, _signature(path), _parse_prices(path)) for path in paths]
+
+
+def load_market(symbol_list=None, workers=None):
+    """
+    Price history of every symbol (or symbol_list): {symbol: DataFrame}.
+    Symbols missing from the cache are parsed in `workers` processes (all
+    cores by default) and added to it; workers=1 parses in-process.
+    """
+    symbol_list = symbols() if symbol_list is None else [s.strip().upper() for s in symbol_list]
+    out, todo = {}, []
+    for sym in symbol_list:
+        path = COMPANY_WISE / sym / "prices.csv"
+        signature = _signature(path)
+        if signature is None:
+            continue
+        df = _CACHE.get(("prices", sym), signature)
+        if df is None:
+            todo.append((sym, path))
+        else:
+            out[sym] = df
+
+    workers = workers or os.cpu_count() or 1
+    if workers > 1 and len(todo) > 8:
+        paths = [str(p) for _, p in todo]
+        chunks = [paths[i::workers * 4] for i in range(workers * 4)]
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            parsed = [r for chunk in pool.map(_parse_many, [c for c in chunks if c]) for r in chunk]
+    else:
+        parsed = _parse_many([str(p) for _, p in todo])
+    for path, signature, df in parsed:
+        sym = Path(path).parent.name
+        out[sym] = _CACHE.put(("prices", sym), signature, df)
+    return {sym: out[sym] for sym in symbol_list if sym in out}
+
+
+def load_panel(symbol_list=None, start=None, end=None, field="ltp", workers=None):
+    """
+    One price field for many symbols as a date x symbol DataFrame (NaN where
+    a symbol did not trade). All symbols when symbol_list is None.
+    """
+    frames = load_market(symbol_list, workers)
+    panel = pd.DataFrame({sym: df[field] for sym, df in frames.items()})
+    panel.index.name = "date"
+    if start or end:
+        panel = panel.loc[start:end]
+    return panel.sort_index()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Read data/ as typed DataFrames")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_prices = sub.add_parser("prices", help="One symbol's price history")
+    p_prices.add_argument("symbol")
+    p_prices.add_argument("--start")
+    p_prices.add_argument("--end")
+    p_floor = sub.add_parser("floorsheet", help="One day's floorsheet")
+    p_floor.add_argument("date")
+    p_floor.add_argument("symbols", nargs="*")
+    p_market = sub.add_parser("market", help="Load every symbol and report timings")
+    p_market.add_argument("--workers", type=int, default=None)
+    args = parser.parse_args()
+
+    if args.cmd == "prices":
+        print(load_prices(args.symbol, args.start, args.end).to_string())
+    elif args.cmd == "floorsheet":
+        print(load_floorsheet(args.date, args.symbols or None).to_string())
+    else:
+        t0 = time.perf_counter()
+        frames = load_market(workers=args.workers)
+        t1 = time.perf_counter()
+        load_market(workers=args.workers)
+        t2 = time.perf_counter()
+        rows = sum(len(df) for df in frames.values())
+        print(f"{len(frames)} symbols, {rows} rows: cold {t1 - t0:.2f}s, cached {t2 - t1:.3f}s")
+        print(cache_info())
@@ -0,0 +1,360 @@
+
+import os
+import csv
+import json
+import time
+import logging
+import argparse
+from pathlib import Path
+
+import numpy as np
+
+from .quality import to_float
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+COMPANY_LIST_PATH = DATA_DIR / "company_list.json"
+SECTORS_PATH = DATA_DIR / "sectors.json"
+OUTPUT_PATH = DATA_DIR / "sector_index.csv"
+CACHE_PATH = DATA_DIR / ".cache" / "price_matrix.npz"
+
+FIELDS = ("ltp", "qty", "turnover")
+MARKET = "Market"
+UNCLASSIFIED = "Unclassified"
+BASE_LEVEL = 1000.0
+# A larger one-session move is a bad print or a corporate action the factors
+# got wrong (NEPSE's circuit breaker is 10%); it counts as no change.
+MAX_MOVE = 0.5
+OUTPUT_FIELDS = ["date", "sector", "index", "return", "constituents", "traded",
+                 "advances", "declines", "unchanged", "qty", "turnover"]
+
+
+# ---------------------------------------------------------------------------
+# Sector mapping
+# ---------------------------------------------------------------------------
+
+def load_sectors(path=SECTORS_PATH, universe_path=COMPANY_LIST_PATH):
+    """
+    {symbol: (sector, weight)} for every index constituent.
+
+    data/sectors.json maps a symbol to its sector name, or to
+    {"sector": ..., "weight": ...}. Weights are fixed (e.g. listed shares)
+    and default to 1, i.e. equal weight; weight 0 leaves a symbol out.
+    Symbols of company_list.json without an entry are "Unclassified", so
+    without a sectors.json there is one sector plus the market.
+    """
+    try:
+        with open(path) as f:
+            raw = json.load(f)
+    except FileNotFoundError:
+        raw = {}
+    try:
+        with open(universe_path) as f:
+            universe = json.load(f)
+    except FileNotFoundError:
+        universe = []
+
+    mapping = {sym.strip().upper(): (UNCLASSIFIED, 1.0) for sym in universe}
+    for sym, entry in raw.items():
+        if isinstance(entry, dict):
+            sector, weight = entry.get("sector") or UNCLASSIFIED, float(entry.get("weight", 1.0))
+        else:
+            sector, weight = str(entry), 1.0
+        mapping[sym.strip().upper()] = (sector, weight)
+    return {sym: sw for sym, sw in mapping.items() if sw[1] > 0}
+
+
+# ---------------------------------------------------------------------------
+# Price matrix
+# ---------------------------------------------------------------------------
+
+def _parse_lines(header, body):
+    """prices.csv body text (no header) -> (dates, values[n, len(FIELDS)]), last row per date kept."""
+    cols = header.strip().split(",")
+    idx = [cols.index(f) if f in cols else None for f in ("date",) + FIELDS]
+    width = len(cols)
+    lines = body.count("\n") + (not body.endswith("\n") and body != "")
+    if idx[0] is None or not lines:
+        return np.array([], dtype="U10"), np.zeros((0, len(FIELDS)))
+    # Fast path, as in storage.read_table: no quoting and every line complete
+    if '"' not in body and "\r" not in body and body.count(",") == (width - 1) * lines:
+        table = np.array(body.replace("\n", ",").split(",")[:width * lines], dtype=str).reshape(lines, width)
+    else:
+        rows = [r for r in csv.reader(body.splitlines()) if len(r) == width]
+        table = np.array(rows, dtype=str).reshape(len(rows), width)
+    dates = table[:, idx[0]].astype("U10")
+    ok = np.char.str_len(dates) == 10
+    table, dates = table[ok], dates[ok]
+    values = np.column_stack([to_float(table[:, i]) if i is not None else np.full(len(table), np.nan)
+                              for i in idx[1:]])
+    price = values[:, 0]
+    price[price <= 0] = np.nan  # a zero price is a blank scraped as 0
+    # The file mixes a newest-first scrape with oldest-first appends: the row written last wins
+    _, last = np.unique(dates[::-1], return_index=True)
+    keep = len(dates) - 1 - last
+    return dates[keep], values[keep]
+
+
+class PriceMatrix:
+    """
+    ltp, qty and turnover of every symbol as (dates x symbols) float arrays,
+    NaN where a symbol has no row. Cached in data/.cache/price_matrix.npz with
+    each prices.csv's size and mtime; update() reads only the bytes appended
+    to a file since the last update and re-reads a file only when it was
+    rewritten.
+    """
+
+    def __init__(self, path=CACHE_PATH):
+        self.path = Path(path)
+        self.dates = np.array([], dtype="U10")
+        self.symbols = np.array([], dtype="U20")
+        self.values = np.zeros((len(FIELDS), 0, 0))
+        self.sources = {}  # symbol -> [size, mtime_ns]
+
+    def load(self):
+        try:
+            with np.load(self.path, allow_pickle=False) as z:
+                self.dates, self.symbols, self.values = z["dates"], z["symbols"], z["values"]
+                self.sources = {str(s): [int(a), int(b)] for s, a, b in
+                                zip(z["symbols"], z["source_sizes"], z["source_mtimes"])}
+        except (FileNotFoundError, KeyError, ValueError):
+            pass
+        return self
+
+    def save(self):
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.path.with_name(self.path.name + ".tmp.npz")
+        sig = [self.sources.get(str(s), [-1, -1]) for s in self.symbols]
+        np.savez(
+            tmp, dates=self.dates, symbols=self.symbols, values=self.values,
+            source_sizes=np.array([s[0] for s in sig], dtype=np.int64),
+            source_mtimes=np.array([s[1] for s in sig], dtype=np.int64),
+        )
+        os.replace(tmp, self.path)
+
+    def field(self, name):
+        return self.values[FIELDS.index(name)]
+
+    def _grow(self, symbols, dates):
+        """Add columns for new symbols and rows for new dates in one reallocation."""
+        new_symbols = np.setdiff1d(symbols, self.symbols)
+        new_dates = np.setdiff1d(dates, self.dates)
+        if not len(new_symbols) and not len(new_dates):
+            return
+        all_symbols = np.concatenate([self.symbols, new_symbols])
+        all_dates = np.union1d(self.dates, new_dates)
+        values = np.full((len(FIELDS), len(all_dates), len(all_symbols)), np.nan)
+        rows = np.searchsorted(all_dates, self.dates)
+        values[:, rows, :len(self.symbols)] = self.values
+        self.symbols, self.dates, self.values = all_symbols, all_dates, values
+
+    def _read(self, path, offset):
+        """(dates, values) from byte offset on, or None if offset is not a line boundary."""
+        with open(path, "rb") as f:
+            header = f.readline().decode("utf-8", "replace")
+            if offset:
+                f.seek(offset - 1)
+                if f.read(1) != b"\n":
+                    return None
+            body = f.read().decode("utf-8", "replace")
+        return _parse_lines(header, body)
+
+    def update(self, symbols=None, full=False):
+        """Bring the matrix up to date with prices.csv. Returns #cells written."""
+        if full:
+            self.__init__(self.path)
+        paths = {p.parent.name: p for p in COMPANY_WISE.glob("*/prices.csv")}
+        if symbols is not None:
+            paths = {s: paths[s] for s in symbols if s in paths}
+        parsed = {}  # symbol -> (signature, restart, dates, values)
+        for sym in sorted(paths):
+            st = paths[sym].stat()
+            sig = [st.st_size, st.st_mtime_ns]
+            prev = self.sources.get(sym)
+            if prev == sig:
+                continue
+            tail = self._read(paths[sym], prev[0]) if prev and st.st_size > prev[0] else None
+            # New, rewritten or truncated: the column starts over from the whole file
+            parsed[sym] = (sig, False, *tail) if tail is not None else (sig, True, *self._read(paths[sym], 0))
+        if not parsed:
+            if full:
+                self.save()
+            return 0
+
+        self._grow(np.array(list(parsed), dtype=self.symbols.dtype if len(self.symbols) else "U20"),
+                   np.unique(np.concatenate([p[2] for p in parsed.values()])))
+        columns = {str(s): j for j, s in enumerate(self.symbols)}
+        written = 0
+        for sym, (sig, restart, dates, values) in parsed.items():
+            col = columns[sym]
+            if restart:
+                self.values[:, :, col] = np.nan
+            self.values[:, np.searchsorted(self.dates, dates), col] = values.T
+            self.sources[sym] = sig
+            written += len(dates)
+        self.save()
+        return written
+
+
+# ---------------------------------------------------------------------------
+# Index computation
+# ---------------------------------------------------------------------------
+
+def _ffill(values):
+    """Forward-fill NaN down each column; NaN stays before a column's first value."""
+    valid = ~np.isnan(values)
+    idx = np.where(valid, np.arange(len(values))[:, None], 0)
+    np.maximum.accumulate(idx, axis=0, out=idx)
+    out = values[idx, np.arange(values.shape[1])]
+    out[~valid[idx, np.arange(values.shape[1])]] = np.nan
+    return out
+
+
+def _adjustment_matrix(dates, symbols, ltp):
+    """Cumulative corporate-action factors (dates x symbols), 1 where there are none."""
+    from .adjustments import AdjustmentEngine
+
+    engine = AdjustmentEngine()
+    factors = np.ones_like(ltp)
+    for j, sym in enumerate(symbols):
+        have = ~np.isnan(ltp[:, j])
+        try:
+            events = engine.factors(str(sym), history=(dates[have], ltp[have, j]))
+        except Exception as e:
+            logger.warning(f"Adjustment factors failed for {sym}: {e}")
+            continue
+        if events:
+            factors[:, j] = engine.cumulative_factors(dates, events)
+    engine.save()
+    return factors
+
+
+def compute(dates, symbols, ltp, qty, turnover, sectors, adjust=True, base=BASE_LEVEL, max_move=MAX_MOVE):
+    """
+    Sector and market aggregates from (dates x symbols) arrays.
+
+    A constituent counts from the session after its first price on; on
+    sessions it did not trade it holds its previous close, so rows already
+    written do not change when later data arrives. Each group's daily
+    return is the weighted mean of its constituents' returns on
+    corporate-action adjusted closes, chained into an index from `base`.
+    Returns beyond +-max_move are dropped as bad data. Breadth (advances /
+    declines / unchanged) counts constituents that traded.
+    Returns (groups, {column: (dates x groups) array}).
+    """
+    groups = sorted({sector for sector, _ in sectors.values()}) + [MARKET]
+    member = np.zeros((len(symbols), len(groups)))
+    weight = np.zeros(len(symbols))
+    for j, sym in enumerate(symbols):
+        if str(sym) in sectors:
+            sector, weight[j] = sectors[str(sym)]
+            member[j, groups.index(sector)] = 1.0
+            member[j, -1] = 1.0
+    weighted = member * weight[:, None]
+
+    price = ltp * _adjustment_matrix(dates, symbols, ltp) if adjust else ltp
+    traded = ~np.isnan(price)
+    close = _ffill(price)
+    prev = np.vstack([np.full((1, close.shape[1]), np.nan), close[:-1]])
+    listed = ~np.isnan(prev)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        ret = np.where(listed, close / prev - 1.0, 0.0)
+    bad = ~np.isfinite(ret) | (np.abs(ret) > max_move)
+    if bad.any():
+        logger.debug(f"Sector index: {int(bad.sum())} returns beyond +-{max_move:.0%} ignored")
+    ret[bad] = 0.0
+
+    live = (listed & traded & ~bad).astype(float)
+    with np.errstate(divide="ignore", invalid="ignore"):
+        group_ret = (ret @ weighted) / (listed.astype(float) @ weighted)
+    group_ret = np.nan_to_num(group_ret, nan=0.0)
+    return groups, {
+        "index": base * np.cumprod(1.0 + group_ret, axis=0),
+        "return": group_ret,
+        "constituents": listed.astype(float) @ member,
+        "traded": traded.astype(float) @ member,
+        "advances": (live * (ret > 0)) @ member,
+        "declines": (live * (ret < 0)) @ member,
+        "unchanged": (live * (ret == 0)) @ member,
+        "qty": np.nan_to_num(qty) @ member,
+        "turnover": np.nan_to_num(turnover) @ member,
+    }
+
+
+class IndexEngine:
+    """
+    Rebuilds sector and market aggregates (chained index, return, breadth,
+    volume, turnover) from every company's prices.csv and writes them to
+    data/sector_index.csv, one row per session and group.
+
+    All symbols are aligned on the trading calendar in one PriceMatrix, so
+    the aggregation is a handful of matrix products over the full history.
+    After a daily run only the appended price rows are parsed.
+    """
+
+    def __init__(self, sectors_path=SECTORS_PATH, output_path=OUTPUT_PATH, cache_path=CACHE_PATH):
+        self.sectors_path = Path(sectors_path)
+        self.output_path = Path(output_path)
+        self.matrix = PriceMatrix(cache_path).load()
+
+    def build(self, full=False, adjust=True):
+        """Update the price matrix and return (dates, groups, columns) over calendar sessions."""
+        from .trading_calendar import load_calendar
+
+        self.matrix.update(full=full)
+        sectors = load_sectors(self.sectors_path)
+        sessions = np.isin(self.matrix.dates, np.array(load_calendar().sessions, dtype="U10"))
+        m = self.matrix
+        dates = m.dates[sessions]
+        groups, columns = compute(dates, m.symbols, m.field("ltp")[sessions], m.field("qty")[sessions],
+                                  m.field("turnover")[sessions], sectors, adjust=adjust)
+        return dates, groups, columns
+
+    def write(self, dates, groups, columns):
+        """Write data/sector_index.csv atomically. Returns #rows."""
+        shown = (columns["constituents"] > 0) | (columns["traded"] > 0)
+        i, k = np.nonzero(shown)
+        out = {name: col[i, k] for name, col in columns.items()}
+        self.output_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.output_path.with_suffix(".csv.tmp")
+        with open(tmp, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(OUTPUT_FIELDS)
+            counts = [out[c].astype(np.int64) for c in ("constituents", "traded", "advances", "declines", "unchanged")]
+            for n in range(len(i)):
+                writer.writerow([dates[i[n]], groups[k[n]], f"{out['index'][n]:.4f}", f"{out['return'][n]:.6f}",
+                                 *(int(c[n]) for c in counts),
+                                 f"{out['qty'][n]:.0f}", f"{out['turnover'][n]:.2f}"])
+        os.replace(tmp, self.output_path)
+        return len(i)
+
+    def update(self, full=False, adjust=True):
+        """Bring data/sector_index.csv up to date. Returns #rows written."""
+        t0 = time.perf_counter()
+        dates, groups, columns = self.build(full=full, adjust=adjust)
+        n = self.write(dates, groups, columns)
+        logger.info(f"Sector index: {len(dates)} sessions x {len(groups)} groups "
+                    f"({len(self.matrix.symbols)} symbols) in {time.perf_counter() - t0:.2f}s")
+        return n
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Sector / market index from company price histories")
+    parser.add_argument("--rebuild", action="store_true", help="Re-read every prices.csv instead of appended rows")
+    parser.add_argument("--no-adjust", action="store_true", help="Use raw closes (no bonus / dividend / right adjustment)")
+    parser.add_argument("--show", default=None, metavar="SECTOR", help=f"Print one group afterwards (e.g. {MARKET})")
+    parser.add_argument("--last", type=int, default=10, help="Sessions printed by --show")
+    args = parser.parse_args()
+
+    engine = IndexEngine()
+    engine.update(full=args.rebuild, adjust=not args.no_adjust)
+    if args.show:
+        with open(engine.output_path, newline="") as f:
+            rows = [r for r in csv.DictReader(f) if r["sector"] == args.show]
+        for r in rows[-args.last:]:
+            print(f"{r['date']}  {float(r['index']):10.2f}  {float(r['return']) * 100:+6.2f}%  "
+                  f"adv {r['advances']:>3s}  dec {r['declines']:>3s}  turnover {float(r['turnover']):,.0f}")
@@ -0,0 +1,203 @@
+
+import time
+import logging
+import threading
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+from urllib.parse import urlparse
+
+import requests
+from requests.adapters import HTTPAdapter
+from bs4 import BeautifulSoup
+
+logger = logging.getLogger(__name__)
+
+SHARESANSAR_HOST = "www.sharesansar.com"
+MEROLAGANI_HOST = "merolagani.com"
+
+
+class BudgetedSession(requests.Session):
+    """
+    requests.Session with a per-host cap on in-flight requests.
+
+    Lets several scrapers run in parallel threads over one connection pool
+    while each site still sees at most budgets[host] concurrent requests
+    (hosts not listed fall back to default_budget).
+    """
+
+    def __init__(self, budgets=None, default_budget=2):
+        super().__init__()
+        self.budgets = dict(budgets or {})
+        self.default_budget = default_budget
+        self._semaphores = {}
+        self._lock = threading.Lock()
+
+        pool_size = max([default_budget, *self.budgets.values()])
+        adapter = HTTPAdapter(pool_connections=max(len(self.budgets), 1) + 1, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+
+    def _semaphore(self, host):
+        with self._lock:
+            if host not in self._semaphores:
+                self._semaphores[host] = threading.BoundedSemaphore(
+                    self.budgets.get(host, self.default_budget)
+                )
+            return self._semaphores[host]
+
+    def request(self, method, url, *args, **kwargs):
+        with self._semaphore(urlparse(url).hostname):
+            return super().request(method, url, *args, **kwargs)
+
+    def fork(self):
+        """
+        New session with its own cookies (a separate server-side session) that
+        shares this one's per-host budgets, connection pools, headers and hooks.
+        """
+        other = BudgetedSession(self.budgets, self.default_budget)
+        other._semaphores, other._lock = self._semaphores, self._lock
+        for prefix, adapter in self.adapters.items():
+            other.mount(prefix, adapter)
+        other.headers.update(self.headers)
+        other.hooks = {event: list(hooks) for event, hooks in self.hooks.items()}
+        if hasattr(self, "http_cache"):
+            other.http_cache = self.http_cache
+        return other
+
+
+class BootstrapCache:
+    """
+    Caches what a ShareSansar company page yields before any AJAX call:
+    the CSRF token (valid for the session's cookies) and the companyid.
+    Share one instance (with one session) between scrapers so each company
+    page is fetched once per run instead of once per dataset.
+    """
+
+    def __init__(self):
+        self._cache = {}
+        self._lock = threading.Lock()
+
+    def get(self, session, symbol, headers=None, base_url="https://www.sharesansar.com"):
+        """
+        Return (csrf_token, company_id) for symbol, loading the company page on
+        a miss. Either value is "" when missing from the page; returns
+        (None, None) if the page could not be loaded.
+        """
+        key = (id(session), symbol.upper())
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+
+        url = f"{base_url}/company/{symbol.lower()}"
+        try:
+            resp = session.get(url, headers=headers, timeout=30)
+        except requests.RequestException as e:
+            logger.error(f"[{symbol}] Failed to load company page: {e}")
+            return None, None
+        if resp.status_code != 200:
+            logger.warning(f"[{symbol}] Company page returned {resp.status_code}")
+            return None, None
+
+        soup = BeautifulSoup(resp.text, "html.parser")
+        csrf_meta = soup.find("meta", {"name": "_token"})
+        cid_div = soup.find("div", {"id": "companyid"})
+        value = (
+            csrf_meta.get("content", "") if csrf_meta else "",
+            cid_div.text.strip() if cid_div else "",
+        )
+        with self._lock:
+            self._cache[key] = value
+        return value
+
+    def invalidate(self, session, symbol, base_url="https://www.sharesansar.com"):
+        with self._lock:
+            self._cache.pop((id(session), symbol.upper()), None)
+        # Also drop a stored copy of the page so the next get() loads it live
+        http_cache = getattr(session, "http_cache", None)
+        if http_cache:
+            http_cache.evict(f"{base_url}/company/{symbol.lower()}")
+
+
+class LatencyTracker:
+    """
+    Rolling window of successful response times for one endpoint. Until
+    min_samples are in, quantile() returns `default`; it never goes below
+    `floor`, so a run of instant answers does not make every request hedge.
+    """
+
+    def __init__(self, window=200, default=8.0, floor=1.0, min_samples=20):
+        self.samples = deque(maxlen=window)
+        self.default = default
+        self.floor = floor
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds):
+        with self._lock:
+            self.samples.append(seconds)
+
+    def quantile(self, q):
+        with self._lock:
+            if len(self.samples) < self.min_samples:
+                return self.default
+            ordered = sorted(self.samples)
+        return max(ordered[min(int(q * len(ordered)), len(ordered) - 1)], self.floor)
+
+
+_HEDGE_POOL = None
+_HEDGE_POOL_LOCK = threading.Lock()
+
+
+def _hedge_pool():
+    global _HEDGE_POOL
+    with _HEDGE_POOL_LOCK:
+        if _HEDGE_POOL is None:
+            _HEDGE_POOL = ThreadPoolExecutor(max_workers=8, thread_name_prefix="hedge")
+        return _HEDGE_POOL
+
+
+def hedged_request(session, method, url, tracker, quantile=0.95, **kwargs):
+    """
+    session.request(method, url, **kwargs) with one hedge: if nothing has
+    arrived after the tracker's `quantile` latency, or the first attempt
+    timed out or could not connect, an identical request is sent and the
+    first 200 of the two wins. Any HTTP answer to the first attempt is
+    returned as is — a 202 throttle is left to the caller's backoff rather
+    than doubled. The slower request is left to finish in the background.
+    Returns a response (the last non-200 if neither succeeded); raises the
+    last requests exception if both failed outright.
+    """
+    def send():
+        start = time.monotonic()
+        resp = session.request(method, url, **kwargs)
+        if resp.status_code == 200:
+            tracker.record(time.monotonic() - start)
+        return resp
+
+    pool = _hedge_pool()
+    futures = [pool.submit(send)]
+    timeout = tracker.quantile(quantile)
+    done, _ = wait(futures, timeout=timeout, return_when=FIRST_COMPLETED)
+    if done:
+        error = futures[0].exception()
+        if not isinstance(error, (requests.Timeout, requests.ConnectionError)):
+            return futures[0].result()  # raises any other error
+        reason = f"first attempt failed: {type(error).__name__}"
+    else:
+        reason = f"no answer after {timeout:.1f}s"
+    logger.info(f"Hedging {method} {urlparse(url).path} ({reason})")
+    futures.append(pool.submit(send))
+
+    last, error = None, None
+    for fut in as_completed(futures):
+        try:
+            resp = fut.result()
+        except requests.RequestException as e:
+            error = e
+            continue
+        if resp.status_code == 200:
+            return resp
+        last = resp
+    if last is not None:
+        return last
+    raise error
@@ -0,0 +1,269 @@
+
+import os
+import csv
+import json
+import shutil
+import hashlib
+import logging
+import argparse
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+SHARDS_DIR = DATA_DIR / ".shards"
+
+PRICE_FIELDS = ["date", "open", "high", "low", "ltp", "percent_change", "qty", "turnover"]
+# Per-symbol tables a run rewrites in full: the shard's copy replaces data/'s
+SNAPSHOT_FILES = ("dividend.csv", "right-share.csv")
+
+
+def parse_shard(text):
+    """'2/4' -> (2, 4). Shards are numbered 0 .. N-1."""
+    index, sep, count = str(text).partition("/")
+    if not sep or not index.isdigit() or not count.isdigit() or not 0 <= int(index) < int(count):
+        raise ValueError(f"Invalid shard '{text}' (expected i/N with 0 <= i < N)")
+    return int(index), int(count)
+
+
+def shard_of(symbol, count):
+    """Shard of a symbol. sha1, not hash(): str hashes change between processes."""
+    digest = hashlib.sha1(symbol.strip().upper().encode()).digest()
+    return int.from_bytes(digest[:8], "big") % count
+
+
+class Shard:
+    """
+    One of N runners. Each shard scrapes the symbols hashing to it and writes
+    only under data/.shards/{i}-of-{N}/:
+
+        company-wise/{SYMBOL}/prices.csv        new price rows only
+        company-wise/{SYMBOL}/dividend.csv      full table
+        company-wise/{SYMBOL}/right-share.csv   full table
+        work_queue.json                         this shard's queue state
+        manifest.json                           index, count, symbols
+
+    Existing data/ is only read (watermarks, queue state), so shards can run
+    on separate machines from the same checkout and be merged afterwards.
+    """
+
+    def __init__(self, index, count, root=SHARDS_DIR):
+        self.index = index
+        self.count = count
+        self.dir = Path(root) / f"{index}-of-{count}"
+        self.company_dir = self.dir / "company-wise"
+        self.state_path = self.dir / "work_queue.json"
+
+    @classmethod
+    def parse(cls, text, root=SHARDS_DIR):
+        return cls(*parse_shard(text), root=root)
+
+    def __str__(self):
+        return f"{self.index}/{self.count}"
+
+    def select(self, symbols):
+        return sorted(s for s in symbols if shard_of(s, self.count) == self.index)
+
+    def queue(self, name, deadline=None):
+        from .workqueue import WorkQueue
+        return WorkQueue(name, deadline, state_path=self.state_path)
+
+    def prepare(self, symbols):
+        """Create the shard directory and record its symbols. Returns them."""
+        from .workqueue import STATE_PATH
+
+        mine = self.select(symbols)
+        self.company_dir.mkdir(parents=True, exist_ok=True)
+        if not self.state_path.exists() and STATE_PATH.exists():
+            # Start from the shared queue state so leftovers keep their priority
+            shutil.copyfile(STATE_PATH, self.state_path)
+        manifest = self.manifest()
+        manifest.update({
+            "index": self.index,
+            "count": self.count,
+            "symbols": sorted(set(manifest.get("symbols", [])) | set(mine)),
+            "updated": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        })
+        _write_json(self.dir / "manifest.json", manifest)
+        logger.info(f"Shard {self}: {len(mine)} of {len(symbols)} symbols -> {self.dir}")
+        return mine
+
+    def manifest(self):
+        return _read_json(self.dir / "manifest.json")
+
+
+# ---------------------------------------------------------------------------
+# Merge
+# ---------------------------------------------------------------------------
+
+def _read_json(path):
+    try:
+        with open(path) as f:
+            return json.load(f)
+    except (FileNotFoundError, ValueError):
+        return {}
+
+
+def _write_json(path, data):
+    tmp = path.with_suffix(".json.tmp")
+    with open(tmp, "w") as f:
+        json.dump(data, f, indent=1)
+    os.replace(tmp, path)
+
+
+def find_shards(root=SHARDS_DIR):
+    """Shard directories under root (with a manifest), ordered by index."""
+    shards = []
+    for path in Path(root).glob("*-of-*"):
+        index, _, count = path.name.partition("-of-")
+        shard = Shard(int(index), int(count), root=root)
+        if shard.manifest():
+            shards.append(shard)
+    return sorted(shards, key=lambda s: (s.count, s.index))
+
+
+def check_shards(shards):
+    """Raise ValueError unless the shards come from one split (same N, disjoint symbols)."""
+    counts = {s.count for s in shards}
+    if len(counts) > 1:
+        raise ValueError(f"Shards from different splits ({sorted(counts)}); merge or remove one set first")
+    owner = {}
+    for shard in shards:
+        for sym in shard.manifest()["symbols"]:
+            if sym in owner:
+                raise ValueError(f"{sym} is in shard {owner[sym]} and shard {shard}")
+            owner[sym] = str(shard)
+    return owner
+
+
+def _read_rows(path):
+    with open(path, newline="", encoding="utf-8") as f:
+        return list(csv.DictReader(f))
+
+
+def merge_prices(src, dest):
+    """Append the rows of src whose date dest lacks, oldest first. Returns #rows added."""
+    have = {r["date"] for r in _read_rows(dest)} if dest.exists() else set()
+    new = {}
+    for row in _read_rows(src):
+        if row.get("date") and row["date"] not in have:
+            new[row["date"]] = row  # last written wins, as in load_price_history
+    if not new:
+        return 0
+    dest.parent.mkdir(parents=True, exist_ok=True)
+    file_exists = dest.exists() and dest.stat().st_size > 0
+    with open(dest, "a", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=PRICE_FIELDS, extrasaction="ignore", lineterminator="\n")
+        if not file_exists:
+            writer.writeheader()
+        writer.writerows(new[d] for d in sorted(new))
+    return len(new)
+
+
+def merge_queue_state(states, owner, state_path):
+    """
+    Fold shard work-queue states into data/work_queue.json: the newest
+    done time per symbol, and each shard's leftovers replacing the old
+    leftovers of the symbols it owns.
+    """
+    shared = _read_json(state_path)
+    for shard, state in states:
+        ours = {sym for sym, name in owner.items() if name == shard}
+        for name, entry in state.items():
+            target = shared.setdefault(name, {"done": {}, "leftover": []})
+            for sym, ts in entry.get("done", {}).items():
+                if ts > target["done"].get(sym, ""):
+                    target["done"][sym] = ts
+            target["leftover"] = [s for s in target["leftover"] if s not in ours] + \
+                                 [s for s in entry.get("leftover", []) if s in ours]
+    for entry in shared.values():
+        entry["done"] = dict(sorted(entry["done"].items()))
+    _write_json(Path(state_path), dict(sorted(shared.items())))
+
+
+def merge(root=SHARDS_DIR, company_dir=COMPANY_WISE, state_path=None, clean=False):
+    """
+    Combine every shard under root into data/. Shards own disjoint symbol
+    sets, so each output file comes from exactly one shard; price rows are
+    appended by date and snapshot tables replaced, which makes the merge
+    idempotent and independent of shard order.
+    Returns a summary dict.
+    """
+    from .workqueue import STATE_PATH
+
+    shards = find_shards(root)
+    if not shards:
+        logger.info("No shards to merge")
+        return {"shards": 0}
+    owner = check_shards(shards)
+    count = shards[0].count
+    missing = sorted(set(range(count)) - {s.index for s in shards})
+    if missing:
+        logger.warning(f"Shards {missing} of {count} have not produced output yet")
+
+    company_dir = Path(company_dir)
+    report = {"shards": len(shards), "symbols": 0, "price_rows": 0, "tables": 0}
+    updated = []
+    states = []
+    for shard in shards:
+        for sym_dir in sorted(p for p in shard.company_dir.glob("*") if p.is_dir()):
+            dest = company_dir / sym_dir.name
+            report["symbols"] += 1
+            if (sym_dir / "prices.csv").exists():
+                n = merge_prices(sym_dir / "prices.csv", dest / "prices.csv")
+                report["price_rows"] += n
+                if n:
+                    updated.append(sym_dir.name)
+            for name in SNAPSHOT_FILES:
+                if (sym_dir / name).exists():
+                    dest.mkdir(parents=True, exist_ok=True)
+                    shutil.copyfile(sym_dir / name, dest / f"{name}.tmp")
+                    os.replace(dest / f"{name}.tmp", dest / name)
+                    report["tables"] += 1
+        states.append((str(shard), _read_json(shard.state_path)))
+        logger.info(f"Merged shard {shard}")
+
+    merge_queue_state(states, owner, state_path or STATE_PATH)
+
+    if updated and company_dir == COMPANY_WISE:  # the indicator cache lives in data/ only
+        try:
+            from .indicators import IndicatorEngine
+        except ImportError:  # numpy not installed — indicator cache is optional
+            pass
+        else:
+            engine = IndicatorEngine()
+            for sym in updated:
+                try:
+                    engine.update_symbol(sym)
+                except Exception as e:
+                    logger.warning(f"Could not update indicators for {sym}: {e}")
+
+    if clean:
+        for shard in shards:
+            shutil.rmtree(shard.dir)
+    return report
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Merge sharded scraper output into data/")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_merge = sub.add_parser("merge", help="Merge data/.shards/* into data/")
+    p_merge.add_argument("--root", default=str(SHARDS_DIR), help="Directory holding the shard outputs")
+    p_merge.add_argument("--clean", action="store_true", help="Delete the shard directories afterwards")
+    p_which = sub.add_parser("which", help="Print the shard of each symbol")
+    p_which.add_argument("count", type=int)
+    p_which.add_argument("symbols", nargs="+")
+    args = parser.parse_args()
+
+    if args.cmd == "merge":
+        from .changefeed import ChangeFeed
+        feed = ChangeFeed().begin(["prices", "dividends", "right_shares"])
+        print(merge(args.root, clean=args.clean))
+        feed.scan("shard_merge", ["prices", "dividends", "right_shares"])
+    else:
+        for sym in args.symbols:
+            print(f"{sym}\t{shard_of(sym, args.count)}/{args.count}")
@@ -0,0 +1,83 @@
+
+import logging
+from datetime import datetime, date as dt_date, timedelta
+
+import requests
+
+from .trading_calendar import NPT
+
+logger = logging.getLogger(__name__)
+
+MEROLAGANI_CHART_URL = "https://merolagani.com/handlers/TechnicalChartHandler.ashx"
+HISTORY_START = "2000-01-01"
+
+
+def normalize_chart(data, stop_date=None):
+    """
+    TradingView-style bars ({"s": "ok", "t": [...], "o", "h", "l", "c", "v"})
+    -> prices.csv records, newest first, dates after stop_date only.
+    percent_change is computed from the previous bar's close (the first bar
+    has none and is dropped); turnover is not in the feed and is left empty.
+    """
+    if not isinstance(data, dict) or data.get("s") != "ok":
+        return []
+    bars = sorted(zip(data.get("t", []), data.get("o", []), data.get("h", []),
+                      data.get("l", []), data.get("c", []), data.get("v", [])))
+    records = []
+    prev_close = None
+    for ts, o, h, l, c, v in bars:
+        day = str(datetime.fromtimestamp(int(ts), NPT).date())
+        if prev_close and (stop_date is None or day > stop_date):
+            records.append({
+                "date": day,
+                "open": float(o),
+                "high": float(h),
+                "low": float(l),
+                "ltp": float(c),
+                "percent_change": round((float(c) - prev_close) / prev_close * 100, 2),
+                "qty": int(float(v)),
+                "turnover": "",
+            })
+        prev_close = float(c)
+    return records[::-1]
+
+
+class MerolaganiHistorySource:
+    """
+    Secondary price-history source: the daily bars behind merolagani.com's
+    charts (unadjusted, like ShareSansar's history). Used when ShareSansar
+    keeps failing for a symbol; see ShareSansarHistoryScraper.
+    """
+
+    name = "merolagani"
+
+    def __init__(self, session=None):
+        self.session = session or requests.Session()
+        self.headers = {
+            'User-Agent': 'Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36',
+            'Accept': 'application/json, text/javascript, */*; q=0.01',
+            'X-Requested-With': 'XMLHttpRequest',
+            'Referer': 'https://merolagani.com/',
+        }
+
+    def fetch(self, symbol, stop_date=None):
+        """Records newer than stop_date (all history when None), newest first."""
+        # Start a couple of weeks early so the first wanted bar has a previous close
+        start = dt_date.fromisoformat(stop_date) - timedelta(days=15) if stop_date else dt_date.fromisoformat(HISTORY_START)
+        end = datetime.now(NPT) + timedelta(days=1)
+        params = {
+            "type": "get_advanced_chart",
+            "symbol": symbol.upper(),
+            "resolution": "1D",
+            "rangeStartDate": int(datetime(start.year, start.month, start.day, tzinfo=NPT).timestamp()),
+            "rangeEndDate": int(end.timestamp()),
+            "isAdjust": 0,
+            "currencyCode": "NPR",
+        }
+        resp = self.session.get(MEROLAGANI_CHART_URL, params=params, headers=self.headers, timeout=30)
+        if resp.status_code != 200:
+            logger.warning(f"[{symbol}] {self.name} returned {resp.status_code}")
+            return []
+        records = normalize_chart(resp.json(), stop_date)
+        logger.info(f"[{symbol}] {len(records)} records from {self.name}")
+        return records
@@ -0,0 +1,254 @@
+
+import io
+import os
+import csv
+import gzip
+import logging
+import argparse
+from collections import defaultdict
+from datetime import date as dt_date, timedelta
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+FLOORSHEET_DIR = DATA_DIR / "floorsheet"
+
+FLOORSHEET_FIELDS = ["date", "sn", "contract_no", "stock_symbol", "buyer", "seller", "quantity", "rate", "amount"]
+
+
+# ---------------------------------------------------------------------------
+# Reading (any layout)
+# ---------------------------------------------------------------------------
+
+def open_text(path):
+    """Open a CSV for reading whether it is plain or gzip-compressed."""
+    if str(path).endswith(".gz"):
+        return gzip.open(path, "rt", encoding="utf-8", newline="")
+    return open(path, newline="", encoding="utf-8")
+
+
+def read_csv(path):
+    with open_text(path) as f:
+        return list(csv.DictReader(f))
+
+
+def read_table(path, fields):
+    """A CSV (plain or .gz) as a 2-D str array with the columns in `fields` order."""
+    import numpy as np  # only the vectorized readers (quality, broker flow) need it
+
+    with open_text(path) as f:
+        text = f.read()
+    header, _, body = text.partition("\n")
+    lines = body.count("\n") + (not body.endswith("\n") and body != "")
+    # Fast path: no quoting, every line has the expected number of fields
+    if header.strip().split(",") == fields and '"' not in body and "\r" not in body \
+            and body.count(",") == (len(fields) - 1) * lines:
+        flat = body.replace("\n", ",").split(",")[:len(fields) * lines]
+        return np.array(flat, dtype=str).reshape(lines, len(fields))
+
+    with open_text(path) as f:
+        reader = csv.reader(f)
+        header = next(reader, None) or []
+        rows = [r for r in reader if r]
+    if header == fields and all(len(r) == len(fields) for r in rows):
+        return np.array(rows, dtype=str).reshape(len(rows), len(fields))
+    idx = [header.index(k) if k in header else None for k in fields]
+    rows = [[r[i] if i is not None and i < len(r) else "" for i in idx] for r in rows]
+    return np.array(rows, dtype=str).reshape(len(rows), len(fields))
+
+
+def file_key(path):
+    """floorsheet_2026-03-03.csv[.gz] -> '2026-03-03'; floorsheet_2026-03.csv.gz -> '2026-03'."""
+    name = Path(path).name
+    return name[len("floorsheet_"):].split(".", 1)[0]
+
+
+def floorsheet_files():
+    """
+    Every physical floorsheet file, oldest first: monthly roll-ups
+    (floorsheet_YYYY-MM.csv.gz), compressed days (floorsheet_YYYY-MM-DD.csv.gz)
+    and plain days (floorsheet_YYYY-MM-DD.csv).
+    """
+    paths = list(FLOORSHEET_DIR.glob("floorsheet_*.csv")) + list(FLOORSHEET_DIR.glob("floorsheet_*.csv.gz"))
+    # For one key, plain sorts after .gz so it is read last (and wins)
+    return sorted(paths, key=lambda p: (file_key(p), not p.name.endswith(".csv")))
+
+
+def iter_floorsheet_days():
+    """
+    Yield (day, rows, path) for every floorsheet day, whatever the layout.
+    A day stored more than once (plain + compressed, or day file + roll-up)
+    is yielded once, from the plain day file if there is one.
+    """
+    files = floorsheet_files()
+    day_files = {}
+    for p in files:
+        if len(file_key(p)) == 10:
+            day_files[file_key(p)] = p  # plain overrides .gz (sorted last)
+
+    for path in files:
+        key = file_key(path)
+        if len(key) == 10:
+            if day_files[key] == path:
+                yield key, read_csv(path), path
+            continue
+        by_day = defaultdict(list)
+        for row in read_csv(path):
+            by_day[row.get("date", "")].append(row)
+        for day in sorted(by_day):
+            if day not in day_files:
+                yield day, by_day[day], path
+
+
+def floorsheet_days():
+    return sorted(day for day, _, _ in iter_floorsheet_days())
+
+
+def floorsheet_path(day):
+    """Physical file currently holding a day's floorsheet (None if absent)."""
+    for name in (f"floorsheet_{day}.csv", f"floorsheet_{day}.csv.gz", f"floorsheet_{day[:7]}.csv.gz"):
+        path = FLOORSHEET_DIR / name
+        if path.exists():
+            return path
+    return None
+
+
+def read_floorsheet(day):
+    """One day's floorsheet rows (list of dicts, as written by the scraper)."""
+    path = floorsheet_path(day)
+    if path is None:
+        return []
+    rows = read_csv(path)
+    if len(file_key(path)) == 7:
+        rows = [r for r in rows if r.get("date") == day]
+    return rows
+
+
+# ---------------------------------------------------------------------------
+# Compaction
+# ---------------------------------------------------------------------------
+
+def _write_gz(path, fields, rows):
+    tmp = path.with_name(path.name + ".tmp")
+    # mtime=0 keeps identical content byte-identical, so git sees no change
+    with open(tmp, "wb") as raw, gzip.GzipFile(fileobj=raw, mode="wb", compresslevel=9, mtime=0) as gz:
+        with io.TextIOWrapper(gz, encoding="utf-8", newline="") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore", lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def compress_days(keep_plain=5):
+    """gzip every plain day file except the newest keep_plain. Returns #files compressed."""
+    plain = sorted(FLOORSHEET_DIR.glob("floorsheet_*.csv"), key=file_key)
+    plain = [p for p in plain if len(file_key(p)) == 10]
+    done = 0
+    for path in plain[:max(len(plain) - keep_plain, 0)]:
+        _write_gz(path.with_name(path.name + ".gz"), FLOORSHEET_FIELDS, read_csv(path))
+        path.unlink()
+        done += 1
+    return done
+
+
+def rollup_months(min_age_days=35, today=None):
+    """
+    Merge every day of a month into floorsheet_YYYY-MM.csv.gz once the month
+    ended more than min_age_days ago. Day files override rows already in the
+    roll-up for the same day. Returns the months rolled up.
+    """
+    today = today or dt_date.today()
+    cutoff = str(today - timedelta(days=min_age_days))
+    months = defaultdict(list)
+    for path in floorsheet_files():
+        key = file_key(path)
+        if len(key) == 10:
+            months[key[:7]].append(path)
+
+    rolled = []
+    for month, paths in sorted(months.items()):
+        next_month = (dt_date.fromisoformat(f"{month}-01") + timedelta(days=32)).replace(day=1)
+        if str(next_month - timedelta(days=1)) > cutoff:
+            continue
+        target = FLOORSHEET_DIR / f"floorsheet_{month}.csv.gz"
+        days = defaultdict(list)
+        if target.exists():
+            for row in read_csv(target):
+                days[row.get("date", "")].append(row)
+        for path in paths:  # .gz before plain, so the plain copy wins
+            days[file_key(path)] = read_csv(path)
+        _write_gz(target, FLOORSHEET_FIELDS, [r for d in sorted(days) for r in days[d]])
+        for path in paths:
+            path.unlink()
+        rolled.append(month)
+        logger.info(f"Rolled up {len(paths)} day files into {target.name}")
+    return rolled
+
+
+def sort_prices(symbols=None):
+    """
+    Rewrite prices.csv files oldest-first with one row per date (the last
+    written wins, as in load_price_history). Daily appends then only add
+    lines at the end, which git stores as small deltas. Returns #files changed.
+    """
+    changed = 0
+    dirs = [COMPANY_WISE / s for s in symbols] if symbols else sorted(COMPANY_WISE.iterdir())
+    for sym_dir in dirs:
+        path = sym_dir / "prices.csv"
+        if not path.exists():
+            continue
+        with open(path, newline="", encoding="utf-8") as f:
+            reader = csv.DictReader(f)
+            fields, rows = reader.fieldnames, list(reader)
+        by_date = {r["date"]: r for r in rows}
+        ordered = [by_date[d] for d in sorted(by_date)]
+        if ordered == rows:
+            continue
+        tmp = path.with_suffix(".csv.tmp")
+        with open(tmp, "w", newline="", encoding="utf-8") as f:
+            writer = csv.DictWriter(f, fieldnames=fields, lineterminator="\n")
+            writer.writeheader()
+            writer.writerows(ordered)
+        os.replace(tmp, path)
+        changed += 1
+    return changed
+
+
+def compact(keep_plain=5, rollup_after_days=35, prices=True):
+    """Apply the compact layout to data/. Returns a summary dict."""
+    report = {
+        "rolled_up_months": rollup_months(rollup_after_days),
+        "compressed_days": compress_days(keep_plain),
+    }
+    if prices:
+        report["sorted_price_files"] = sort_prices()
+    return report
+
+
+def stats():
+    files = [p for p in FLOORSHEET_DIR.iterdir() if p.name.startswith("floorsheet_")]
+    return {
+        "floorsheet_files": len(files),
+        "floorsheet_bytes": sum(p.stat().st_size for p in files),
+        "floorsheet_days": len(floorsheet_days()),
+    }
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="Compact storage layout for data/")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p_compact = sub.add_parser("compact", help="Compress / roll up floorsheets and sort prices.csv files")
+    p_compact.add_argument("--keep-plain", type=int, default=5, help="Newest day files left uncompressed")
+    p_compact.add_argument("--rollup-after", type=int, default=35,
+                           help="Roll a month up once it ended this many days ago")
+    p_compact.add_argument("--no-prices", action="store_true", help="Leave prices.csv files untouched")
+    sub.add_parser("stats", help="Show floorsheet storage size")
+    args = parser.parse_args()
+
+    if args.cmd == "compact":
+        print(compact(args.keep_plain, args.rollup_after, prices=not args.no_prices))
+    print(stats())
@@ -0,0 +1,235 @@
+
+import os
+import json
+import hashlib
+import logging
+import argparse
+from collections import Counter
+from datetime import date as dt_date, datetime, timedelta, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+HOLIDAYS_PATH = DATA_DIR / "holidays.json"
+CACHE_PATH = DATA_DIR / ".cache" / "trading_calendar.json"
+
+NPT = timezone(timedelta(hours=5, minutes=45))
+MARKET_CLOSE_HOUR = 15  # NEPSE closes at 3 PM Nepal time
+
+# Bytes before the scanned end of a prices.csv that must be unchanged for an append
+FINGERPRINT_BYTES = 256
+
+
+class TradingCalendar:
+    """
+    NEPSE trading calendar derived from the data itself.
+
+    Past sessions are the dates present in enough prices.csv files
+    (min_symbols). Future sessions are projected from the weekdays the market
+    traded on over the last year (Sunday–Thursday today) minus the dates in
+    data/holidays.json, a JSON list of "YYYY-MM-DD" strings (or a
+    {"YYYY-MM-DD": "name"} object).
+
+    Per-date counts and per-file (size, mtime, first/last date, fingerprint)
+    are cached in data/.cache/trading_calendar.json. refresh() only reads the
+    bytes appended to each prices.csv since the last scan. A file that shrank,
+    or whose header or bytes before the scanned end changed (rewritten, e.g.
+    sorted or reparsed), triggers a full rescan.
+    """
+
+    def __init__(self, cache_path=CACHE_PATH, holidays_path=HOLIDAYS_PATH, min_symbols=3):
+        self.cache_path = Path(cache_path)
+        self.holidays_path = Path(holidays_path)
+        self.min_symbols = min_symbols
+        self.counts = Counter()
+        self.files = {}
+        self._sessions = None
+        self._load()
+
+    # ------------------------------------------------------------------
+    # Cache
+    # ------------------------------------------------------------------
+
+    def _load(self):
+        try:
+            with open(self.cache_path) as f:
+                cache = json.load(f)
+            self.counts = Counter(cache["counts"])
+            self.files = cache["files"]
+        except (FileNotFoundError, ValueError, KeyError):
+            self.counts, self.files = Counter(), {}
+
+    def _save(self):
+        self.cache_path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = self.cache_path.with_suffix(".json.tmp")
+        with open(tmp, "w") as f:
+            json.dump({"counts": dict(sorted(self.counts.items())), "files": self.files}, f,
+                      separators=(",", ":"))
+        os.replace(tmp, self.cache_path)
+
+    @staticmethod
+    def _fingerprint(path, size):
+        """Hash of the header line and the FINGERPRINT_BYTES before offset size."""
+        with open(path, "rb") as f:
+            header = f.readline()
+            f.seek(max(0, size - FINGERPRINT_BYTES))
+            tail = f.read(size - max(0, size - FINGERPRINT_BYTES))
+        return hashlib.sha1(header + b"\0" + tail).hexdigest()
+
+    @staticmethod
+    def _read_dates(path, offset=0):
+        """Dates in prices.csv from byte offset on (header skipped at offset 0)."""
+        with open(path, "rb") as f:
+            f.seek(offset)
+            chunk = f.read().decode("utf-8", errors="replace")
+        lines = chunk.splitlines()
+        if offset == 0 and lines:
+            lines = lines[1:]
+        return [line.split(",", 1)[0] for line in lines if line[:4].isdigit()]
+
+    def refresh(self):
+        """Scan new / appended prices.csv data. Returns the number of new date rows seen."""
+        seen_symbols = set()
+        added = 0
+        rebuild = False
+
+        for path in COMPANY_WISE.glob("*/prices.csv"):
+            sym = path.parent.name
+            seen_symbols.add(sym)
+            st = path.stat()
+            prev = self.files.get(sym)
+            if prev and prev["size"] == st.st_size and prev["mtime_ns"] == st.st_mtime_ns:
+                continue
+            if prev and (st.st_size <= prev["size"] or
+                         self._fingerprint(path, prev["size"]) != prev.get("fingerprint")):
+                rebuild = True  # rewritten or truncated: its old dates can't be subtracted
+                break
+
+            dates = self._read_dates(path, prev["size"] if prev else 0)
+            self.counts.update(set(dates) - ({prev["last"]} if prev and prev.get("last") else set()))
+            all_dates = dates + ([prev["first"], prev["last"]] if prev and prev.get("first") else [])
+            self.files[sym] = {
+                "size": st.st_size,
+                "mtime_ns": st.st_mtime_ns,
+                "first": min(all_dates) if all_dates else None,
+                "last": max(all_dates) if all_dates else None,
+                "fingerprint": self._fingerprint(path, st.st_size),
+            }
+            added += len(dates)
+
+        if rebuild or set(self.files) - seen_symbols:
+            logger.info("Trading calendar: price files rewritten or removed — full rescan")
+            self.counts, self.files = Counter(), {}
+            return self.refresh()
+
+        if added:
+            self._sessions = None
+            self._save()
+        return added
+
+    # ------------------------------------------------------------------
+    # Calendar
+    # ------------------------------------------------------------------
+
+    @property
+    def sessions(self):
+        """Sorted list of past trading dates."""
+        if self._sessions is None:
+            self._sessions = sorted(d for d, n in self.counts.items() if n >= self.min_symbols)
+        return self._sessions
+
+    @property
+    def holidays(self):
+        try:
+            with open(self.holidays_path) as f:
+                data = json.load(f)
+        except (FileNotFoundError, ValueError):
+            return set()
+        return set(data)
+
+    @property
+    def trading_weekdays(self):
+        """Weekdays (Mon=0 .. Sun=6) with sessions in the last year of history."""
+        if not self.sessions:
+            return {6, 0, 1, 2, 3}
+        cutoff = str(dt_date.fromisoformat(self.sessions[-1]) - timedelta(days=365))
+        recent = Counter(dt_date.fromisoformat(d).weekday() for d in self.sessions if d > cutoff)
+        # A weekday counts if it traded at least a fifth of the weeks
+        return {wd for wd, n in recent.items() if n >= 10}
+
+    def is_trading_day(self, day):
+        day = str(day)
+        if self.sessions and day <= self.sessions[-1]:
+            return day in set(self.sessions)
+        d = dt_date.fromisoformat(day)
+        return d.weekday() in self.trading_weekdays and day not in self.holidays
+
+    def sessions_between(self, start, end):
+        """Trading dates in (start, end]: known sessions, then projected ones."""
+        start, end = str(start), str(end)
+        out = [d for d in self.sessions if start < d <= end]
+        last = self.sessions[-1] if self.sessions else start
+        d = dt_date.fromisoformat(max(last, start)) + timedelta(days=1)
+        while str(d) <= end:
+            if self.is_trading_day(d):
+                out.append(str(d))
+            d += timedelta(days=1)
+        return out
+
+    def latest_expected_session(self, now=None):
+        """Most recent session whose data should exist: today once the market
+        has closed on a trading day, otherwise the previous trading day."""
+        now = (now or datetime.now(timezone.utc)).astimezone(NPT)
+        day = now.date()
+        if not (self.is_trading_day(day) and now.hour >= MARKET_CLOSE_HOUR):
+            day -= timedelta(days=1)
+            while not self.is_trading_day(day):
+                day -= timedelta(days=1)
+        return str(day)
+
+    def market_closed_today(self, now=None):
+        now = (now or datetime.now(timezone.utc)).astimezone(NPT)
+        return not self.is_trading_day(now.date())
+
+    # ------------------------------------------------------------------
+    # Per-symbol
+    # ------------------------------------------------------------------
+
+    def last_date(self, symbol):
+        info = self.files.get(symbol)
+        return info["last"] if info else None
+
+    def pending_sessions(self, symbol, now=None):
+        """Sessions after the symbol's newest row up to the latest expected session.
+        Empty means the symbol is complete (illiquid symbols may simply not have traded)."""
+        last = self.last_date(symbol)
+        if last is None:
+            return None  # no history at all: full scrape
+        return self.sessions_between(last, self.latest_expected_session(now))
+
+    def is_complete(self, symbol, now=None):
+        return self.pending_sessions(symbol, now) == []
+
+
+def load_calendar():
+    """TradingCalendar refreshed against the current data directory."""
+    cal = TradingCalendar()
+    cal.refresh()
+    return cal
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+
+    parser = argparse.ArgumentParser(description="NEPSE trading calendar derived from prices.csv")
+    parser.add_argument("--symbol", help="Show pending sessions for a symbol")
+    args = parser.parse_args()
+
+    cal = load_calendar()
+    print(f"Known sessions: {len(cal.sessions)}  ({cal.sessions[0]} .. {cal.sessions[-1]})")
+    print(f"Trading weekdays: {sorted(cal.trading_weekdays)}  holidays on file: {len(cal.holidays)}")
+    print(f"Market closed today: {cal.market_closed_today()}  latest expected session: {cal.latest_expected_session()}")
+    if args.symbol:
+        print(f"{args.symbol}: last {cal.last_date(args.symbol)}, pending {cal.pending_sessions(args.symbol)}")
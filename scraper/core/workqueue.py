@@ -0,0 +1,182 @@
+
+import os
+import csv
+import json
+import time
+import logging
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+DATA_DIR = Path(__file__).resolve().parent.parent.parent / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+# Committed with the data so the next scheduled run picks up the leftovers
+STATE_PATH = DATA_DIR / "work_queue.json"
+
+_STATE_LOCK = threading.Lock()
+
+
+class Deadline:
+    """Global wall-clock budget shared by every queue of a run (None = unlimited)."""
+
+    def __init__(self, seconds=None):
+        self.seconds = seconds
+        self.start = time.monotonic()
+
+    def remaining(self):
+        if self.seconds is None:
+            return float("inf")
+        return self.seconds - (time.monotonic() - self.start)
+
+    def expired(self):
+        return self.remaining() <= 0
+
+
+def _edge_rows(path, n, block=8192):
+    """
+    The first and last n rows of a CSV as dicts (overlapping on short files),
+    read without going through the rest of the file.
+    """
+    with open(path, "rb") as f:
+        header = f.readline()
+        head = [line for line in (f.readline() for _ in range(n)) if line]
+        data_start = len(header)
+        pos = f.seek(0, os.SEEK_END)
+        tail = b""
+        while pos > data_start and tail.count(b"\n") <= n:
+            step = min(block, pos - data_start)
+            pos -= step
+            f.seek(pos)
+            tail = f.read(step) + tail
+    lines = head + tail.splitlines()[-n:] if n else []
+    return list(csv.DictReader([l.decode("utf-8", errors="replace") for l in [header] + lines]))
+
+
+def liquidity(symbols, window=20):
+    """
+    Mean turnover over each symbol's last `window` sessions (0 when unknown).
+    prices.csv is newest-first as scraped and oldest-first where appended to,
+    so the newest sessions are near its start or its end; only the first and
+    last 2 * window rows are read (appends are sometimes interleaved with
+    older backfilled dates).
+    """
+    out = {}
+    for sym in symbols:
+        try:
+            rows = _edge_rows(COMPANY_WISE / sym / "prices.csv", 2 * window)
+        except OSError:
+            rows = []
+        by_date = {}
+        for row in rows:  # file order: a date written twice keeps its later row
+            if row.get("date"):
+                by_date[row["date"]] = row.get("turnover")
+        values = []
+        for date in sorted(by_date)[-window:]:
+            try:
+                values.append(float(by_date[date]))
+            except (TypeError, ValueError):
+                continue
+        out[sym] = sum(values) / len(values) if values else 0.0
+    return out
+
+
+class WorkQueue:
+    """
+    Orders one dataset's symbols by value and runs them under a Deadline.
+
+    Order: symbols left over by the previous run first, then by staleness
+    (larger first), then by liquidity (mean turnover, larger first). The
+    staleness of a symbol comes from the caller (e.g. missing sessions for
+    prices) or, by default, from the time since this queue last processed it.
+
+    data/work_queue.json keeps, per queue, the last-done time of every symbol
+    (the watermark) and the symbols not reached before the deadline.
+    """
+
+    def __init__(self, name, deadline=None, state_path=STATE_PATH):
+        self.name = name
+        self.deadline = deadline or Deadline()
+        self.state_path = Path(state_path)
+
+    # ------------------------------------------------------------------
+    # State
+    # ------------------------------------------------------------------
+
+    def _read_all(self):
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except (FileNotFoundError, ValueError):
+            return {}
+
+    def state(self):
+        return self._read_all().get(self.name, {"done": {}, "leftover": []})
+
+    def _save(self, done, leftover):
+        with _STATE_LOCK:  # several queues share one file
+            data = self._read_all()
+            entry = data.setdefault(self.name, {"done": {}, "leftover": []})
+            entry["done"].update(done)
+            entry["done"] = dict(sorted(entry["done"].items()))
+            entry["leftover"] = leftover
+            tmp = self.state_path.with_suffix(".json.tmp")
+            with open(tmp, "w") as f:
+                json.dump(dict(sorted(data.items())), f, indent=1)
+            os.replace(tmp, self.state_path)
+
+    # ------------------------------------------------------------------
+    # Ordering
+    # ------------------------------------------------------------------
+
+    def age_days(self, symbols):
+        """Days since each symbol was last processed by this queue (inf if never)."""
+        done = self.state()["done"]
+        now = datetime.now(timezone.utc)
+        out = {}
+        for sym in symbols:
+            ts = done.get(sym)
+            out[sym] = (now - datetime.fromisoformat(ts)).total_seconds() / 86400 if ts else float("inf")
+        return out
+
+    def order(self, symbols, staleness=None):
+        symbols = list(symbols)
+        staleness = staleness if staleness is not None else self.age_days(symbols)
+        leftover = set(self.state()["leftover"])
+        liq = liquidity(symbols)
+        return sorted(symbols, key=lambda s: (s not in leftover, -staleness.get(s, 0), -liq.get(s, 0.0), s))
+
+    # ------------------------------------------------------------------
+    # Run
+    # ------------------------------------------------------------------
+
+    def run(self, symbols, func, staleness=None, delay=None):
+        """
+        Call func(symbol) in priority order until the deadline passes.
+        func returning False marks a failure: the symbol stays queued.
+        Returns (done, leftover) lists.
+        """
+        queue = self.order(symbols, staleness)
+        done, stamps = [], {}
+        for i, sym in enumerate(queue):
+            if self.deadline.expired():
+                break
+            logger.info(f"[{self.name} {i + 1}/{len(queue)}] {sym}")
+            try:
+                ok = func(sym) is not False
+            except Exception as e:
+                logger.error(f"  [{sym}] Error: {e}")
+                ok = False
+            if ok:
+                done.append(sym)
+                stamps[sym] = datetime.now(timezone.utc).isoformat(timespec="seconds")
+            if delay:
+                time.sleep(delay())
+
+        leftover = [s for s in queue if s not in stamps]
+        self._save(stamps, leftover)
+        if leftover:
+            logger.warning(f"{self.name}: {len(leftover)} symbols left for the next run "
+                           f"(budget exhausted or failed)")
+        return done, leftover
@@ -0,0 +1,281 @@
+"""
+reparse.py
+==========
+Rebuild CSV output from the raw response archive (core/archive.py) with no
+network traffic. Use it after fixing a parser: the archived responses are
+parsed again with the current code and the outputs rewritten.
+
+  prices        -> data/company-wise/{SYMBOL}/prices.csv       (rows for archived dates replaced)
+  dividends     -> data/company-wise/{SYMBOL}/dividend.csv     (latest complete archived run)
+  right_shares  -> data/company-wise/{SYMBOL}/right-share.csv  (latest complete archived run)
+  floorsheet    -> data/floorsheet/floorsheet_YYYY-MM-DD.csv   (archived trades merged by contract_no)
+
+The archive may cover only part of a day or a run (a failed page, archiving
+turned on mid-run, only --live polls captured), so stored rows the archive
+does not hold are kept, and a table is only replaced by a run whose pages
+cover the whole table.
+
+Tasks (one per symbol and dataset, one per floorsheet day) run in parallel
+processes.
+
+Usage:
+  python scraper/reparse.py
+  python scraper/reparse.py --kinds floorsheet --day 2026-03-25
+  python scraper/reparse.py --kinds prices --workers 8
+"""
+
+import os
+import re
+import sys
+import csv
+import json
+import logging
+import argparse
+from collections import defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from core.archive import ResponseArchive
+
+log = logging.getLogger("reparse")
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+FLOORSHEET_DIR = DATA_DIR / "floorsheet"
+
+ALL_KINDS = ["prices", "dividends", "right_shares", "floorsheet"]
+URL_KINDS = {
+    "/company-price-history": "prices",
+    "/company-dividend": "dividends",
+    "/company-rightshare": "right_shares",
+    "merolagani.com/Floorsheet.aspx": "floorsheet",
+}
+PRICE_FIELDS = ["date", "open", "high", "low", "ltp", "percent_change", "qty", "turnover"]
+
+
+def _company_symbols():
+    """ShareSansar company ID -> symbol, from both mapping files."""
+    out = {}
+    for name in ("company_id_mapping_all.json", "company_id_mapping.json"):
+        try:
+            with open(DATA_DIR / name) as f:
+                out.update({str(cid): sym for sym, cid in json.load(f).items()})
+        except (FileNotFoundError, ValueError):
+            pass
+    return out
+
+
+def _floorsheet_day(entry):
+    """
+    Trade date an archived floorsheet page belongs to: the date filter sent
+    with it (--backfill posts MM/DD/YYYY), else the day it was captured.
+    """
+    for value in entry["params"].values():
+        m = re.match(r"^(\d{2})/(\d{2})/(\d{4})$", str(value))
+        if m:
+            return f"{m.group(3)}-{m.group(1)}-{m.group(2)}"
+    return entry["day"]
+
+
+def collect_tasks(archive, kinds, day=None):
+    """Group archived responses into independent (kind, target, entries) tasks."""
+    ids = _company_symbols()
+    grouped = defaultdict(list)
+    for entry in archive.entries(day):
+        kind = next((k for frag, k in URL_KINDS.items() if frag in entry["url"]), None)
+        if kind not in kinds:
+            continue
+        if kind == "floorsheet":
+            target = _floorsheet_day(entry)
+        else:
+            target = ids.get(str(entry["params"].get("company", "")))
+            if not target:
+                continue
+        grouped[(kind, target)].append(entry)
+    return [(kind, target, entries) for (kind, target), entries in sorted(grouped.items())]
+
+
+def _json_rows(archive, entries):
+    for entry in entries:
+        try:
+            yield from json.loads(archive.read(entry)).get("data", [])
+        except (ValueError, AttributeError):
+            continue
+
+
+def _write_csv(path, fields, rows):
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp = path.with_suffix(".csv.tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
+        writer = csv.DictWriter(f, fieldnames=fields, extrasaction="ignore")
+        writer.writeheader()
+        writer.writerows(rows)
+    os.replace(tmp, path)
+
+
+def _reparse_prices(archive, symbol, entries):
+    from core.history import parse_history_record
+    from core.quality import gate_prices
+
+    parsed = {}
+    for row in _json_rows(archive, entries):  # capture order: later wins
+        rec = parse_history_record(row) if isinstance(row, dict) else None
+        if rec:
+            parsed[rec["date"]] = rec
+    parsed = {r["date"]: r for r in gate_prices(symbol, list(parsed.values()))[0]}
+
+    path = COMPANY_WISE / symbol / "prices.csv"
+    rows = []
+    if path.exists():
+        with open(path, newline="", encoding="utf-8") as f:
+            rows = list(csv.DictReader(f))
+    seen = set()
+    for i, row in enumerate(rows):
+        if row["date"] in parsed:
+            rows[i] = parsed[row["date"]]
+        seen.add(row["date"])
+    rows.extend(parsed[d] for d in sorted(parsed) if d not in seen)
+    _write_csv(path, PRICE_FIELDS, rows)
+
+    try:
+        from core.indicators import IndicatorEngine
+        IndicatorEngine().rebuild_symbol(symbol)
+    except ImportError:
+        pass
+    return len(parsed)
+
+
+def _complete_run(archive, entries):
+    """
+    Rows of the newest archived run whose pages cover the whole table
+    (offsets 0, 50, ... up to recordsFiltered), or None if no run does.
+    """
+    runs = defaultdict(dict)
+    for e in entries:  # one page per 'start' offset; a retried page keeps its last capture
+        runs[e["day"]][e["params"].get("start", "0")] = e
+    for day in sorted(runs, reverse=True):
+        rows, total = [], None
+        for start in sorted(runs[day], key=int):
+            if int(start) != len(rows):  # a page in between was not captured
+                break
+            try:
+                data = json.loads(archive.read(runs[day][start]))
+            except ValueError:
+                break
+            rows.extend(data.get("data", []))
+            total = int(data.get("recordsFiltered", 0) or data.get("recordsTotal", 0))
+        if total is not None and len(rows) >= total:
+            return rows
+    return None
+
+
+def _reparse_table(archive, symbol, entries, kind):
+    import run_github_actions as gha
+
+    if kind == "dividends":
+        parse, fields, name = gha.parse_dividend_row, gha.DIVIDEND_FIELDS, "dividend.csv"
+    else:
+        parse, fields, name = gha.parse_right_share_row, gha.RIGHT_SHARE_FIELDS, "right-share.csv"
+    rows = _complete_run(archive, entries)
+    if rows is None:
+        log.warning(f"  {kind} {symbol}: no archived run covers the whole table, {name} kept")
+        return 0
+    records = [parse(r) for r in rows]
+    if records:
+        _write_csv(COMPANY_WISE / symbol / name, fields, records)
+    return len(records)
+
+
+def _reparse_floorsheet(archive, day, entries):
+    from bs4 import BeautifulSoup
+    import run_github_actions as gha
+    from core.quality import gate_floorsheet
+    from core.storage import read_floorsheet
+
+    records, seen, foreign = [], set(), 0
+    prefix = day.replace("-", "")
+    for entry in entries:
+        soup = BeautifulSoup(archive.read(entry), "html.parser")
+        for rec in gha.parse_floorsheet_page(soup, day) or []:
+            if rec["contract_no"][:8] != prefix:  # e.g. the previous session shown before the open
+                foreign += 1
+            elif rec["contract_no"] not in seen:  # live polls overlap
+                seen.add(rec["contract_no"])
+                records.append(rec)
+    if foreign:
+        log.info(f"  floorsheet {day}: {foreign} archived rows of other trade dates skipped")
+    records, _ = gate_floorsheet(records, day)
+    if not records:
+        return 0
+
+    # Reparsed trades replace their stored copy; stored trades the archive
+    # does not hold (pages not captured) are kept
+    parsed = {r["contract_no"]: r for r in records}
+    rows = read_floorsheet(day)
+    stored = set()
+    for i, row in enumerate(rows):
+        if row.get("contract_no") in parsed:
+            rows[i] = parsed[row["contract_no"]]
+        stored.add(row.get("contract_no"))
+    rows.extend(r for r in records if r["contract_no"] not in stored)
+    if len(rows) > len(records):
+        log.info(f"  floorsheet {day}: {len(rows) - len(records)} stored rows not in the archive kept")
+    _write_csv(FLOORSHEET_DIR / f"floorsheet_{day}.csv", gha.FLOORSHEET_FIELDS, rows)
+    return len(records)
+
+
+def run_task(task):
+    kind, target, entries = task
+    archive = ResponseArchive()
+    if kind == "prices":
+        n = _reparse_prices(archive, target, entries)
+    elif kind == "floorsheet":
+        n = _reparse_floorsheet(archive, target, entries)
+    else:
+        n = _reparse_table(archive, target, entries, kind)
+    return kind, target, len(entries), n
+
+
+def reparse(kinds=ALL_KINDS, day=None, workers=None):
+    """Re-run the parsers over the archive. Returns {kind: rows written}."""
+    archive = ResponseArchive()
+    tasks = collect_tasks(archive, set(kinds), day)
+    log.info(f"Reparse: {len(tasks)} tasks from {sum(len(t[2]) for t in tasks)} archived responses")
+
+    totals = defaultdict(int)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for kind, target, n_resp, n_rows in pool.map(run_task, tasks, chunksize=4):
+            log.info(f"  {kind:13s} {target:12s} {n_resp:4d} responses -> {n_rows} rows")
+            totals[kind] += n_rows
+
+    if totals.get("floorsheet"):
+        # Derived floorsheet stores are rebuilt from the rewritten day files
+        from core.contract_index import ContractIndex
+        from core.partitions import FloorsheetPartitions
+        ContractIndex().rebuild()
+        FloorsheetPartitions().rebuild()
+    return dict(totals)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Rebuild CSV output from archived raw responses (no network)")
+    parser.add_argument("--kinds", default=",".join(ALL_KINDS),
+                        help=f"Comma-separated datasets (default: {','.join(ALL_KINDS)})")
+    parser.add_argument("--day", default=None, help="Only responses archived on this day (YYYY-MM-DD)")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes (default: CPU count)")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s  %(levelname)-7s  %(message)s")
+    kinds = [k.strip() for k in args.kinds.split(",") if k.strip()]
+    unknown = [k for k in kinds if k not in ALL_KINDS]
+    if unknown:
+        raise SystemExit(f"Unknown kind(s): {', '.join(unknown)} (choose from {', '.join(ALL_KINDS)})")
+    totals = reparse(kinds, args.day, args.workers)
+    log.info(f"Reparse complete: {totals or 'nothing archived'}")
+
+
+if __name__ == "__main__":
+    main()
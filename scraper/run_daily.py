@@ -7,7 +7,8 @@ import argparse
 # Add the 'scraper' directory to Python path if not already there
 sys.path.append(os.getcwd())
 
-from core.daily import DailyScraperManager
+from core.daily import DailyScraperManager, setup_logging
+from core.workqueue import Deadline
 
 def main():
     parser = argparse.ArgumentParser(description="ShareSansar Daily Scraper")
@@ -17,22 +18,73 @@ def main():
     parser.add_argument("--full-scrape", action="store_true", help="Force full scraping of all existing companies (slow)")
     parser.add_argument("--incremental", action="store_true", default=True, help="Default mode: Check existing companies for NEW updates only (fast)")
     parser.add_argument("--all-companies", action="store_true", help="Scrape ALL companies found, ignoring the priority list.")
+    parser.add_argument("--archive", action="store_true", help="Keep compressed raw responses in data/.cache/raw/ (see reparse.py)")
+    parser.add_argument("--no-http-cache", action="store_true", help="Always fetch company pages live (skip data/.cache/http/)")
+    parser.add_argument("--no-change-feed", action="store_true", help="Do not log changed files to data/changes/")
+    parser.add_argument("--repair-gaps", action="store_true", help="Find sessions missing inside existing histories and backfill only those.")
+    parser.add_argument("--time-budget", type=float, default=None, metavar="MINUTES", help="Stop starting new companies after this many minutes; the rest is queued for the next run.")
+    parser.add_argument("--shard", default=None, metavar="I/N", help="Only update the symbols of shard I of N (0-based); output goes to data/.shards/ for `python -m core.shard merge`.")
+    parser.add_argument("--since", default=None, help="With --repair-gaps: ignore gaps before this date (YYYY-MM-DD)")
     
     args = parser.parse_args()
+    setup_logging()
     
-    manager = DailyScraperManager()
+    shard = None
+    if args.shard:
+        from core.shard import Shard
+        try:
+            shard = Shard.parse(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        if args.repair_gaps:
+            parser.error("--repair-gaps cannot be combined with --shard")
+
+    manager = DailyScraperManager(shard=shard)
+    if args.archive:
+        from core.archive import ResponseArchive
+        ResponseArchive().attach(manager.price_scraper.session)
+    if not args.no_http_cache:
+        from core.httpcache import HttpCache
+        HttpCache().attach(manager.price_scraper.session)
     
     priority_only = not args.all_companies
+    deadline = Deadline(args.time_budget * 60 if args.time_budget else None)
+
+    # A shard writes under data/.shards/; its changes are logged by the merge
+    feed = None
+    if not args.no_change_feed and not shard:
+        from core.changefeed import ChangeFeed
+        feed = ChangeFeed().begin(["prices", "sector_index"])
     
-    if args.new_only:
+    if args.repair_gaps:
+        from core.gaps import GapScanner
+        print("Running GAP REPAIR for existing price histories...")
+        scanner = GapScanner(since=args.since)
+        gaps = scanner.scan()
+        added = scanner.backfill(gaps, scraper=manager.price_scraper)
+        print(f"Backfilled {sum(added.values())} rows across {len(added)} companies")
+    elif args.new_only:
         print("Running NEW COMPANY detection only...")
-        manager.run_daily_update(check_new_only=True, priority_only=priority_only)
+        manager.run_daily_update(check_new_only=True, priority_only=priority_only, deadline=deadline)
     elif args.full_scrape:
         print("Running FULL SCRAPE for companies...")
-        manager.run_daily_update(force_full=True, priority_only=priority_only)
+        manager.run_daily_update(force_full=True, priority_only=priority_only, deadline=deadline)
     else:
         print("Running STANDARD DAILY UPDATE (New Companies + Incremental Updates)...")
-        manager.run_daily_update(force_full=False, priority_only=priority_only)
+        manager.run_daily_update(force_full=False, priority_only=priority_only, deadline=deadline)
+
+    if feed:
+        feed.scan("repair_gaps" if args.repair_gaps else "prices", ["prices"])
+
+    # Sector / market aggregates follow the merged prices, so a shard skips them
+    if not shard:
+        from core.sector_index import IndexEngine
+        try:
+            IndexEngine().update()
+        except Exception as e:  # derived file — never fail the run over it
+            print(f"Could not update sector index: {e}")
+        if feed:
+            feed.scan("sector_index", ["sector_index"])
 
 if __name__ == "__main__":
     main()
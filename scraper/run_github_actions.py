@@ -13,6 +13,11 @@ Usage (locally or in GitHub Actions):
   python scraper/run_github_actions.py --right-shares   # right shares only
   python scraper/run_github_actions.py --floorsheet     # floorsheet only
   python scraper/run_github_actions.py --floorsheet --max-pages 5   # test
+  python scraper/run_github_actions.py --live --interval 60          # intraday polling
+  python scraper/run_github_actions.py --backfill 2026-03-13:2026-03-24   # missed past days
+  python scraper/run_github_actions.py --archive                     # keep raw responses
+  python scraper/run_github_actions.py --reparse --floorsheet        # rebuild from archive, offline
+  python scraper/run_github_actions.py --shard 1/4                   # a quarter of the symbols
 """
 
 import sys
@@ -26,7 +31,9 @@ import argparse
 import requests
 from bs4 import BeautifulSoup
 from pathlib import Path
-from datetime import date as dt_date
+from datetime import date as dt_date, timedelta
+
+from core.session import BudgetedSession, BootstrapCache, LatencyTracker, hedged_request
 
 # ── Paths ──────────────────────────────────────────────────────────────────
 ROOT = Path(__file__).resolve().parent.parent
@@ -36,18 +43,91 @@ FLOORSHEET_DIR = DATA_DIR / "floorsheet"
 COMPANY_LIST = Path(__file__).resolve().parent / "company_list.json"
 
 # ── Logging ────────────────────────────────────────────────────────────────
-logging.basicConfig(
-    level=logging.INFO,
-    format="%(asctime)s  %(levelname)-7s  %(message)s",
-    handlers=[logging.StreamHandler()],
-)
 log = logging.getLogger("daily")
 
+
+def setup_logging():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s  %(levelname)-7s  %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+
 # ── HTTP session ───────────────────────────────────────────────────────────
 BASE_URL = "https://www.sharesansar.com"
 
-def make_session():
-    s = requests.Session()
+# Set by enable_archive(): every session made afterwards stores its raw responses
+_ARCHIVE = None
+
+
+def enable_archive():
+    """Archive raw responses of all sessions created from now on (data/.cache/raw/)."""
+    global _ARCHIVE
+    from core.archive import ResponseArchive
+    _ARCHIVE = _ARCHIVE or ResponseArchive()
+    return _ARCHIVE
+
+
+# Set by enable_http_cache(): company pages and listings are served from data/.cache/http/
+_HTTP_CACHE = None
+
+
+def enable_http_cache():
+    """Serve repeat page loads of all sessions created from now on from the HTTP cache."""
+    global _HTTP_CACHE
+    from core.httpcache import HttpCache
+    _HTTP_CACHE = _HTTP_CACHE or HttpCache()
+    return _HTTP_CACHE
+
+
+# Set by enable_change_feed(): changed files are logged to data/changes/ after each runner
+_FEED = None
+
+
+def enable_change_feed():
+    global _FEED
+    from core.changefeed import ChangeFeed
+    _FEED = _FEED or ChangeFeed().begin()
+    return _FEED
+
+
+def _publish(stage, datasets):
+    """Log what `stage` changed in `datasets` to the change feed (no-op when it is off)."""
+    if _FEED and not _SHARD:  # a shard's output is logged when it is merged
+        _FEED.scan(stage, datasets)
+
+
+# Set by enable_shard(): per-symbol datasets only cover this shard's symbols
+_SHARD = None
+
+
+def enable_shard(text):
+    """Restrict dividends / right shares to shard 'i/N', writing under data/.shards/."""
+    global _SHARD
+    from core.shard import Shard
+    _SHARD = Shard.parse(text)
+    return _SHARD
+
+
+def company_output_dir():
+    """Where per-symbol tables are written: data/company-wise or the shard's copy."""
+    return _SHARD.company_dir if _SHARD else COMPANY_WISE
+
+
+def _work_queue(name, deadline):
+    if _SHARD:
+        return _SHARD.queue(name, deadline)
+    from core.workqueue import WorkQueue
+    return WorkQueue(name, deadline)
+
+
+def make_session(budgets=None):
+    """New HTTP session; with budgets ({host: max in-flight}) it is safe to share across threads."""
+    s = BudgetedSession(budgets) if budgets else requests.Session()
+    if _ARCHIVE:
+        _ARCHIVE.attach(s)
+    if _HTTP_CACHE:
+        _HTTP_CACHE.attach(s)
     s.headers.update({
         "User-Agent": "Mozilla/5.0 (Windows NT 10.0; Win64; x64) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/120.0.0.0 Safari/537.36",
         "Accept": "text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8",
@@ -93,6 +173,43 @@ def get_csrf_and_company_id(session, symbol):
         return None, None
 
 
+_COMPANY_ID_MAP = None
+
+
+def load_company_id_map():
+    """Symbol -> ShareSansar company ID from data/company_id_mapping.json (read once)."""
+    global _COMPANY_ID_MAP
+    if _COMPANY_ID_MAP is None:
+        with open(DATA_DIR / "company_id_mapping.json") as f:
+            _COMPANY_ID_MAP = json.load(f)
+    return _COMPANY_ID_MAP
+
+
+def _company_context(symbol, session=None, bootstrap=None):
+    """
+    Load the company page (cookies + CSRF) and resolve the company ID.
+    Returns (session, csrf, company_id, company_url) or None on failure.
+    """
+    session = session or make_session()
+    bootstrap = bootstrap or BootstrapCache()
+    company_url = f"{BASE_URL}/company/{symbol.lower()}"
+
+    csrf, page_company_id = bootstrap.get(session, symbol, base_url=BASE_URL)
+    if csrf is None:
+        log.warning(f"  [{symbol}] Company page failed")
+        return None
+    if not csrf:
+        log.warning(f"  [{symbol}] No CSRF token found")
+        return None
+
+    # Look up company_id from mapping, falling back to the one on the page
+    company_id = load_company_id_map().get(symbol.upper()) or page_company_id
+    if not company_id:
+        log.warning(f"  [{symbol}] No company ID in mapping")
+        return None
+    return session, csrf, company_id, company_url
+
+
 def ensure_dir(path: Path):
     path.mkdir(parents=True, exist_ok=True)
 
@@ -116,11 +233,13 @@ def append_to_csv(filepath: Path, fieldnames: list, rows: list):
 
 
 def overwrite_csv(filepath: Path, fieldnames: list, rows: list):
-    """Write/overwrite a CSV with the given rows."""
-    with open(filepath, "w", newline="", encoding="utf-8") as f:
+    """Write/overwrite a CSV with the given rows (atomically: readers never see half a file)."""
+    tmp = filepath.with_name(filepath.name + ".tmp")
+    with open(tmp, "w", newline="", encoding="utf-8") as f:
         writer = csv.DictWriter(f, fieldnames=fieldnames, extrasaction="ignore")
         writer.writeheader()
         writer.writerows(rows)
+    os.replace(tmp, filepath)
 
 
 # ═══════════════════════════════════════════════════════════════════════════
@@ -152,8 +271,12 @@ def _make_full_dt_params(company_id):
     }
 
 
+# Response times of the ShareSansar AJAX endpoints, for hedging slow requests
+_AJAX_LATENCY = LatencyTracker()
+
+
 def _post_ajax(session, url, params, csrf, referer):
-    """POST to ShareSansar AJAX, retrying on 202. Returns parsed JSON or None."""
+    """POST to ShareSansar AJAX (hedged when slow), retrying on 202. Returns parsed JSON, or None on failure."""
     headers = {
         'Accept': 'application/json, text/javascript, */*; q=0.01',
         'X-Requested-With': 'XMLHttpRequest',
@@ -162,12 +285,16 @@ def _post_ajax(session, url, params, csrf, referer):
         'Referer': referer,
     }
     for attempt in range(3):
-        resp = session.post(url, data=params, headers=headers, timeout=30)
+        resp = hedged_request(session, "POST", url, _AJAX_LATENCY, data=params, headers=headers, timeout=30)
         if resp.status_code == 200:
-            return resp.json()
+            try:
+                return resp.json()
+            except ValueError:
+                log.warning(f"  AJAX returned a non-JSON body (attempt {attempt+1})")
+                return None
         log.warning(f"  AJAX returned {resp.status_code} (attempt {attempt+1})")
         if resp.status_code == 202:
-            time.sleep(2)
+            time.sleep(2 ** attempt + random.uniform(0, 1))
         else:
             break
     return None
@@ -179,31 +306,24 @@ def _post_ajax(session, url, params, csrf, referer):
 DIVIDEND_FIELDS = ["fiscal_year", "bonus_share", "cash_dividend", "total_dividend", "book_closure_date"]
 
 
-def update_dividends(symbol):
-    """Scrape dividend history for the given symbol."""
-    session = make_session()
+def parse_dividend_row(row):
+    """company-dividend AJAX row -> dividend.csv record."""
+    return {
+        "fiscal_year":       str(row.get("year", "")).strip(),
+        "bonus_share":       str(row.get("bonus_share", "0")).strip(),
+        "cash_dividend":     str(row.get("cash_dividend", "0")).strip(),
+        "total_dividend":    str(row.get("total_dividend", "0")).strip(),
+        "book_closure_date": str(row.get("bookclose_date", "")).strip(),
+    }
 
-    # Step 1: load company page to establish cookies + get CSRF
-    company_url = f"{BASE_URL}/company/{symbol.lower()}"
-    page = session.get(company_url, timeout=30)
-    if page.status_code != 200:
-        log.warning(f"  [{symbol}] Company page failed: {page.status_code}")
-        return
-    soup = BeautifulSoup(page.text, "html.parser")
-    csrf_meta = soup.find("meta", {"name": "_token"})
-    if not csrf_meta:
-        log.warning(f"  [{symbol}] No CSRF token found")
-        return
-    csrf = csrf_meta["content"]
 
-    # Look up company_id from mapping
-    mapping_path = DATA_DIR / "company_id_mapping.json"
-    with open(mapping_path) as f:
-        mapping = json.load(f)
-    company_id = mapping.get(symbol.upper())
-    if not company_id:
-        log.warning(f"  [{symbol}] No company ID in mapping")
-        return
+def update_dividends(symbol, session=None, bootstrap=None):
+    """Scrape dividend history for the given symbol."""
+    # Step 1: load company page to establish cookies + get CSRF
+    ctx = _company_context(symbol, session, bootstrap)
+    if not ctx:
+        return False  # stays queued for the next run
+    session, csrf, company_id, company_url = ctx
 
     # Step 2: POST to dividend endpoint with full DataTables params
     records = []
@@ -212,20 +332,15 @@ def update_dividends(symbol):
         params = _make_full_dt_params(company_id)
         params['start'] = str(start)
         data = _post_ajax(session, f"{BASE_URL}/company-dividend", params, csrf, company_url)
-        if not data:
-            break
+        if data is None:
+            # Keep the stored table rather than overwrite it with the pages fetched so far
+            log.warning(f"  [{symbol}] dividend page at offset {start} failed; will retry next run")
+            return False
         batch = data.get("data", [])
         total = int(data.get("recordsFiltered", 0) or data.get("recordsTotal", 0))
         if not batch:
             break
-        for row in batch:
-            records.append({
-                "fiscal_year":       str(row.get("year", "")).strip(),
-                "bonus_share":       str(row.get("bonus_share", "0")).strip(),
-                "cash_dividend":     str(row.get("cash_dividend", "0")).strip(),
-                "total_dividend":    str(row.get("total_dividend", "0")).strip(),
-                "book_closure_date": str(row.get("bookclose_date", "")).strip(),
-            })
+        records.extend(parse_dividend_row(row) for row in batch)
         if start + 50 >= total or len(batch) < 50:
             break
         start += 50
@@ -235,7 +350,7 @@ def update_dividends(symbol):
         log.info(f"  [{symbol}] No dividend data")
         return
 
-    out = COMPANY_WISE / symbol / "dividend.csv"
+    out = company_output_dir() / symbol / "dividend.csv"
     ensure_dir(out.parent)
     overwrite_csv(out, DIVIDEND_FIELDS, records)
     log.info(f"  [{symbol}] Saved {len(records)} dividend records")
@@ -247,29 +362,25 @@ def update_dividends(symbol):
 RIGHT_SHARE_FIELDS = ["ratio", "total_units", "issue_price", "opening_date", "closing_date", "status", "issue_manager"]
 
 
-def update_right_shares(symbol):
-    """Scrape right share history for the given symbol."""
-    session = make_session()
+def parse_right_share_row(row):
+    """company-rightshare AJAX row -> right-share.csv record."""
+    return {
+        "ratio":         str(row.get("ratio_value", "")).strip(),
+        "total_units":   str(row.get("total_units", "0")).strip(),
+        "issue_price":   str(row.get("issue_price", "0")).strip(),
+        "opening_date":  str(row.get("opening_date", "")).strip(),
+        "closing_date":  str(row.get("closing_date", "")).strip(),
+        "status":        str(row.get("is_open", "")).strip(),
+        "issue_manager": str(row.get("issue_manager", "")).strip(),
+    }
 
-    company_url = f"{BASE_URL}/company/{symbol.lower()}"
-    page = session.get(company_url, timeout=30)
-    if page.status_code != 200:
-        log.warning(f"  [{symbol}] Company page failed: {page.status_code}")
-        return
-    soup = BeautifulSoup(page.text, "html.parser")
-    csrf_meta = soup.find("meta", {"name": "_token"})
-    if not csrf_meta:
-        log.warning(f"  [{symbol}] No CSRF token found")
-        return
-    csrf = csrf_meta["content"]
 
-    mapping_path = DATA_DIR / "company_id_mapping.json"
-    with open(mapping_path) as f:
-        mapping = json.load(f)
-    company_id = mapping.get(symbol.upper())
-    if not company_id:
-        log.warning(f"  [{symbol}] No company ID in mapping")
-        return
+def update_right_shares(symbol, session=None, bootstrap=None):
+    """Scrape right share history for the given symbol."""
+    ctx = _company_context(symbol, session, bootstrap)
+    if not ctx:
+        return False  # stays queued for the next run
+    session, csrf, company_id, company_url = ctx
 
     records = []
     start = 0
@@ -277,22 +388,15 @@ def update_right_shares(symbol):
         params = _make_full_dt_params(company_id)
         params['start'] = str(start)
         data = _post_ajax(session, f"{BASE_URL}/company-rightshare", params, csrf, company_url)
-        if not data:
-            break
+        if data is None:
+            # Keep the stored table rather than overwrite it with the pages fetched so far
+            log.warning(f"  [{symbol}] right share page at offset {start} failed; will retry next run")
+            return False
         batch = data.get("data", [])
         total = int(data.get("recordsFiltered", 0) or data.get("recordsTotal", 0))
         if not batch:
             break
-        for row in batch:
-            records.append({
-                "ratio":         str(row.get("ratio_value", "")).strip(),
-                "total_units":   str(row.get("total_units", "0")).strip(),
-                "issue_price":   str(row.get("issue_price", "0")).strip(),
-                "opening_date":  str(row.get("opening_date", "")).strip(),
-                "closing_date":  str(row.get("closing_date", "")).strip(),
-                "status":        str(row.get("is_open", "")).strip(),
-                "issue_manager": str(row.get("issue_manager", "")).strip(),
-            })
+        records.extend(parse_right_share_row(row) for row in batch)
         if start + 50 >= total or len(batch) < 50:
             break
         start += 50
@@ -302,7 +406,7 @@ def update_right_shares(symbol):
         log.info(f"  [{symbol}] No right share data")
         return
 
-    out = COMPANY_WISE / symbol / "right-share.csv"
+    out = company_output_dir() / symbol / "right-share.csv"
     ensure_dir(out.parent)
     overwrite_csv(out, RIGHT_SHARE_FIELDS, records)
     log.info(f"  [{symbol}] Saved {len(records)} right share records")
@@ -317,19 +421,71 @@ def _get_floorsheet_hidden(soup):
     return {i["name"]: i.get("value", "") for i in soup.find_all("input", type="hidden") if i.get("name")}
 
 
-def scrape_floorsheet(max_pages=None):
-    """Scrape today's full floorsheet from merolagani. Returns list of records."""
+def _next_page_payload(soup):
+    """Form fields that request the floorsheet page after this one (None on the last page)."""
     import re
+    next_btn = soup.find("a", title="Next Page") or soup.find("a", string="Next")
+    if not next_btn:
+        return None
+
+    onclick = next_btn.get("onclick", "")
+    m = re.search(r"changePageIndex\(['\"]([^'\"]+)['\"],\s*['\"]([^'\"]+)['\"],\s*['\"]([^'\"]+)['\"]", onclick)
+    if not m:
+        return None
+
+    next_page_num, hidden_field_id, submit_btn_id = m.group(1), m.group(2), m.group(3)
+    hidden_input = soup.find(id=hidden_field_id)
+    submit_input = soup.find(id=submit_btn_id)
+    if not hidden_input or not submit_input:
+        return None
+
+    payload = _get_floorsheet_hidden(soup)
+    payload[hidden_input["name"]] = next_page_num
+    payload[submit_input["name"]] = ""
+    return payload
+
+
+def parse_floorsheet_page(soup, day):
+    """Records on one floorsheet page (None when the page has no table)."""
+    table = soup.find("table", class_="table-bordered")
+    if not table:
+        return None
+    records = []
+    for row in table.find("tbody").find_all("tr"):
+        cols = row.find_all("td")
+        if len(cols) < 8:
+            continue
+        records.append({
+            "date":         day,
+            "sn":           cols[0].get_text(strip=True),
+            "contract_no":  cols[1].get_text(strip=True),
+            "stock_symbol": cols[2].get_text(strip=True),
+            "buyer":        cols[3].get_text(strip=True),
+            "seller":       cols[4].get_text(strip=True),
+            "quantity":     cols[5].get_text(strip=True),
+            "rate":         cols[6].get_text(strip=True),
+            "amount":       cols[7].get_text(strip=True),
+        })
+    return records
+
+
+def scrape_floorsheet(max_pages=None, session=None, stop_contract=None):
+    """
+    Scrape today's full floorsheet from merolagani. Returns list of records.
+    The sheet lists the newest trades first, so with stop_contract set paging
+    stops after the first page holding a contract_no <= stop_contract and only
+    newer rows are returned.
+    """
     today = str(dt_date.today())
-    fs_session = make_session()
-    fs_session.headers.update({
+    fs_session = session or make_session()
+    fs_headers = {
         "Origin": "https://merolagani.com",
         "Referer": FLOORSHEET_URL,
         "Upgrade-Insecure-Requests": "1",
-    })
+    }
 
     log.info("Floorsheet: loading page...")
-    resp = fs_session.get(FLOORSHEET_URL, timeout=30)
+    resp = fs_session.get(FLOORSHEET_URL, headers=fs_headers, timeout=30)
     if resp.status_code != 200:
         log.error(f"Floorsheet: failed to load page ({resp.status_code})")
         return []
@@ -340,110 +496,348 @@ def scrape_floorsheet(max_pages=None):
 
     while True:
         log.info(f"Floorsheet: page {page_num}...")
-        table = soup.find("table", class_="table-bordered")
-        if not table:
+        rows = parse_floorsheet_page(soup, today)
+        if rows is None:
             log.warning("Floorsheet: table not found")
             break
 
-        for row in table.find("tbody").find_all("tr"):
-            cols = row.find_all("td")
-            if len(cols) < 8:
-                continue
-            all_records.append({
-                "date":         today,
-                "sn":           cols[0].get_text(strip=True),
-                "contract_no":  cols[1].get_text(strip=True),
-                "stock_symbol": cols[2].get_text(strip=True),
-                "buyer":        cols[3].get_text(strip=True),
-                "seller":       cols[4].get_text(strip=True),
-                "quantity":     cols[5].get_text(strip=True),
-                "rate":         cols[6].get_text(strip=True),
-                "amount":       cols[7].get_text(strip=True),
-            })
-
-        if max_pages and page_num >= max_pages:
+        reached_known = False
+        for record in rows:
+            if stop_contract is not None:
+                cn = record["contract_no"]
+                if not cn.isdigit():
+                    continue
+                if int(cn) <= stop_contract:
+                    reached_known = True
+                    continue
+            all_records.append(record)
+
+        if reached_known or (max_pages and page_num >= max_pages):
             break
 
-        next_btn = soup.find("a", title="Next Page") or soup.find("a", string="Next")
-        if not next_btn:
+        payload = _next_page_payload(soup)
+        if payload is None:
             break
 
-        onclick = next_btn.get("onclick", "")
-        m = re.search(r"changePageIndex\(['\"]([^'\"]+)['\"],\s*['\"]([^'\"]+)['\"],\s*['\"]([^'\"]+)['\"]", onclick)
-        if not m:
+        time.sleep(random.uniform(1, 2))
+        resp = fs_session.post(FLOORSHEET_URL, data=payload, headers=fs_headers, timeout=45)
+        if resp.status_code != 200:
             break
+        soup = BeautifulSoup(resp.text, "html.parser")
+        page_num += 1
 
-        next_page_num, hidden_field_id, submit_btn_id = m.group(1), m.group(2), m.group(3)
-        hidden_input = soup.find(id=hidden_field_id)
-        submit_input = soup.find(id=submit_btn_id)
-        if not hidden_input or not submit_input:
-            break
+    log.info(f"Floorsheet: scraped {len(all_records)} records")
+    return all_records
 
-        payload = _get_floorsheet_hidden(soup)
-        payload[hidden_input["name"]] = next_page_num
-        payload[submit_input["name"]] = ""
 
+def _find_date_filter(soup):
+    """(date input name, search control) of the floorsheet's date filter form, or (None, None)."""
+    import re
+    date_input = soup.find("input", id=re.compile(r"DateFilter", re.I)) \
+        or soup.find("input", attrs={"name": re.compile(r"txt.*Date", re.I)})
+    search = soup.find(id=re.compile(r"SearchFloorsheet", re.I)) \
+        or soup.find(attrs={"name": re.compile(r"btn.*Search", re.I)})
+    if not date_input or not date_input.get("name") or not search:
+        return None, None
+    return date_input["name"], search
+
+
+def scrape_floorsheet_day(day, session=None, max_pages=None):
+    """
+    Scrape the complete floorsheet of a past day through merolagani's date
+    filter. Returns the records, or None when the day could not be fetched
+    completely (a partial day is never returned, so it is never saved).
+    """
+    import re
+    fs_session = session or make_session()
+    fs_headers = {
+        "Origin": "https://merolagani.com",
+        "Referer": FLOORSHEET_URL,
+        "Upgrade-Insecure-Requests": "1",
+    }
+    resp = fs_session.get(FLOORSHEET_URL, headers=fs_headers, timeout=30)
+    if resp.status_code != 200:
+        log.error(f"Floorsheet {day}: failed to load page ({resp.status_code})")
+        return None
+    soup = BeautifulSoup(resp.text, "html.parser")
+
+    date_name, search = _find_date_filter(soup)
+    if not date_name:
+        log.error(f"Floorsheet {day}: date filter not found on the page")
+        return None
+    # The filter is a text box (MM/DD/YYYY) and must be re-sent with every page
+    y, m, d = day.split("-")
+    date_field = {date_name: f"{m}/{d}/{y}"}
+    payload = {**_get_floorsheet_hidden(soup), **date_field}
+    if search.name == "a":  # LinkButton: javascript:__doPostBack('ctl00$...', '')
+        m = re.search(r"__doPostBack\('([^']+)'", search.get("href", ""))
+        payload["__EVENTTARGET"] = m.group(1) if m else search.get("id", "").replace("_", "$")
+        payload["__EVENTARGUMENT"] = ""
+    else:
+        payload[search["name"]] = search.get("value", "Search")
+
+    prefix = day.replace("-", "")
+    records = []
+    page_num = 1
+    while True:
         time.sleep(random.uniform(1, 2))
-        resp = fs_session.post(FLOORSHEET_URL, data=payload, timeout=45)
+        resp = fs_session.post(FLOORSHEET_URL, data=payload, headers=fs_headers, timeout=45)
         if resp.status_code != 200:
-            break
+            log.error(f"Floorsheet {day}: page {page_num} returned {resp.status_code}")
+            return None
         soup = BeautifulSoup(resp.text, "html.parser")
+        rows = parse_floorsheet_page(soup, day)
+        if rows is None:
+            log.error(f"Floorsheet {day}: table not found on page {page_num}")
+            return None
+        # contract_no starts with the trade date: anything else means the filter was ignored
+        if any(not r["contract_no"].startswith(prefix) for r in rows):
+            log.error(f"Floorsheet {day}: page {page_num} holds trades of another day")
+            return None
+        records.extend(rows)
+
+        if max_pages and page_num >= max_pages:
+            break
+        payload = _next_page_payload(soup)
+        if payload is None:
+            break
+        payload.update(date_field)
         page_num += 1
 
-    log.info(f"Floorsheet: scraped {len(all_records)} records")
-    return all_records
+    log.info(f"Floorsheet {day}: {len(records)} records over {page_num} pages")
+    return records
 
 
-def save_floorsheet(records):
-    """Save to data/floorsheet/floorsheet_YYYY-MM-DD.csv (overwrites if re-run same day)."""
+def save_floorsheet(records, day=None):
+    """
+    Save to data/floorsheet/floorsheet_YYYY-MM-DD.csv (overwrites if re-run same day).
+    Trades already stored under another day (matched on contract_no) are dropped
+    and reported, so re-runs and stale pages don't duplicate rows.
+    day defaults to today (backfills pass the day they fetched).
+    """
     if not records:
         return
-    today = str(dt_date.today())
+    today = day or str(dt_date.today())
     ensure_dir(FLOORSHEET_DIR)
 
+    from core.quality import gate_floorsheet
+    records, _ = gate_floorsheet(records, today)
+    if not records:
+        return
+
+    try:
+        from core.contract_index import ContractIndex
+        index = ContractIndex()
+    except ImportError:  # numpy not installed — dedupe index is optional
+        index = None
+    if index:
+        records, report = index.filter_new(records, today)
+        if report["batch_duplicates"] or report["already_indexed"]:
+            log.warning(
+                f"Floorsheet: dropped {report['batch_duplicates']} repeated and "
+                f"{report['already_indexed']} already-stored trades "
+                f"(collides with: {report['collides_with'] or '-'})"
+            )
+        if report["unparsable"]:
+            log.warning(f"Floorsheet: {report['unparsable']} rows with an unparsable contract_no")
+        if not records:
+            log.warning("Floorsheet: nothing new to save (stale page?)")
+            return
+
     csv_path = FLOORSHEET_DIR / f"floorsheet_{today}.csv"
 
     overwrite_csv(csv_path, FLOORSHEET_FIELDS, records)
+    if index:
+        index.record(today, records)
     log.info(f"Floorsheet: saved -> {csv_path}")
 
+    from core.partitions import FloorsheetPartitions
+    n = FloorsheetPartitions().append(records, today)
+    log.info(f"Floorsheet: {n} rows added to company-wise/*/floorsheet/ partitions")
+
+    try:
+        from core.brokerflow import BrokerFlow
+        n = BrokerFlow().load().update()
+        log.info(f"Floorsheet: {n} trades added to the broker flow cache")
+    except Exception as e:  # derived cache — never fail the scrape over it
+        log.warning(f"Could not update broker flow: {e}")
+
 
 # ═══════════════════════════════════════════════════════════════════════════
 # RUNNERS
 # ═══════════════════════════════════════════════════════════════════════════
 
-def run_dividends():
+def run_dividends(session=None, bootstrap=None, deadline=None):
     companies = load_priority_companies()
+    if _SHARD:
+        companies = _SHARD.prepare(companies)
     log.info(f"=== Dividend update for {len(companies)} companies ===")
-    for i, sym in enumerate(sorted(companies), 1):
-        log.info(f"[{i}/{len(companies)}] {sym}")
-        try:
-            update_dividends(sym)
-        except Exception as e:
-            log.error(f"  [{sym}] Error: {e}")
-        time.sleep(random.uniform(0.8, 1.5))
+    _work_queue("dividends", deadline).run(
+        companies, lambda sym: update_dividends(sym, session, bootstrap),
+        delay=lambda: random.uniform(0.8, 1.5),
+    )
     log.info("=== Dividend update complete ===")
 
 
-def run_right_shares():
+def run_right_shares(session=None, bootstrap=None, deadline=None):
     companies = load_priority_companies()
+    if _SHARD:
+        companies = _SHARD.prepare(companies)
     log.info(f"=== Right share update for {len(companies)} companies ===")
-    for i, sym in enumerate(sorted(companies), 1):
-        log.info(f"[{i}/{len(companies)}] {sym}")
-        try:
-            update_right_shares(sym)
-        except Exception as e:
-            log.error(f"  [{sym}] Error: {e}")
-        time.sleep(random.uniform(0.8, 1.5))
+    _work_queue("right_shares", deadline).run(
+        companies, lambda sym: update_right_shares(sym, session, bootstrap),
+        delay=lambda: random.uniform(0.8, 1.5),
+    )
     log.info("=== Right share update complete ===")
 
 
-def run_floorsheet(max_pages=None):
+def run_floorsheet(max_pages=None, session=None, force=False):
+    # On a closed day merolagani still serves the previous session's sheet,
+    # which would be saved again under today's date
+    if not force:
+        from core.trading_calendar import load_calendar
+        if load_calendar().market_closed_today():
+            log.info("=== Floorsheet skipped: market closed today (use --force to override) ===")
+            return
     log.info("=== Floorsheet scrape ===")
-    records = scrape_floorsheet(max_pages=max_pages)
+    records = scrape_floorsheet(max_pages=max_pages, session=session)
     save_floorsheet(records)
     log.info("=== Floorsheet complete ===")
 
 
+def run_floorsheet_backfill(start, end, workers=3, session=None, deadline=None, max_pages=None):
+    """
+    Fill in the floorsheets of past trading days in [start, end] that have no
+    file yet. Days are fetched concurrently, each on its own session (its own
+    ASP.NET ViewState chain) but all under the parent session's per-host
+    budget; each day is saved as soon as it is complete.
+    Returns {"saved": [...], "failed": [...], "left": [...]}.
+    """
+    from concurrent.futures import ThreadPoolExecutor, as_completed
+    from core.storage import floorsheet_path
+    from core.trading_calendar import load_calendar
+    from core.workqueue import Deadline
+
+    deadline = deadline or Deadline(None)
+    calendar = load_calendar()
+    today = str(dt_date.today())
+    before = str(dt_date.fromisoformat(start) - timedelta(days=1))  # sessions_between excludes its start
+    days = [d for d in calendar.sessions_between(before, end) if d < today and floorsheet_path(d) is None]
+    log.info(f"=== Floorsheet backfill: {len(days)} missing trading days in {start}..{end} ===")
+    parent = session or make_session({"merolagani.com": workers})
+    report = {"saved": [], "failed": [], "left": []}
+
+    def fetch(day):
+        if deadline.expired():
+            return day, "left"
+        day_session = parent.fork() if isinstance(parent, BudgetedSession) else make_session()
+        try:
+            return day, scrape_floorsheet_day(day, day_session, max_pages=max_pages)
+        finally:
+            day_session.close()
+
+    with ThreadPoolExecutor(max_workers=max(workers, 1), thread_name_prefix="backfill") as pool:
+        for future in as_completed([pool.submit(fetch, d) for d in days]):
+            day, records = future.result()
+            if records == "left":
+                report["left"].append(day)
+            elif records:
+                save_floorsheet(records, day)  # saves run one at a time, in this thread
+                report["saved"].append(day)
+            else:
+                report["failed"].append(day)
+    for key in report:
+        report[key].sort()
+    log.info(f"=== Floorsheet backfill: saved {len(report['saved'])}, failed {report['failed'] or '-'}, "
+             f"out of time {report['left'] or '-'} ===")
+    return report
+
+
+def _day_high_contract(csv_path):
+    """Highest contract_no already in a day file (0 if none)."""
+    if not csv_path.exists():
+        return 0
+    with open(csv_path, newline="", encoding="utf-8") as f:
+        return max((int(r["contract_no"]) for r in csv.DictReader(f) if r["contract_no"].isdigit()), default=0)
+
+
+def run_floorsheet_live(interval=60, session=None, force=False, until_hour=None):
+    """
+    Intraday polling. Each poll pages the floorsheet only until it reaches
+    the highest contract_no already stored, appends the newer rows to
+    today's day file and publishes them, one JSON object per line, to
+    data/floorsheet/live_YYYY-MM-DD.ndjson (follow it with `tail -f`).
+    Stops after the market closes (or at until_hour, Nepal time).
+    """
+    from datetime import datetime, timezone
+    from core.contract_index import ContractIndex
+    from core.partitions import FloorsheetPartitions
+    from core.trading_calendar import load_calendar, NPT, MARKET_CLOSE_HOUR
+
+    cal = load_calendar()
+    if not force and cal.market_closed_today():
+        log.info("=== Live floorsheet skipped: market closed today (use --force to override) ===")
+        return
+
+    today = str(dt_date.today())
+    ensure_dir(FLOORSHEET_DIR)
+    csv_path = FLOORSHEET_DIR / f"floorsheet_{today}.csv"
+    stream_path = FLOORSHEET_DIR / f"live_{today}.ndjson"
+    session = session or make_session()
+    index, partitions = ContractIndex(), FloorsheetPartitions()
+    from core.quality import gate_floorsheet
+    stop_hour = until_hour if until_hour is not None else MARKET_CLOSE_HOUR
+
+    # Contract numbers start with the trade date, so anything below today's
+    # first possible contract is the previous session, which merolagani shows
+    # until trading starts: paging stops on the first such page
+    day_floor = int(today.replace("-", "")) * 10 ** 8
+    high = max(_day_high_contract(csv_path), day_floor)
+    log.info(f"=== Live floorsheet: polling every {interval}s from contract {high or '-'} -> {stream_path.name} ===")
+
+    final = False
+    while True:
+        final = datetime.now(timezone.utc).astimezone(NPT).hour >= stop_hour
+        try:
+            records = scrape_floorsheet(session=session, stop_contract=high)
+        except requests.RequestException as e:
+            log.warning(f"Live floorsheet: poll failed: {e}")
+            records = []
+
+        if records:
+            # Only today's trades; rows shift down while paging as trades arrive
+            records = [r for r in records if r["contract_no"][:8] == today.replace("-", "")]
+            records, report = index.filter_new(records, today, replace=False)
+            if report["already_indexed"]:
+                log.warning(f"Live floorsheet: dropped {report['already_indexed']} already-stored trades")
+            if report["unparsable"]:
+                log.warning(f"Live floorsheet: {report['unparsable']} rows with an unparsable contract_no")
+        if records:
+            # Quarantined rows are not fetched again; malformed contract numbers are quarantined
+            high = max([high] + [int(r["contract_no"]) for r in records if r["contract_no"].isdigit()])
+            records, _ = gate_floorsheet(records, today)
+            records.sort(key=lambda r: int(r["contract_no"]))
+
+        if records:
+            new_file = not csv_path.exists()
+            with open(csv_path, "a", newline="", encoding="utf-8") as f:
+                writer = csv.DictWriter(f, fieldnames=FLOORSHEET_FIELDS, extrasaction="ignore")
+                if new_file:
+                    writer.writeheader()
+                writer.writerows(records)
+            with open(stream_path, "a", encoding="utf-8") as f:
+                f.writelines(json.dumps(r, ensure_ascii=False) + "\n" for r in records)
+            index.record(today, records, replace=False)
+            partitions.append(records, today)
+            log.info(f"Live floorsheet: +{len(records)} trades (high {high})")
+            _publish("live", ["floorsheet"])
+
+        if final:
+            break
+        time.sleep(interval)
+    log.info("=== Live floorsheet: market closed, stopped ===")
+
+
 # ═══════════════════════════════════════════════════════════════════════════
 # MAIN
 # ═══════════════════════════════════════════════════════════════════════════
@@ -454,19 +848,77 @@ def main():
     parser.add_argument("--right-shares", action="store_true", help="Scrape right share history")
     parser.add_argument("--floorsheet",   action="store_true", help="Scrape today's floorsheet")
     parser.add_argument("--max-pages",    type=int, default=None, help="Limit floorsheet pages (for testing)")
+    parser.add_argument("--force",        action="store_true", help="Scrape the floorsheet even on a non-trading day")
+    parser.add_argument("--time-budget",  type=float, default=None, metavar="MINUTES",
+                        help="Stop starting new work after this many minutes; the rest is queued for the next run")
+    parser.add_argument("--shard",        default=None, metavar="I/N",
+                        help="Dividends / right shares for shard I of N only (0-based), into data/.shards/")
+    parser.add_argument("--archive",      action="store_true", help="Keep compressed raw responses for --reparse")
+    parser.add_argument("--no-http-cache", action="store_true", help="Always fetch company pages live (skip data/.cache/http/)")
+    parser.add_argument("--no-change-feed", action="store_true", help="Do not log changed files to data/changes/")
+    parser.add_argument("--reparse",      action="store_true", help="Rebuild CSVs from archived responses (no network)")
+    parser.add_argument("--day",          default=None, help="With --reparse: only responses archived on this day")
+    parser.add_argument("--backfill",     default=None, metavar="START[:END]",
+                        help="Fetch the floorsheets of past trading days START..END (YYYY-MM-DD) that have no file yet")
+    parser.add_argument("--workers",      type=int, default=3, help="Days fetched concurrently by --backfill (default 3)")
+    parser.add_argument("--live",         action="store_true", help="Poll the floorsheet intraday, appending only new trades")
+    parser.add_argument("--interval",     type=int, default=60, help="Seconds between --live polls (default 60)")
+    parser.add_argument("--until",        type=int, default=None, metavar="HOUR",
+                        help="Stop --live polling at this hour, Nepal time (default: market close)")
     args = parser.parse_args()
+    setup_logging()
+
+    if args.reparse:
+        from reparse import reparse
+        kinds = [k for k, flag in (("dividends", args.dividends), ("right_shares", args.right_shares),
+                                   ("floorsheet", args.floorsheet)) if flag]
+        reparse(kinds or ["dividends", "right_shares", "floorsheet"], day=args.day)
+        return
+    if args.archive:
+        enable_archive()
+    if not args.no_http_cache:
+        enable_http_cache()
+    if not args.no_change_feed:
+        enable_change_feed()
+    if args.shard:
+        try:
+            enable_shard(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+
+    if args.live:
+        run_floorsheet_live(interval=args.interval, force=args.force, until_hour=args.until)
+        return
+
+    from core.workqueue import Deadline
+    deadline = Deadline(args.time_budget * 60 if args.time_budget else None)
+
+    if args.backfill:
+        start, _, end = args.backfill.partition(":")
+        try:
+            dt_date.fromisoformat(start), dt_date.fromisoformat(end or start)
+        except ValueError:
+            parser.error("--backfill expects YYYY-MM-DD or YYYY-MM-DD:YYYY-MM-DD")
+        run_floorsheet_backfill(start, end or start, workers=args.workers, deadline=deadline,
+                                max_pages=args.max_pages)
+        _publish("backfill", ["floorsheet"])
+        return
 
     # If no flag given, run all three
     run_all = not (args.dividends or args.right_shares or args.floorsheet)
 
     if run_all or args.dividends:
-        run_dividends()
+        run_dividends(deadline=deadline)
+        _publish("dividends", ["dividends"])
 
     if run_all or args.right_shares:
-        run_right_shares()
+        run_right_shares(deadline=deadline)
+        _publish("right_shares", ["right_shares"])
 
-    if run_all or args.floorsheet:
-        run_floorsheet(max_pages=args.max_pages)
+    # The floorsheet is one stream, not per symbol: a sharded run does it only when asked
+    if (run_all and not _SHARD) or args.floorsheet:
+        run_floorsheet(max_pages=args.max_pages, force=args.force)
+        _publish("floorsheet", ["floorsheet"])
 
 
 if __name__ == "__main__":
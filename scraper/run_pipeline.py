@@ -0,0 +1,190 @@
+"""
+run_pipeline.py
+===============
+Single-process daily run. Executes the same work as the separate
+run_daily.py / run_github_actions.py invocations, but as one dependency graph:
+
+  discovery     -> data/company_id_mapping.json                 (sharesansar)
+  prices        -> data/company-wise/{SYMBOL}/prices.csv        (sharesansar)
+  dividends     -> data/company-wise/{SYMBOL}/dividend.csv      (sharesansar)
+  right_shares  -> data/company-wise/{SYMBOL}/right-share.csv   (sharesansar)
+  floorsheet    -> data/floorsheet/floorsheet_YYYY-MM-DD.csv    (merolagani)
+  sector_index  -> data/sector_index.csv                        (from prices.csv)
+
+Independent stages run concurrently over one shared HTTP pool with a cap on
+in-flight requests per host, and share the company-page (CSRF / companyid)
+bootstrap cache. A per-stage timing report is printed at the end.
+
+Symbols whose prices.csv already holds the latest expected session are not
+requested, and the floorsheet is skipped on non-trading days (--force to
+override); see core/trading_calendar.py. With --time-budget the per-symbol
+stages share one deadline and work most-stale symbols first; whatever is
+not reached is queued in data/work_queue.json for the next run.
+
+A failed stage is logged and shown in the timing report, but the exit status
+stays 0 so the data the other stages scraped still gets committed. Dividends
+and right shares run after discovery even if it fails, on the stored
+company ID mapping.
+
+Usage:
+  python scraper/run_pipeline.py
+  python scraper/run_pipeline.py --stages dividends,floorsheet --max-pages 3
+  python scraper/run_pipeline.py --budget www.sharesansar.com=1 --report timings.json
+  python scraper/run_pipeline.py --time-budget 45
+"""
+
+import os
+import sys
+import json
+import logging
+import argparse
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+import run_github_actions as gha
+from core.pipeline import Pipeline, Stage
+from core.session import BootstrapCache, SHARESANSAR_HOST, MEROLAGANI_HOST
+from core.workqueue import Deadline
+
+log = logging.getLogger("pipeline")
+
+# Max in-flight requests per host across all stages
+DEFAULT_BUDGETS = {SHARESANSAR_HOST: 2, MEROLAGANI_HOST: 1}
+ALL_STAGES = ["discovery", "prices", "dividends", "right_shares", "floorsheet", "sector_index"]
+# Datasets under data/ each stage writes, for the change feed
+STAGE_DATASETS = {"prices": ["prices"], "dividends": ["dividends"],
+                  "right_shares": ["right_shares"], "floorsheet": ["floorsheet"],
+                  "sector_index": ["sector_index"]}
+
+
+def build_stages(names, session, bootstrap, max_pages=None, force=False, deadline=None):
+    from core.daily import DailyScraperManager
+    from core.discovery import CompanyDiscovery
+
+    def prices():
+        DailyScraperManager(session=session, bootstrap=bootstrap).run_daily_update(deadline=deadline)
+
+    def sector_index():
+        from core.sector_index import IndexEngine
+        IndexEngine().update()
+
+    def discovery():
+        finder = CompanyDiscovery(session=session, bootstrap=bootstrap)
+        mapping = finder.load_mapping()
+        log.info(f"Company ID mapping: {len(mapping)} symbols")
+        report = finder.last_report
+        if report is None:
+            return
+        for key in ("new_listings", "delisting_suspects", "ids_unresolved"):
+            if report[key]:
+                log.warning(f"Discovery {key.replace('_', ' ')} ({len(report[key])}): {', '.join(report[key])}")
+        log.info(f"Discovery: {report['listed']} listed, {len(report['ids_added'])} IDs added")
+
+    # dividends / right shares need company IDs, so they wait for discovery;
+    # if it fails they still run on the stored mapping
+    id_after = ("discovery",) if "discovery" in names else ()
+    available = {
+        "discovery": Stage("discovery", discovery, host=SHARESANSAR_HOST),
+        "prices": Stage("prices", prices, host=SHARESANSAR_HOST),
+        "dividends": Stage("dividends", lambda: gha.run_dividends(session, bootstrap, deadline),
+                           after=id_after, host=SHARESANSAR_HOST),
+        "right_shares": Stage("right_shares", lambda: gha.run_right_shares(session, bootstrap, deadline),
+                              after=id_after, host=SHARESANSAR_HOST),
+        "floorsheet": Stage("floorsheet", lambda: gha.run_floorsheet(max_pages=max_pages, session=session, force=force),
+                            host=MEROLAGANI_HOST),
+        # Rebuilt from the price histories (adjusted for corporate actions) once they are in —
+        # whatever is on disk, even if one of those stages failed
+        "sector_index": Stage("sector_index", sector_index,
+                              after=[n for n in ("prices", "dividends", "right_shares") if n in names]),
+    }
+    unknown = [n for n in names if n not in available]
+    if unknown:
+        raise SystemExit(f"Unknown stage(s): {', '.join(unknown)} (choose from {', '.join(ALL_STAGES)})")
+    return [available[n] for n in names]
+
+
+def parse_budgets(values):
+    budgets = dict(DEFAULT_BUDGETS)
+    for item in values or []:
+        host, _, n = item.partition("=")
+        if not n.isdigit() or int(n) < 1:
+            raise SystemExit(f"Invalid --budget '{item}' (expected host=N)")
+        budgets[host] = int(n)
+    return budgets
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the daily scrape as one concurrent pipeline")
+    parser.add_argument("--stages", default=",".join(ALL_STAGES),
+                        help=f"Comma-separated stages to run (default: {','.join(ALL_STAGES)})")
+    parser.add_argument("--budget", action="append", metavar="HOST=N",
+                        help="Max concurrent requests to a host (repeatable)")
+    parser.add_argument("--max-pages", type=int, default=None, help="Limit floorsheet pages (for testing)")
+    parser.add_argument("--force", action="store_true",
+                        help="Scrape the floorsheet even when the trading calendar says the market is closed")
+    parser.add_argument("--archive", action="store_true",
+                        help="Keep compressed raw responses in data/.cache/raw/ (see reparse.py)")
+    parser.add_argument("--no-http-cache", action="store_true",
+                        help="Always fetch company pages and listings live (skip data/.cache/http/)")
+    parser.add_argument("--no-change-feed", action="store_true",
+                        help="Do not log changed files to data/changes/")
+    parser.add_argument("--compact", action="store_true",
+                        help="Afterwards compress / roll up old floorsheets and sort prices.csv (core/storage.py)")
+    parser.add_argument("--time-budget", type=float, default=None, metavar="MINUTES",
+                        help="Stop starting new symbols after this many minutes; the rest is queued for the next run")
+    parser.add_argument("--report", default=None, help="Also write the timing report as JSON to this path")
+    args = parser.parse_args()
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s  %(levelname)-7s  [%(threadName)s]  %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+
+    if args.archive:
+        gha.enable_archive()
+    if not args.no_http_cache:
+        gha.enable_http_cache()
+    budgets = parse_budgets(args.budget)
+    session = gha.make_session(budgets)
+    bootstrap = BootstrapCache()
+    names = [n.strip() for n in args.stages.split(",") if n.strip()]
+
+    deadline = Deadline(args.time_budget * 60 if args.time_budget else None)
+
+    on_stage_done = None
+    if not args.no_change_feed:
+        from core.changefeed import ChangeFeed
+        feed = ChangeFeed().begin([d for n in names for d in STAGE_DATASETS.get(n, [])])
+
+        def on_stage_done(stage):
+            if stage.name in STAGE_DATASETS:
+                feed.scan(stage.name, STAGE_DATASETS[stage.name])
+
+    pipeline = Pipeline(build_stages(names, session, bootstrap, max_pages=args.max_pages, force=args.force,
+                                     deadline=deadline), on_stage_done=on_stage_done)
+    log.info(f"Running stages: {', '.join(names)}  (budgets: {budgets})")
+    pipeline.run()
+    session.close()
+
+    if args.compact:
+        from core.storage import compact
+        log.info(f"Compact storage: {compact()}")
+
+    log.info("Timing report:\n" + pipeline.report())
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump(pipeline.as_dict(), f, indent=2)
+
+    # Not the exit status: a failed step would stop the workflow from committing
+    # what the other stages scraped
+    failed = pipeline.failures()
+    if failed:
+        log.warning(f"Stages failed or skipped: {', '.join(failed)}")
+        if os.environ.get("GITHUB_ACTIONS"):
+            print(f"::warning title=Pipeline::Stages failed or skipped: {', '.join(failed)}")
+
+
+if __name__ == "__main__":
+    main()
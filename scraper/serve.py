@@ -0,0 +1,396 @@
+"""
+serve.py
+========
+Read-only local HTTP API over the data/ directory.
+The CSVs are parsed once into in-memory arrays; a background thread picks up
+files added or changed by the daily run and reloads only those.
+
+Usage:
+  python scraper/serve.py                      # http://127.0.0.1:8050
+  python -m scraper.serve --port 9000          # from the repo root
+
+Endpoints (add ?format=csv for CSV instead of JSON):
+  GET /symbols
+  GET /prices/{SYMBOL}?start=YYYY-MM-DD&end=YYYY-MM-DD
+  GET /floorsheet/{YYYY-MM-DD}?symbol=HIDCL&broker=58
+  GET /latest                                  # last session of every symbol
+  GET /changes?since=SEQ                       # change-feed events after SEQ (JSON only)
+  GET /changes/stream                          # the same, pushed as server-sent events
+
+Responses carry an ETag; send If-None-Match to get 304 Not Modified.
+"""
+
+import sys
+import csv
+import io
+import json
+import math
+import time
+import hashlib
+import logging
+import argparse
+import threading
+from collections import defaultdict
+from pathlib import Path
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+
+import numpy as np
+
+sys.path.insert(0, str(Path(__file__).resolve().parent))
+
+from core.changefeed import ChangeFeed
+from core.indicators import load_price_history
+from core.storage import file_key, floorsheet_files, floorsheet_path, read_csv
+
+log = logging.getLogger("serve")
+
+ROOT = Path(__file__).resolve().parent.parent
+DATA_DIR = ROOT / "data"
+COMPANY_WISE = DATA_DIR / "company-wise"
+FLOORSHEET_DIR = DATA_DIR / "floorsheet"
+
+PRICE_FIELDS = ["date", "open", "high", "low", "ltp", "percent_change", "qty", "turnover"]
+
+
+def _signature(path):
+    st = path.stat()
+    return (st.st_mtime_ns, st.st_size)
+
+
+def _num(value):
+    try:
+        return float(value.replace(",", ""))
+    except (ValueError, AttributeError):
+        return math.nan
+
+
+def _int(value):
+    v = _num(value)
+    return 0 if math.isnan(v) else int(v)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# IN-MEMORY STORE
+# ═══════════════════════════════════════════════════════════════════════════
+
+class DataStore:
+    """
+    Holds every price history and floorsheet as numpy columns.
+      prices[symbol]   -> (dates, values[n, 7])      date-sorted, deduplicated
+      floorsheet[date] -> {column: array}             symbols as category codes
+    Each entry remembers the (mtime, size) of its source file so refresh()
+    only re-parses what changed.
+    """
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.prices = {}
+        self.floorsheet = {}
+        self._day_source = {}
+        self._sigs = {}
+        self.generation = 0
+
+    @staticmethod
+    def _floorsheet_table(rows):
+        symbols = [r.get("stock_symbol", "") for r in rows]
+        categories, codes = np.unique(np.array(symbols, dtype=object), return_inverse=True)
+        return {
+            "sn": np.array([_int(r.get("sn")) for r in rows], dtype=np.int32),
+            "contract_no": np.array([_int(r.get("contract_no")) for r in rows], dtype=np.int64),
+            "symbols": categories,
+            "symbol_code": codes.astype(np.int32),
+            "buyer": np.array([_int(r.get("buyer")) for r in rows], dtype=np.int32),
+            "seller": np.array([_int(r.get("seller")) for r in rows], dtype=np.int32),
+            "quantity": np.array([_num(r.get("quantity")) for r in rows]),
+            "rate": np.array([_num(r.get("rate")) for r in rows]),
+            "amount": np.array([_num(r.get("amount")) for r in rows]),
+        }
+
+    def refresh(self):
+        """Load new / changed files and drop removed ones. Returns #files reloaded."""
+        seen = set()
+        reloaded = 0
+
+        for path in sorted(COMPANY_WISE.glob("*/prices.csv")):
+            seen.add(path)
+            sig = _signature(path)
+            if self._sigs.get(path) == sig:
+                continue
+            history = load_price_history(path.parent.name, columns=PRICE_FIELDS[1:])
+            with self.lock:
+                self.prices[path.parent.name] = history
+                self._sigs[path] = sig
+            reloaded += 1
+
+        # Plain, compressed and rolled-up files (core/storage.py); a day is
+        # served from the file floorsheet_path() picks for it
+        for path in floorsheet_files():
+            seen.add(path)
+            sig = _signature(path)
+            if self._sigs.get(path) == sig:
+                continue
+            days = defaultdict(list)
+            for row in read_csv(path):
+                days[file_key(path) if len(file_key(path)) == 10 else row.get("date", "")].append(row)
+            tables = {d: self._floorsheet_table(rows) for d, rows in days.items() if floorsheet_path(d) == path}
+            with self.lock:
+                for d, table in tables.items():
+                    self.floorsheet[d] = table
+                    self._day_source[d] = path
+                self._sigs[path] = sig
+            reloaded += 1
+
+        with self.lock:
+            for path in set(self._sigs) - seen:
+                del self._sigs[path]
+                if path.name == "prices.csv":
+                    self.prices.pop(path.parent.name, None)
+                else:
+                    for d in [d for d, src in self._day_source.items() if src == path]:
+                        del self._day_source[d]
+                        self.floorsheet.pop(d, None)
+                reloaded += 1
+            if reloaded:
+                self.generation += 1
+        return reloaded
+
+    def etag(self, *parts):
+        """Weak ETag derived from the source files' signatures and the query."""
+        h = hashlib.sha1(repr(parts).encode()).hexdigest()[:20]
+        return f'W/"{h}"'
+
+    def file_sig(self, path):
+        return self._sigs.get(path)
+
+    # ------------------------------------------------------------------
+    # Queries (return (rows as list of dicts, etag))
+    # ------------------------------------------------------------------
+
+    @staticmethod
+    def _price_rows(dates, values, lo, hi):
+        rows = []
+        for i in range(lo, hi):
+            row = {"date": str(dates[i])}
+            for name, v in zip(PRICE_FIELDS[1:], values[i]):
+                row[name] = None if math.isnan(v) else (int(v) if name == "qty" else float(v))
+            rows.append(row)
+        return rows
+
+    def price_range(self, symbol, start=None, end=None):
+        with self.lock:
+            history = self.prices.get(symbol)
+        if history is None:
+            return None, None
+        dates, values = history
+        lo = int(np.searchsorted(dates, start, side="left")) if start else 0
+        hi = int(np.searchsorted(dates, end, side="right")) if end else len(dates)
+        etag = self.etag(self.file_sig(COMPANY_WISE / symbol / "prices.csv"), symbol, start, end)
+        return self._price_rows(dates, values, lo, hi), etag
+
+    def floorsheet_day(self, date, symbol=None, broker=None):
+        with self.lock:
+            t = self.floorsheet.get(date)
+        if t is None:
+            return None, None
+        mask = np.ones(len(t["contract_no"]), dtype=bool)
+        if symbol:
+            idx = np.searchsorted(t["symbols"], symbol)
+            if idx < len(t["symbols"]) and t["symbols"][idx] == symbol:
+                mask &= t["symbol_code"] == idx
+            else:
+                mask[:] = False
+        if broker is not None:
+            mask &= (t["buyer"] == broker) | (t["seller"] == broker)
+        rows = [
+            {
+                "date": date,
+                "sn": int(t["sn"][i]),
+                "contract_no": int(t["contract_no"][i]),
+                "stock_symbol": str(t["symbols"][t["symbol_code"][i]]),
+                "buyer": int(t["buyer"][i]),
+                "seller": int(t["seller"][i]),
+                "quantity": float(t["quantity"][i]),
+                "rate": float(t["rate"][i]),
+                "amount": float(t["amount"][i]),
+            }
+            for i in np.flatnonzero(mask)
+        ]
+        etag = self.etag(self.file_sig(floorsheet_path(date)), date, symbol, broker)
+        return rows, etag
+
+    def latest(self):
+        with self.lock:
+            items = sorted(self.prices.items())
+            generation = self.generation
+        rows = []
+        for symbol, (dates, values) in items:
+            if len(dates):
+                row = self._price_rows(dates, values, len(dates) - 1, len(dates))[0]
+                rows.append({"symbol": symbol, **row})
+        return rows, self.etag("latest", generation)
+
+
+# ═══════════════════════════════════════════════════════════════════════════
+# HTTP
+# ═══════════════════════════════════════════════════════════════════════════
+
+def _to_csv(rows):
+    buf = io.StringIO()
+    if rows:
+        writer = csv.DictWriter(buf, fieldnames=list(rows[0]))
+        writer.writeheader()
+        writer.writerows(rows)
+    return buf.getvalue()
+
+
+def make_handler(store, feed=None, poll=1.0, heartbeat=15.0):
+    feed = feed or ChangeFeed()
+
+    class Handler(BaseHTTPRequestHandler):
+        server_version = "NepseData/1.0"
+
+        def log_message(self, fmt, *args):
+            log.debug(fmt % args)
+
+        def _send(self, status, body, content_type, etag=None):
+            data = body.encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(data)))
+            if etag:
+                self.send_header("ETag", etag)
+                self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            if self.command != "HEAD":
+                self.wfile.write(data)
+
+        def _error(self, status, message):
+            self._send(status, json.dumps({"error": message}), "application/json")
+
+        def do_HEAD(self):
+            self.do_GET()
+
+        def _stream_changes(self, since):
+            """Server-sent events: one `change` event per feed entry, resumable via Last-Event-ID."""
+            self.send_response(200)
+            self.send_header("Content-Type", "text/event-stream")
+            self.send_header("Cache-Control", "no-cache")
+            self.end_headers()
+            last_write = time.time()
+            position = None  # (feed file, byte offset) read so far: each poll reads only new lines
+            try:
+                while True:
+                    events, position = feed.read_from(position, since)
+                    for event in events:
+                        data = json.dumps(event, separators=(",", ":"))
+                        self.wfile.write(f"id: {event['seq']}\nevent: change\ndata: {data}\n\n".encode())
+                        since = event["seq"]
+                    if not events and time.time() - last_write > heartbeat:
+                        self.wfile.write(b": keep-alive\n\n")
+                    if events or time.time() - last_write > heartbeat:
+                        self.wfile.flush()
+                        last_write = time.time()
+                    time.sleep(poll)
+            except (BrokenPipeError, ConnectionResetError):
+                return
+
+        def do_GET(self):
+            url = urlparse(self.path)
+            qs = {k: v[-1] for k, v in parse_qs(url.query).items()}
+            parts = [p for p in url.path.split("/") if p]
+
+            if parts[:1] == ["changes"]:
+                try:
+                    since = int(self.headers.get("Last-Event-ID") or qs.get("since") or -1)
+                except ValueError:
+                    return self._error(400, "since must be an integer")
+                if parts == ["changes", "stream"]:
+                    return self._stream_changes(feed.last_seq() if since < 0 else since)
+                if parts == ["changes"]:
+                    events = feed.read_since(max(since, 0))
+                    return self._send(200, json.dumps(events, separators=(",", ":")), "application/json")
+                return self._error(404, "unknown endpoint")
+
+            try:
+                if parts == ["symbols"]:
+                    with store.lock:
+                        rows = [{"symbol": s} for s in sorted(store.prices)]
+                        etag = store.etag("symbols", store.generation)
+                elif len(parts) == 2 and parts[0] == "prices":
+                    rows, etag = store.price_range(parts[1].upper(), qs.get("start"), qs.get("end"))
+                elif len(parts) == 2 and parts[0] == "floorsheet":
+                    broker = int(qs["broker"]) if qs.get("broker") else None
+                    symbol = qs.get("symbol", "").upper() or None
+                    rows, etag = store.floorsheet_day(parts[1], symbol, broker)
+                elif parts == ["latest"]:
+                    rows, etag = store.latest()
+                else:
+                    return self._error(404, "unknown endpoint")
+            except ValueError as e:
+                return self._error(400, str(e))
+
+            if rows is None:
+                return self._error(404, "not found")
+
+            fmt = qs.get("format", "json")
+            etag = etag[:-1] + f'-{fmt}"'
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(304)
+                self.send_header("ETag", etag)
+                self.end_headers()
+                return
+
+            if fmt == "csv":
+                self._send(200, _to_csv(rows), "text/csv; charset=utf-8", etag)
+            else:
+                self._send(200, json.dumps(rows, separators=(",", ":")), "application/json", etag)
+
+    return Handler
+
+
+def _watch(store, interval):
+    while True:
+        time.sleep(interval)
+        try:
+            n = store.refresh()
+            if n:
+                log.info(f"Reloaded {n} changed file(s)")
+        except Exception as e:
+            log.error(f"Reload failed: {e}")
+
+
+def main():
+    logging.basicConfig(
+        level=logging.INFO,
+        format="%(asctime)s  %(levelname)-7s  %(message)s",
+        handlers=[logging.StreamHandler()],
+    )
+    parser = argparse.ArgumentParser(description="Serve data/ over a local read-only HTTP API")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8050)
+    parser.add_argument("--reload-interval", type=float, default=30.0,
+                        help="Seconds between checks for new / changed files (0 disables)")
+    args = parser.parse_args()
+
+    store = DataStore()
+    t0 = time.time()
+    n = store.refresh()
+    log.info(f"Loaded {n} files ({len(store.prices)} symbols, {len(store.floorsheet)} floorsheet days) "
+             f"in {time.time() - t0:.1f}s")
+
+    if args.reload_interval > 0:
+        threading.Thread(target=_watch, args=(store, args.reload_interval), daemon=True).start()
+
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(store))
+    log.info(f"Serving on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,98 @@
+"""
+Indicator cache maintenance (core/indicators.py).
+
+Run from the scraper/ directory:
+  python -m unittest discover tests
+"""
+
+import sys
+import csv
+import shutil
+import tempfile
+import unittest
+import unittest.mock
+from datetime import date, timedelta
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+import core.indicators as indicators
+
+FIELDS = ["date", "open", "high", "low", "ltp", "percent_change", "qty", "turnover"]
+
+
+def price_rows(n, start=date(2026, 1, 1)):
+    rows = []
+    for i in range(n):
+        ltp = 100 + (i * 7) % 13
+        rows.append([str(start + timedelta(days=i)), ltp, ltp + 1, ltp - 1, ltp, 0, 10, ltp * 10])
+    return rows
+
+
+class IndicatorCacheTest(unittest.TestCase):
+    def setUp(self):
+        self.dir = Path(tempfile.mkdtemp())
+        self.addCleanup(shutil.rmtree, self.dir)
+        patch = unittest.mock.patch.object(indicators, "COMPANY_WISE", self.dir)
+        patch.start()
+        self.addCleanup(patch.stop)
+        (self.dir / "TEST").mkdir()
+        self.prices = self.dir / "TEST" / "prices.csv"
+        self.engine = indicators.IndicatorEngine()
+
+    def write_prices(self, rows):
+        with open(self.prices, "w", newline="") as f:
+            writer = csv.writer(f)
+            writer.writerow(FIELDS)
+            writer.writerows(rows)
+
+    def append_prices(self, rows):
+        with open(self.prices, "a", newline="") as f:
+            csv.writer(f).writerows(rows)
+
+    def cached(self):
+        with open(self.engine.indicators_path("TEST"), newline="") as f:
+            return list(csv.DictReader(f))
+
+    def rebuilt(self):
+        self.engine.rebuild_symbol("TEST")
+        return self.cached()
+
+    def test_appended_sessions_match_full_rebuild(self):
+        rows = price_rows(60)
+        self.write_prices(rows[:57])
+        self.engine.rebuild_symbol("TEST")
+        self.append_prices(rows[57:])
+        self.assertEqual(self.engine.update_symbol("TEST"), 3)
+        self.assertEqual(self.engine.update_symbol("TEST"), 0)
+        incremental = self.cached()
+        self.assertEqual(incremental, self.rebuilt())
+
+    def test_backfilled_interior_session_rebuilds(self):
+        rows = price_rows(60)
+        missing = rows.pop(30)
+        self.write_prices(rows)
+        self.assertEqual(self.engine.rebuild_symbol("TEST"), 59)
+
+        self.append_prices([missing])  # as GapScanner.backfill used to append
+        self.engine.update_symbol("TEST")
+        cached = self.cached()
+        self.assertEqual(len(cached), 60)
+        self.assertIn(missing[0], [r["date"] for r in cached])
+        self.assertEqual(cached, self.rebuilt())
+
+    def test_rewritten_prices_rebuild(self):
+        rows = price_rows(60)
+        missing = rows.pop(30)
+        self.write_prices(rows)
+        self.engine.rebuild_symbol("TEST")
+
+        rows.insert(30, missing)  # sorted rewrite that grows the file
+        self.write_prices(rows)
+        self.engine.update_symbol("TEST")
+        self.assertEqual(len(self.cached()), 60)
+        self.assertEqual(self.cached(), self.rebuilt())
+
+
+if __name__ == "__main__":
+    unittest.main()